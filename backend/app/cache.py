@@ -0,0 +1,332 @@
+"""
+SceneScape Backend - 查询结果缓存
+媒体库每次写入提交后递增“代数”（generation），缓存键与 ETag 包含代数，
+数据变化后旧条目自然失效，无需逐条清理。
+代数保存在数据库的 library_state 行中，由写事务递增：本进程提交后立即采用新值，
+其他工作进程由后台任务按 library_generation_poll_interval 读取，读取后各自的缓存随之失效
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+from sqlalchemy import select
+
+from .config import settings
+from .database import LIBRARY_STATE_ID, AsyncReadSessionLocal, LibraryState
+from .metrics import Counter, Gauge, Metric, registry
+
+logger = logging.getLogger(__name__)
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+# 代数 ETag 的前缀：读取到媒体库标识前使用进程启动标识
+_instance_id = format(time.time_ns(), "x")
+
+
+def library_generation() -> int:
+    """当前媒体库代数"""
+    return _generation
+
+
+def bump_library_generation(generation: Optional[int] = None) -> int:
+    """
+    媒体库数据发生变化（写事务提交后调用），使依赖旧数据的缓存失效
+    
+    generation 为写事务内 next_library_generation 返回的共享代数；
+    未提供（状态行不存在）时只在本进程内递增
+    """
+    global _generation
+    with _generation_lock:
+        _generation = max(_generation, generation) if generation is not None else _generation + 1
+        return _generation
+
+
+async def refresh_library_generation() -> int:
+    """读取共享的媒体库代数（其他工作进程的写入由此生效）"""
+    global _instance_id
+    async with AsyncReadSessionLocal() as db:
+        row = (await db.execute(
+            select(LibraryState.library_id, LibraryState.generation).where(LibraryState.id == LIBRARY_STATE_ID)
+        )).first()
+    if row is None:
+        return library_generation()
+    _instance_id = row.library_id
+    return bump_library_generation(row.generation)
+
+
+async def run_generation_refresher():
+    """后台任务：定期读取共享的媒体库代数"""
+    while True:
+        await asyncio.sleep(settings.library_generation_poll_interval)
+        try:
+            await refresh_library_generation()
+        except Exception as e:
+            logger.warning(f"读取媒体库代数失败: {e}")
+
+
+class CountCache:
+    """列表总数等聚合结果的缓存（LRU），键为 (代数, 查询条件)"""
+    
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """命中时直接返回，否则等待 compute() 计算并缓存"""
+        if not settings.enable_cache:
+            return await compute()
+        
+        cache_key = (library_generation(), key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            self.misses += 1
+        
+        count = await compute()
+        with self._lock:
+            self._entries[cache_key] = count
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return count
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# 全局列表总数缓存实例
+count_cache = CountCache(settings.count_cache_max_entries)
+
+# 全局分面统计缓存实例
+facet_cache = CountCache(settings.facet_cache_max_entries)
+
+
+@dataclass
+class CachedResponse:
+    """缓存的完整响应（状态码、响应头、已序列化的响应体）"""
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    
+    @property
+    def etag(self) -> Optional[str]:
+        return next((value.decode() for name, value in self.headers if name == b"etag"), None)
+    
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+class ResponseCache:
+    """
+    GET 接口响应缓存（LRU，按字节预算淘汰）
+    
+    键为 (代数, 路径, 规范化的查询参数[, 日期])；代数变化后旧条目不会再命中，首次访问新代数时整体清空
+    """
+    
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._generation = library_generation()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(path: str, query_string: bytes, day: Optional[str] = None) -> tuple:
+        """参数顺序不同、空参数不影响缓存键；day 为依赖当前日期的响应所属的日期"""
+        query = tuple(sorted(parse_qsl(query_string.decode("latin-1"))))
+        key = (library_generation(), path, query)
+        return key + (day,) if day else key
+    
+    def _sync_generation(self, generation: int):
+        if generation > self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+    
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            self._sync_generation(key[0])
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: tuple, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            # 生成响应期间媒体库已变化，该响应不再缓存
+            if key[0] != library_generation():
+                return
+            self._sync_generation(key[0])
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "generation": self._generation,
+        }
+
+
+def generation_etag(generation: Optional[int] = None, day: Optional[str] = None) -> str:
+    """
+    按媒体库代数生成的 ETag（列表、统计等依赖多行数据的响应）
+    
+    前缀为媒体库标识（各工作进程、重启前后一致；新建数据库时更换，避免与旧库的 ETag 混淆）；
+    依赖当前日期的响应（最近 N 天统计等）附加日期，没有写入时跨日也会变化
+    """
+    if generation is None:
+        generation = library_generation()
+    suffix = f"-{day}" if day else ""
+    return f'W/"{_instance_id}-{generation}{suffix}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match 是否包含 etag（弱比较）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+class ResponseCacheMiddleware:
+    """
+    响应缓存与条件请求中间件（ASGI）
+    
+    命中时直接返回缓存的响应体，不访问数据库也不重新序列化；If-None-Match 与 ETag 一致时返回 304。
+    接口未设置 ETag 时使用媒体库代数 ETag，此时即使未缓存也无需执行接口即可返回 304。
+    只缓存 paths 前缀下 GET 请求的 200 响应，响应头 X-Cache 标明 HIT/MISS；
+    dated_paths 中的接口包含按当前日期滚动的数据，缓存键与 ETag 附加当天日期（UTC）
+    """
+    
+    def __init__(self, app, cache: ResponseCache, paths: Sequence[str], dated_paths: Sequence[str] = ()):
+        self.app = app
+        self.cache = cache
+        self.paths = tuple(paths)
+        self.dated_paths = frozenset(dated_paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        
+        if_none_match = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"if-none-match"), None
+        )
+        day = datetime.utcnow().strftime("%Y-%m-%d") if scope["path"] in self.dated_paths else None
+        key = self.cache.make_key(scope["path"], scope.get("query_string", b""), day)
+        entry = self.cache.get(key) if settings.enable_cache else None
+        if entry is not None:
+            if etag_matches(if_none_match, entry.etag):
+                await self._not_modified(send, entry.etag, b"HIT")
+                return
+            await send({
+                "type": "http.response.start",
+                "status": entry.status,
+                "headers": entry.headers + [(b"x-cache", b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+        
+        etag = generation_etag(key[0], day)
+        if etag_matches(if_none_match, etag):
+            await self._not_modified(send, etag, b"MISS")
+            return
+        
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+        
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if message["status"] == 200:
+                    if not any(name == b"etag" for name, _ in headers):
+                        headers.append((b"etag", etag.encode()))
+                    headers.append((b"cache-control", b"no-cache"))
+                start.update(message, headers=headers)
+                message = {**message, "headers": headers + [(b"x-cache", b"MISS")]}
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body") and start.get("status") == 200 and settings.enable_cache:
+                    self.cache.put(key, CachedResponse(200, start["headers"], b"".join(chunks)))
+            await send(message)
+        
+        await self.app(scope, receive, send_and_capture)
+    
+    @staticmethod
+    async def _not_modified(send, etag: str, cache_status: bytes):
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(b"etag", etag.encode()), (b"cache-control", b"no-cache"), (b"x-cache", cache_status)],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache(settings.response_cache_max_bytes)
+
+
+@registry.add_collector
+def collect_cache_metrics() -> List[Metric]:
+    """各缓存的命中、未命中次数与命中率（读取缓存自身的统计）"""
+    hits = Counter("scenescape_cache_hits_total", "缓存命中次数", ("cache",))
+    misses = Counter("scenescape_cache_misses_total", "缓存未命中次数", ("cache",))
+    ratio = Gauge("scenescape_cache_hit_ratio", "缓存命中率（自进程启动）", ("cache",))
+    entries = Gauge("scenescape_cache_entries", "缓存条目数", ("cache",))
+    for name, cache in (("responses", response_cache), ("counts", count_cache), ("facets", facet_cache)):
+        stats = cache.get_stats()
+        hits.set(stats["hits"], cache=name)
+        misses.set(stats["misses"], cache=name)
+        ratio.set(stats["hit_ratio"], cache=name)
+        entries.set(stats["entries"], cache=name)
+    return [hits, misses, ratio, entries]
@@ -21,10 +21,18 @@ class Settings(BaseSettings):
     # 数据库配置
     database_url: str = "sqlite:///./media.db"
     
+    # SQLite 性能配置（通过连接事件设置 PRAGMA）
+    sqlite_performance_profile: bool = True
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 256MB
+    sqlite_cache_size_kb: int = 64 * 1024  # 每个连接的页缓存（KB）
+    sqlite_busy_timeout_ms: int = 5000
+    read_pool_size: int = 10  # 只读连接池大小（GET 接口使用）
+    
     # TMDb API 配置
     tmdb_api_key: str = ""
     tmdb_base_url: str = "https://api.themoviedb.org/3"
     tmdb_image_base_url: str = "https://image.tmdb.org/t/p/"
+    tmdb_rate_limit: float = 20.0  # 每秒最大请求数，0 表示不限速
     
     # 文件存储配置
     static_files_path: str = "./static"
@@ -48,6 +56,13 @@ class Settings(BaseSettings):
     auto_scan_enabled: bool = False
     scan_interval_hours: int = 24
     max_concurrent_scans: int = 1
+    scan_concurrency: int = 4  # 单次扫描中并发解析的文件数
+    scan_progress_interval: float = 0.5  # 扫描进度推送（SSE）的最小间隔（秒）
+    
+    # 演职员配置（扫描时随详情一起获取 credits）
+    credits_enabled: bool = True
+    credits_max_cast: int = 20  # 每部作品保存的演员数（按 TMDb 排序）
+    credits_crew_jobs: str = "Director,Screenplay,Writer,Novel,Producer,Original Music Composer,Director of Photography"  # 保存的工作人员职位（逗号分隔）
     
     # 图片处理配置
     poster_sizes: List[str] = ["w185", "w342", "w500", "w780"]
@@ -59,9 +74,31 @@ class Settings(BaseSettings):
     request_timeout: int = 30
     batch_size: int = 50
     
+    # 响应压缩配置（小于 gzip_minimum_size 字节的响应不压缩）
+    gzip_minimum_size: int = 1024
+    gzip_compress_level: int = 6
+    
     # 缓存配置
     enable_cache: bool = True
     cache_ttl: int = 3600
+    count_cache_max_entries: int = 512  # 列表总数缓存的最大条目数
+    facet_cache_max_entries: int = 128  # 分面统计缓存的最大条目数
+    response_cache_max_bytes: int = 32 * 1024 * 1024  # GET 接口响应缓存的内存预算（字节）
+    library_generation_poll_interval: float = 1.0  # 多进程部署时读取共享媒体库代数的间隔（秒），其他进程写入后本进程缓存最多延迟这么久失效
+    
+    # 运行指标（/metrics，Prometheus 文本格式）
+    metrics_enabled: bool = True
+    
+    # 图片缓存配置
+    image_cache_index_path: str = "./cache/image_index.db"
+    image_cache_max_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB
+    image_cache_evict_interval: int = 300  # 后台淘汰检查间隔（秒）
+    image_http_max_age: int = 365 * 24 * 3600  # 海报/背景图响应的浏览器缓存时间（秒）
+    
+    # 封面预取配置（扫描时预先下载海报/背景图并生成缩略图）
+    artwork_prefetch_enabled: bool = False
+    artwork_prefetch_concurrency: int = 2
+    scan_poster_placeholders: bool = True  # 未开启封面预取时，扫描仍缓存缺少占位图的海报并生成占位图
     
     # CORS配置
     cors_origins: List[str] = [
@@ -104,6 +141,16 @@ class DatabaseSettings(BaseModel):
     max_overflow: int = 10
     pool_timeout: int = 30
     pool_recycle: int = 3600
+    read_pool_size: int = 10
+    
+    # SQLite 性能配置
+    sqlite_performance_profile: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_busy_timeout_ms: int = 5000
 
 
 class TMDbSettings(BaseModel):
@@ -149,7 +196,12 @@ settings = Settings()
 # 根据环境变量创建子配置
 database_settings = DatabaseSettings(
     url=settings.database_url,
-    echo=settings.debug
+    echo=settings.debug,
+    read_pool_size=settings.read_pool_size,
+    sqlite_performance_profile=settings.sqlite_performance_profile,
+    sqlite_mmap_size=settings.sqlite_mmap_size,
+    sqlite_cache_size_kb=settings.sqlite_cache_size_kb,
+    sqlite_busy_timeout_ms=settings.sqlite_busy_timeout_ms
 )
 
 tmdb_settings = TMDbSettings(
@@ -1,35 +1,145 @@
 """数据库模型和配置"""
 
+import logging
 import os
-from datetime import datetime
-from typing import List, Optional
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
 from sqlalchemy import (
     Boolean, Column, Integer, String, Float, Text, DateTime, 
-    ForeignKey, Table, create_engine
+    ForeignKey, Index, Table, create_engine, event, inspect, text, update
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from sqlalchemy.sql import func
 
-from .config import get_database_settings
+from .config import DatabaseSettings, get_database_settings, get_settings
+from .metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
 
 # 获取数据库设置
 db_settings = get_database_settings()
 
-# 创建数据库引擎
-engine = create_engine(
-    db_settings.url,
-    echo=db_settings.echo,
-    pool_size=db_settings.pool_size,
-    max_overflow=db_settings.max_overflow,
-    pool_timeout=db_settings.pool_timeout,
-    pool_recycle=db_settings.pool_recycle,
-    connect_args={"check_same_thread": False} if "sqlite" in db_settings.url else {}
-)
+
+def _is_sqlite_file(url: str) -> bool:
+    """是否为文件型 SQLite 数据库（内存库无法跨引擎共享）"""
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") != "sqlite:"
+
+
+def _apply_sqlite_pragmas(dbapi_connection, settings: DatabaseSettings, read_only: bool):
+    """为每个新建的 SQLite 连接设置性能相关的 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # WAL 为数据库级持久设置，由写连接负责开启
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}")
+        cursor.execute(f"PRAGMA temp_store={settings.sqlite_temp_store}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(settings: DatabaseSettings, read_only: bool = False) -> Engine:
+    """
+    按配置创建数据库引擎
+    
+    Args:
+        settings: 数据库设置
+        read_only: 是否为只读引擎（连接设置 query_only，供 GET 接口使用）
+    """
+    is_sqlite = settings.url.startswith("sqlite")
+    new_engine = create_engine(
+        settings.url,
+        echo=settings.echo,
+        pool_size=settings.read_pool_size if read_only else settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        connect_args={"check_same_thread": False} if is_sqlite else {}
+    )
+    
+    if is_sqlite and settings.sqlite_performance_profile:
+        @event.listens_for(new_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, settings, read_only)
+    
+    return new_engine
+
+
+def get_async_url(url: str) -> str:
+    """同步连接 URL 转换为异步驱动 URL（SQLite 使用 aiosqlite）"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def create_async_db_engine(settings: DatabaseSettings, read_only: bool = False) -> AsyncEngine:
+    """
+    按配置创建异步数据库引擎（请求处理与扫描写入使用，数据库 IO 不阻塞事件循环）
+    
+    Args:
+        settings: 数据库设置
+        read_only: 是否为只读引擎
+    """
+    is_sqlite = settings.url.startswith("sqlite")
+    new_engine = create_async_engine(
+        get_async_url(settings.url),
+        echo=settings.echo,
+        pool_size=settings.read_pool_size if read_only else settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle
+    )
+    
+    if is_sqlite and settings.sqlite_performance_profile:
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, settings, read_only)
+    
+    return new_engine
+
+
+# 创建数据库引擎（读写）
+engine = create_db_engine(db_settings)
+
+# 只读引擎：独立连接池，WAL 模式下读取不会被扫描写入阻塞
+if _is_sqlite_file(db_settings.url):
+    read_engine = create_db_engine(db_settings, read_only=True)
+else:
+    read_engine = engine
+
+# 异步引擎（迁移、图片占位图等少量同步写入仍使用同步引擎）
+async_engine = create_async_db_engine(db_settings)
+if _is_sqlite_file(db_settings.url):
+    async_read_engine = create_async_db_engine(db_settings, read_only=True)
+else:
+    async_read_engine = async_engine
+
+# 语句执行耗时指标（只读引擎与读写引擎相同时不重复记录）
+if get_settings().metrics_enabled:
+    instrument_engine(engine, "write")
+    instrument_engine(async_engine.sync_engine, "async_write")
+    if read_engine is not engine:
+        instrument_engine(read_engine, "read")
+    if async_read_engine is not async_engine:
+        instrument_engine(async_read_engine.sync_engine, "async_read")
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 # 创建基础模型类
 Base = declarative_base()
@@ -40,17 +150,64 @@ movie_genre_association = Table(
     'movie_genre_association',
     Base.metadata,
     Column('movie_id', Integer, ForeignKey('movies.id')),
-    Column('genre_id', Integer, ForeignKey('genres.id'))
+    Column('genre_id', Integer, ForeignKey('genres.id')),
+    # 同一关联只保存一次，同时服务于按电影加载类型
+    Index('uq_movie_genre_movie_genre', 'movie_id', 'genre_id', unique=True),
+    # 按类型筛选：genre_id 定位后直接得到 movie_id
+    Index('ix_movie_genre_genre_movie', 'genre_id', 'movie_id')
 )
 
 tv_show_genre_association = Table(
     'tv_show_genre_association',
     Base.metadata,
     Column('tv_show_id', Integer, ForeignKey('tv_shows.id')),
-    Column('genre_id', Integer, ForeignKey('genres.id'))
+    Column('genre_id', Integer, ForeignKey('genres.id')),
+    Index('uq_tv_show_genre_show_genre', 'tv_show_id', 'genre_id', unique=True),
+    Index('ix_tv_show_genre_genre_show', 'genre_id', 'tv_show_id')
 )
 
 
+
+def _association_table(owner: str, owner_table: str, item: str, item_table: str) -> Table:
+    """
+    标题与查找表（语言、国家、公司、播出网络）的多对多关系表
+    
+    与类型关联相同：(标题, 条目) 唯一索引用于按标题加载，(条目, 标题) 索引用于按条目筛选
+    """
+    owner_short = owner.split("_")[-1]
+    return Table(
+        f'{owner}_{item}_association',
+        Base.metadata,
+        Column(f'{owner}_id', Integer, ForeignKey(f'{owner_table}.id')),
+        Column(f'{item}_id', Integer, ForeignKey(f'{item_table}.id')),
+        Index(f'uq_{owner}_{item}_{owner_short}_{item}', f'{owner}_id', f'{item}_id', unique=True),
+        Index(f'ix_{owner}_{item}_{item}_{owner_short}', f'{item}_id', f'{owner}_id')
+    )
+
+
+movie_language_association = _association_table('movie', 'movies', 'language', 'languages')
+movie_country_association = _association_table('movie', 'movies', 'country', 'countries')
+movie_company_association = _association_table('movie', 'movies', 'company', 'companies')
+tv_show_language_association = _association_table('tv_show', 'tv_shows', 'language', 'languages')
+tv_show_country_association = _association_table('tv_show', 'tv_shows', 'country', 'countries')
+tv_show_company_association = _association_table('tv_show', 'tv_shows', 'company', 'companies')
+tv_show_network_association = _association_table('tv_show', 'tv_shows', 'network', 'networks')
+
+
+def derive_release_fields(date_str: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """从 YYYY-MM-DD 日期字符串派生 (年份, UTC时间戳)，无法解析时返回 (None, None)"""
+    if not date_str:
+        return None, None
+    try:
+        date = datetime.strptime(date_str[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        try:
+            return int(date_str[:4]), None
+        except ValueError:
+            return None, None
+    return date.year, int(date.timestamp())
+
+
 class TimestampMixin:
     """时间戳混入类"""
     created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
@@ -73,6 +230,8 @@ class Movie(Base, TimestampMixin):
     
     # 发布信息
     release_date = Column(String)
+    year = Column(Integer)  # 由 release_date 派生
+    release_ts = Column(Integer)  # 由 release_date 派生（UTC时间戳）
     status = Column(String)  # Released, In Production, etc.
     
     # 评分和人气
@@ -87,15 +246,13 @@ class Movie(Base, TimestampMixin):
     
     # 媒体文件信息
     poster_path = Column(String)
+    poster_placeholder = Column(Text)  # 低质量占位图（data URI）
     backdrop_path = Column(String)
     local_path = Column(String, unique=True, nullable=False)  # 本地文件路径
     file_size = Column(Integer)  # 文件大小（字节）
     
-    # 语言和地区
+    # 语言和地区（对白语言、出品国家、出品公司见关联表）
     original_language = Column(String)
-    spoken_languages = Column(Text)  # JSON字符串
-    production_countries = Column(Text)  # JSON字符串
-    production_companies = Column(Text)  # JSON字符串
     
     # 其他标记
     adult = Column(Boolean, default=False)
@@ -103,8 +260,20 @@ class Movie(Base, TimestampMixin):
     
     # 关系
     genres = relationship("Genre", secondary=movie_genre_association, back_populates="movies")
-    cast = relationship("CastMember", back_populates="movie", cascade="all, delete-orphan")
-    crew = relationship("CrewMember", back_populates="movie", cascade="all, delete-orphan")
+    spoken_languages = relationship("Language", secondary=movie_language_association)
+    production_countries = relationship("Country", secondary=movie_country_association)
+    production_companies = relationship("Company", secondary=movie_company_association)
+    credits = relationship("MovieCredit", back_populates="movie", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_movies_year_title", "year", "title"),
+        Index("ix_movies_release_ts", "release_ts"),
+        Index("ix_movies_created_at", "created_at"),
+        # 列表排序（游标分页按 (排序列, id) 定位，索引隐含 rowid 即 id）
+        Index("ix_movies_year", "year"),
+        Index("ix_movies_vote_average", "vote_average"),
+        Index("ix_movies_popularity", "popularity"),
+    )
 
 
 class TVShow(Base, TimestampMixin):
@@ -123,6 +292,8 @@ class TVShow(Base, TimestampMixin):
     
     # 发布信息
     first_air_date = Column(String)
+    year = Column(Integer)  # 由 first_air_date 派生
+    first_air_ts = Column(Integer)  # 由 first_air_date 派生（UTC时间戳）
     last_air_date = Column(String)
     status = Column(String)  # Returning Series, Ended, etc.
     type = Column(String)  # Scripted, Reality, etc.
@@ -135,19 +306,16 @@ class TVShow(Base, TimestampMixin):
     # 剧集信息
     number_of_seasons = Column(Integer, default=0)
     number_of_episodes = Column(Integer, default=0)
-    episode_run_time = Column(Text)  # JSON数组，每集运行时间
+    episode_runtime = Column(Integer)  # 单集时长（分钟，取 TMDb episode_run_time 的第一项）
     
     # 媒体文件信息
     poster_path = Column(String)
+    poster_placeholder = Column(Text)  # 低质量占位图（data URI）
     backdrop_path = Column(String)
     local_path = Column(String, nullable=False)  # 本地目录路径（电视剧可以有多个集数文件）
     
-    # 语言和地区
+    # 语言和地区（对白语言、出品国家、出品公司、播出网络见关联表）
     original_language = Column(String)
-    spoken_languages = Column(Text)  # JSON字符串
-    production_countries = Column(Text)  # JSON字符串
-    production_companies = Column(Text)  # JSON字符串
-    networks = Column(Text)  # JSON字符串，播出网络
     
     # 其他信息
     adult = Column(Boolean, default=False)
@@ -156,8 +324,22 @@ class TVShow(Base, TimestampMixin):
     
     # 关系
     genres = relationship("Genre", secondary=tv_show_genre_association, back_populates="tv_shows")
+    spoken_languages = relationship("Language", secondary=tv_show_language_association)
+    production_countries = relationship("Country", secondary=tv_show_country_association)
+    production_companies = relationship("Company", secondary=tv_show_company_association)
+    networks = relationship("Network", secondary=tv_show_network_association)
     seasons = relationship("TVSeason", back_populates="tv_show", cascade="all, delete-orphan")
-    created_by = relationship("Creator", back_populates="tv_show", cascade="all, delete-orphan")
+    credits = relationship("TVCredit", back_populates="tv_show", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_tv_shows_year_name", "year", "name"),
+        Index("ix_tv_shows_first_air_ts", "first_air_ts"),
+        Index("ix_tv_shows_status_name", "status", "name"),
+        Index("ix_tv_shows_created_at", "created_at"),
+        Index("ix_tv_shows_year", "year"),
+        Index("ix_tv_shows_vote_average", "vote_average"),
+        Index("ix_tv_shows_popularity", "popularity"),
+    )
 
 
 class TVSeason(Base, TimestampMixin):
@@ -180,6 +362,11 @@ class TVSeason(Base, TimestampMixin):
     # 关系
     tv_show = relationship("TVShow", back_populates="seasons")
     episodes = relationship("TVEpisode", back_populates="season", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 每部剧的每一季只有一行，扫描按 (剧, 季号) 定位季
+        Index("uq_tv_seasons_show_season", "tv_show_id", "season_number", unique=True),
+    )
 
 
 class TVEpisode(Base, TimestampMixin):
@@ -206,6 +393,26 @@ class TVEpisode(Base, TimestampMixin):
     
     # 关系
     season = relationship("TVSeason", back_populates="episodes")
+    
+    __table_args__ = (
+        Index("uq_tv_episodes_season_episode", "season_id", "episode_number", unique=True),
+    )
+
+
+class DuplicateFile(Base, TimestampMixin):
+    """
+    重复的媒体文件（同一电影或同一集的其他版本，如 720p 与 1080p）
+    
+    每部电影、每一集只保存一个本地路径，其余文件记录在此；
+    保留的路径仍在库中且文件存在时，扫描直接跳过这些文件，不再查询 TMDb
+    """
+    __tablename__ = "duplicate_files"
+    
+    id = Column(Integer, primary_key=True)
+    media_type = Column(String, nullable=False)  # movie 或 tv_episode
+    local_path = Column(String, unique=True, nullable=False)
+    file_size = Column(Integer)
+    kept_path = Column(String, nullable=False)  # 入库保存的路径
 
 
 class Genre(Base, TimestampMixin):
@@ -221,71 +428,116 @@ class Genre(Base, TimestampMixin):
     tv_shows = relationship("TVShow", secondary=tv_show_genre_association, back_populates="genres")
 
 
-class CastMember(Base, TimestampMixin):
-    """演员模型"""
-    __tablename__ = "cast_members"
+class Language(Base, TimestampMixin):
+    """语言模型（TMDb spoken_languages）"""
+    __tablename__ = "languages"
     
     id = Column(Integer, primary_key=True, index=True)
-    tmdb_id = Column(Integer, nullable=False)
-    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=True)
-    
-    name = Column(String, nullable=False)
-    character = Column(String)
-    credit_id = Column(String, unique=True)
-    order = Column(Integer)  # 演员排序
+    iso_639_1 = Column(String, unique=True, nullable=False)  # 语言代码，如 en、zh
+    name = Column(String)  # 本地名称
+    english_name = Column(String)
+
+
+class Country(Base, TimestampMixin):
+    """国家/地区模型（TMDb production_countries）"""
+    __tablename__ = "countries"
     
-    profile_path = Column(String)
+    id = Column(Integer, primary_key=True, index=True)
+    iso_3166_1 = Column(String, unique=True, nullable=False)  # 国家代码，如 US、CN
+    name = Column(String)
+
+
+class Company(Base, TimestampMixin):
+    """出品公司模型"""
+    __tablename__ = "companies"
     
-    # 个人信息
-    gender = Column(Integer)  # 0=未知, 1=女性, 2=男性
-    popularity = Column(Float, default=0.0)
+    id = Column(Integer, primary_key=True, index=True)
+    tmdb_id = Column(Integer, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    logo_path = Column(String)
+    origin_country = Column(String)
+
+
+class Network(Base, TimestampMixin):
+    """电视剧播出网络模型"""
+    __tablename__ = "networks"
     
-    # 关系
-    movie = relationship("Movie", back_populates="cast")
+    id = Column(Integer, primary_key=True, index=True)
+    tmdb_id = Column(Integer, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    logo_path = Column(String)
+    origin_country = Column(String)
 
 
-class CrewMember(Base, TimestampMixin):
-    """工作人员模型"""
-    __tablename__ = "crew_members"
+class Person(Base, TimestampMixin):
+    """人物模型（演员、导演等，按 TMDb 人物 id 去重，所有作品共用一行）"""
+    __tablename__ = "people"
     
     id = Column(Integer, primary_key=True, index=True)
-    tmdb_id = Column(Integer, nullable=False)
-    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=True)
+    tmdb_id = Column(Integer, unique=True, nullable=False)
     
     name = Column(String, nullable=False)
-    job = Column(String)  # 工作职位
-    department = Column(String)  # 部门
-    credit_id = Column(String, unique=True)
-    
+    known_for_department = Column(String)
     profile_path = Column(String)
     
     # 个人信息
-    gender = Column(Integer)
+    gender = Column(Integer)  # 0=未知, 1=女性, 2=男性
     popularity = Column(Float, default=0.0)
     
     # 关系
-    movie = relationship("Movie", back_populates="crew")
+    movie_credits = relationship("MovieCredit", back_populates="person")
+    tv_credits = relationship("TVCredit", back_populates="person")
 
 
-class Creator(Base, TimestampMixin):
-    """电视剧创作者模型"""
-    __tablename__ = "creators"
+class MovieCredit(Base):
+    """电影演职员（人物参与电影的一条记录）"""
+    __tablename__ = "movie_credits"
     
     id = Column(Integer, primary_key=True, index=True)
-    tmdb_id = Column(Integer, nullable=False)
-    tv_show_id = Column(Integer, ForeignKey('tv_shows.id'), nullable=False)
+    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=False)
+    person_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    
+    credit_type = Column(String, nullable=False)  # cast 或 crew
+    credit_id = Column(String, nullable=False)  # TMDb 演职员记录 id
+    character = Column(String)  # 饰演角色（cast）
+    department = Column(String)  # 部门（crew）
+    job = Column(String)  # 工作职位（crew）
+    order = Column(Integer)  # 演员排序
     
-    name = Column(String, nullable=False)
-    credit_id = Column(String)
+    # 关系
+    movie = relationship("Movie", back_populates="credits")
+    person = relationship("Person", back_populates="movie_credits")
     
-    profile_path = Column(String)
+    __table_args__ = (
+        Index("uq_movie_credits_movie_credit", "movie_id", "credit_id", unique=True),
+        # 人物作品列表
+        Index("ix_movie_credits_person_movie", "person_id", "movie_id"),
+    )
+
+
+class TVCredit(Base):
+    """电视剧演职员（含创作者，job 为 Creator）"""
+    __tablename__ = "tv_credits"
     
-    # 个人信息
-    gender = Column(Integer)
-    popularity = Column(Float, default=0.0)
+    id = Column(Integer, primary_key=True, index=True)
+    tv_show_id = Column(Integer, ForeignKey('tv_shows.id'), nullable=False)
+    person_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    
+    credit_type = Column(String, nullable=False)  # cast 或 crew
+    credit_id = Column(String, nullable=False)  # TMDb 演职员记录 id
+    character = Column(String)
+    department = Column(String)
+    job = Column(String)
+    order = Column(Integer)
     
     # 关系
-    tv_show = relationship("TVShow", back_populates="created_by")
+    tv_show = relationship("TVShow", back_populates="credits")
+    person = relationship("Person", back_populates="tv_credits")
+    
+    __table_args__ = (
+        Index("uq_tv_credits_show_credit", "tv_show_id", "credit_id", unique=True),
+        Index("ix_tv_credits_person_show", "person_id", "tv_show_id"),
+    )
 
 
 class ScanTask(Base, TimestampMixin):
@@ -312,6 +564,55 @@ class ScanTask(Base, TimestampMixin):
     completed_at = Column(DateTime)
 
 
+class LibraryStat(Base):
+    """
+    媒体库统计（物化汇总）
+    
+    由扫描写入器在写事务内增量维护，维护任务可整体重建；
+    scope 为 total（key 为空）、genre（key 为类型 id）、year（key 为年份）或 day（key 为入库日期 YYYY-MM-DD），
+    total_bytes 仅在 total 行维护（电影与剧集文件大小之和）
+    """
+    __tablename__ = "library_stats"
+    
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True, default="")
+    
+    movie_count = Column(Integer, nullable=False, default=0)
+    tv_show_count = Column(Integer, nullable=False, default=0)
+    episode_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# 媒体库状态表只有一行
+LIBRARY_STATE_ID = 1
+
+
+class LibraryState(Base):
+    """
+    媒体库状态（单行）
+    
+    generation 为媒体库代数，写入媒体库的事务内递增，多个工作进程据此使各自的查询缓存失效；
+    library_id 在建库时生成，用作代数 ETag 的前缀（各进程、重启前后一致）
+    """
+    __tablename__ = "library_state"
+    
+    id = Column(Integer, primary_key=True)
+    library_id = Column(String, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+
+
+def next_library_generation(db: Session) -> Optional[int]:
+    """在当前写事务内递增媒体库代数，返回新值（事务提交后生效；状态行不存在时返回 None）"""
+    db.execute(
+        update(LibraryState)
+        .where(LibraryState.id == LIBRARY_STATE_ID)
+        .values(generation=LibraryState.generation + 1)
+    )
+    return db.query(LibraryState.generation).filter(LibraryState.id == LIBRARY_STATE_ID).scalar()
+
+
 # 数据库会话依赖
 def get_db() -> Session:
     """获取数据库会话"""
@@ -322,12 +623,284 @@ def get_db() -> Session:
         db.close()
 
 
+# 只读数据库会话依赖（GET 接口）
+def get_read_db() -> Session:
+    """获取只读数据库会话"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 异步数据库会话依赖
+async def get_async_db() -> AsyncSession:
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 异步只读数据库会话依赖（GET 接口）
+async def get_async_read_db() -> AsyncSession:
+    """获取异步只读数据库会话"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engines():
+    """关闭异步引擎的连接池（应用退出时调用）"""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
 # 创建所有表
 def create_tables():
     """创建所有数据库表"""
     Base.metadata.create_all(bind=engine)
 
 
+# ORM 写入时同步派生列（扫描写入器使用 Core 批量写入，直接计算派生列）
+@event.listens_for(Movie, "before_insert")
+@event.listens_for(Movie, "before_update")
+def _derive_movie_release(mapper, connection, target):
+    target.year, target.release_ts = derive_release_fields(target.release_date)
+
+
+@event.listens_for(TVShow, "before_insert")
+@event.listens_for(TVShow, "before_update")
+def _derive_tv_show_first_air(mapper, connection, target):
+    target.year, target.first_air_ts = derive_release_fields(target.first_air_date)
+
+
+# 增量迁移：create_all 不会修改已存在的表，新增列在这里补齐
+# (表名, 列名, 列定义, 添加列后执行的回填SQL)
+_DATE_PATTERN = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+COLUMN_MIGRATIONS = [
+    ("movies", "poster_placeholder", "TEXT", None),
+    ("tv_shows", "poster_placeholder", "TEXT", None),
+    ("movies", "year", "INTEGER",
+     "UPDATE movies SET year = CAST(substr(release_date, 1, 4) AS INTEGER) "
+     f"WHERE release_date GLOB {_DATE_PATTERN}"),
+    ("movies", "release_ts", "INTEGER",
+     "UPDATE movies SET release_ts = CAST(strftime('%s', substr(release_date, 1, 10)) AS INTEGER) "
+     f"WHERE release_date GLOB {_DATE_PATTERN}"),
+    ("tv_shows", "year", "INTEGER",
+     "UPDATE tv_shows SET year = CAST(substr(first_air_date, 1, 4) AS INTEGER) "
+     f"WHERE first_air_date GLOB {_DATE_PATTERN}"),
+    ("tv_shows", "first_air_ts", "INTEGER",
+     "UPDATE tv_shows SET first_air_ts = CAST(strftime('%s', substr(first_air_date, 1, 10)) AS INTEGER) "
+     f"WHERE first_air_date GLOB {_DATE_PATTERN}"),
+    ("tv_shows", "episode_runtime", "INTEGER",
+     "UPDATE tv_shows SET episode_runtime = json_extract(episode_run_time, '$[0]') "
+     "WHERE json_valid(episode_run_time)"),
+]
+
+
+# 旧版 JSON 文本列 -> 查找表 + 关联表（旧列存在时用 json_each 回填，随后删除旧列）
+# (主表, 旧列, 查找表, 查找表键列, JSON 键, 其他列, 关联表, 标题列, 条目列)
+JSON_COLUMN_MIGRATIONS = [
+    ("movies", "spoken_languages", "languages", "iso_639_1", "iso_639_1", ("name", "english_name"),
+     "movie_language_association", "movie_id", "language_id"),
+    ("movies", "production_countries", "countries", "iso_3166_1", "iso_3166_1", ("name",),
+     "movie_country_association", "movie_id", "country_id"),
+    ("movies", "production_companies", "companies", "tmdb_id", "id", ("name", "logo_path", "origin_country"),
+     "movie_company_association", "movie_id", "company_id"),
+    ("tv_shows", "spoken_languages", "languages", "iso_639_1", "iso_639_1", ("name", "english_name"),
+     "tv_show_language_association", "tv_show_id", "language_id"),
+    ("tv_shows", "production_countries", "countries", "iso_3166_1", "iso_3166_1", ("name",),
+     "tv_show_country_association", "tv_show_id", "country_id"),
+    ("tv_shows", "production_companies", "companies", "tmdb_id", "id", ("name", "logo_path", "origin_country"),
+     "tv_show_company_association", "tv_show_id", "company_id"),
+    ("tv_shows", "networks", "networks", "tmdb_id", "id", ("name", "logo_path", "origin_country"),
+     "tv_show_network_association", "tv_show_id", "network_id"),
+]
+
+# 已由整数列 / 关联表取代、回填后删除的旧列
+LEGACY_COLUMNS = [("tv_shows", "episode_run_time")]
+
+
+def _migrate_json_column(conn, table, column, lookup, lookup_key, json_key, columns, association, owner, item) -> int:
+    """把旧 JSON 数组列中的条目写入查找表和关联表，返回写入的关联数"""
+    def value(field):
+        return f"json_extract(entry.value, '$.{field}')"
+    
+    source = f"FROM {table}, json_each({table}.{column}) AS entry"
+    condition = f"WHERE json_valid({table}.{column}) AND {value(json_key)} IS NOT NULL"
+    conn.execute(text(
+        f"INSERT OR IGNORE INTO {lookup} ({lookup_key}, {', '.join(columns)}, created_at, updated_at) "
+        f"SELECT {value(json_key)}, {', '.join(value(field) for field in columns)}, "
+        f"CURRENT_TIMESTAMP, CURRENT_TIMESTAMP {source} {condition} GROUP BY {value(json_key)}"
+    ))
+    return conn.execute(text(
+        f"INSERT OR IGNORE INTO {association} ({owner}, {item}) "
+        f"SELECT {table}.id, {lookup}.id {source} "
+        f"JOIN {lookup} ON {lookup}.{lookup_key} = {value(json_key)} {condition}"
+    )).rowcount
+
+
+def _migrate_legacy_credits(
+    conn, table, credits, owner, owner_table, credit_type, character, department, job, order
+) -> int:
+    """把旧表中的人物写入 people、演职员写入 movie_credits / tv_credits，返回写入的演职员数"""
+    # 没有 credit_id 或作品已删除的记录无法对应到新表，随旧表一起删除
+    source = f"FROM {table} AS legacy JOIN {owner_table} ON {owner_table}.id = legacy.{owner}"
+    condition = "WHERE legacy.credit_id IS NOT NULL"
+    conn.execute(text(
+        f"INSERT OR IGNORE INTO people (tmdb_id, name, profile_path, gender, popularity, created_at, updated_at) "
+        f"SELECT legacy.tmdb_id, legacy.name, legacy.profile_path, legacy.gender, legacy.popularity, "
+        f"CURRENT_TIMESTAMP, CURRENT_TIMESTAMP {source} {condition} GROUP BY legacy.tmdb_id"
+    ))
+    return conn.execute(text(
+        f'INSERT OR IGNORE INTO {credits} ({owner}, person_id, credit_type, credit_id, character, department, job, "order") '
+        f"SELECT legacy.{owner}, people.id, {credit_type}, legacy.credit_id, {character}, {department}, {job}, {order} "
+        f"{source} JOIN people ON people.tmdb_id = legacy.tmdb_id {condition}"
+    )).rowcount
+
+
+# 唯一索引建立前的去重SQL（仅在索引尚不存在时执行，按顺序执行）
+# 重复的季保留 id 最小的一行，其下剧集先改挂到保留的季；重复剧集/关联保留最新的一行
+UNIQUE_INDEX_CLEANUPS = {
+    "uq_tv_seasons_show_season": [
+        "UPDATE tv_episodes SET season_id = ("
+        " SELECT MIN(keep.id) FROM tv_seasons AS keep JOIN tv_seasons AS dup"
+        " ON keep.tv_show_id = dup.tv_show_id AND keep.season_number = dup.season_number"
+        " WHERE dup.id = tv_episodes.season_id)"
+        " WHERE season_id NOT IN (SELECT MIN(id) FROM tv_seasons GROUP BY tv_show_id, season_number)",
+        "DELETE FROM tv_seasons WHERE id NOT IN ("
+        " SELECT MIN(id) FROM tv_seasons GROUP BY tv_show_id, season_number)",
+    ],
+    "uq_tv_episodes_season_episode": [
+        "DELETE FROM tv_episodes WHERE id NOT IN ("
+        " SELECT MAX(id) FROM tv_episodes GROUP BY season_id, episode_number)",
+    ],
+    "uq_movie_genre_movie_genre": [
+        "DELETE FROM movie_genre_association WHERE rowid NOT IN ("
+        " SELECT MIN(rowid) FROM movie_genre_association GROUP BY movie_id, genre_id)",
+    ],
+    "uq_tv_show_genre_show_genre": [
+        "DELETE FROM tv_show_genre_association WHERE rowid NOT IN ("
+        " SELECT MIN(rowid) FROM tv_show_genre_association GROUP BY tv_show_id, genre_id)",
+    ],
+}
+
+
+# 已由 people / movie_credits / tv_credits 取代的按作品重复存储人物的旧表（数据迁移后删除）
+# 旧表 -> (演职员表, 作品列, 作品表, credit_type, character, department, job, order)
+LEGACY_CREDIT_TABLES = {
+    "cast_members": ("movie_credits", "movie_id", "movies", "'cast'", "legacy.character", "NULL", "NULL", 'legacy."order"'),
+    "crew_members": ("movie_credits", "movie_id", "movies", "'crew'", "NULL", "legacy.department", "legacy.job", "NULL"),
+    "creators": ("tv_credits", "tv_show_id", "tv_shows", "'crew'", "NULL", "'Writing'", "'Creator'", "NULL"),
+}
+
+
+# 全文搜索：FTS5 外部内容表（不重复存储正文），trigram 分词支持中文及任意位置的子串/前缀匹配
+# 全文索引表名 -> (主表, 索引列)，列顺序与 bm25 权重对应
+FULLTEXT_TABLES = {
+    "movies_fts": ("movies", ("title", "original_title", "overview")),
+    "tv_shows_fts": ("tv_shows", ("name", "original_name", "overview")),
+}
+
+
+# 全文索引是否可用（migrate_db 检测后设置，搜索据此选择 FTS 或 LIKE）
+fulltext_enabled = False
+
+
+def ensure_fulltext_index(conn) -> bool:
+    """创建全文索引表及同步触发器并重建索引（均已存在时跳过），返回 FTS5 是否可用"""
+    for fts_table, (table, columns) in FULLTEXT_TABLES.items():
+        expected = {fts_table, f"{fts_table}_ai", f"{fts_table}_ad", f"{fts_table}_au"}
+        existing = {
+            row[0] for row in conn.execute(
+                text("SELECT name FROM sqlite_master WHERE name LIKE :prefix"),
+                {"prefix": f"{fts_table}%"}
+            )
+        }
+        if expected <= existing:
+            continue
+        
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        try:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+                f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')"
+            ))
+        except Exception as e:
+            logger.warning(f"当前 SQLite 不支持 FTS5 trigram 分词，搜索将使用 LIKE 匹配: {e}")
+            return False
+        
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+            f"VALUES ('delete', old.id, {old_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+        logger.info(f"数据库迁移: 全文索引 {fts_table} 已建立")
+    return True
+
+
+def migrate_db():
+    """对已有数据库执行增量迁移"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, ddl, backfill in COLUMN_MIGRATIONS:
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                if backfill:
+                    conn.execute(text(backfill))
+                logger.info(f"数据库迁移: {table}.{column} 已添加")
+        
+        # 补建模型中新增的索引（create_all 只会为新表建索引）
+        for table in Base.metadata.sorted_tables:
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                for statement in UNIQUE_INDEX_CLEANUPS.get(index.name, []):
+                    affected = conn.execute(text(statement)).rowcount
+                    if affected:
+                        logger.warning(f"数据库迁移: 建立 {index.name} 前处理了 {affected} 行重复数据")
+                index.create(conn)
+                logger.info(f"数据库迁移: 索引 {index.name} 已创建")
+    
+        for table, column, *spec in JSON_COLUMN_MIGRATIONS:
+            if column in {col["name"] for col in inspector.get_columns(table)}:
+                linked = _migrate_json_column(conn, table, column, *spec)
+                logger.info(f"数据库迁移: {table}.{column} 已转换为 {spec[4]}（{linked} 条关联）")
+        # DROP COLUMN 需要 SQLite 3.35+，更早的版本保留旧列（回填可重复执行）
+        legacy_columns = [(table, column) for table, column, *_ in JSON_COLUMN_MIGRATIONS] + LEGACY_COLUMNS
+        for table, column in legacy_columns if sqlite3.sqlite_version_info >= (3, 35) else []:
+            if column in {col["name"] for col in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+                logger.info(f"数据库迁移: 旧列 {table}.{column} 已删除")
+        
+        existing_tables = set(inspector.get_table_names())
+        for table, spec in LEGACY_CREDIT_TABLES.items():
+            if table not in existing_tables:
+                continue
+            migrated = _migrate_legacy_credits(conn, table, *spec)
+            conn.execute(text(f"DROP TABLE {table}"))
+            logger.info(f"数据库迁移: 旧表 {table} 已迁移到 {spec[0]}（{migrated} 条演职员）并删除")
+    
+    global fulltext_enabled
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            fulltext_enabled = ensure_fulltext_index(conn)
+
+
 # 删除所有表（仅用于开发）
 def drop_tables():
     """删除所有数据库表"""
@@ -338,6 +911,15 @@ def drop_tables():
 def init_db():
     """初始化数据库"""
     create_tables()
+    migrate_db()
+    
+    # 媒体库状态行（多个进程同时启动时只有一个插入生效）
+    with engine.begin() as conn:
+        conn.execute(
+            sqlite_insert(LibraryState)
+            .values(id=LIBRARY_STATE_ID, library_id=uuid.uuid4().hex, generation=0)
+            .on_conflict_do_nothing()
+        )
     
     # 可以在这里添加初始数据
     # 例如：创建默认类型数据等
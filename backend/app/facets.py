@@ -0,0 +1,98 @@
+"""
+SceneScape Backend - 分面统计
+统计当前筛选条件下各类型、年份、评分区间和状态的标题数，供筛选侧栏使用：
+筛选结果作为 CTE，各分面的 GROUP BY 以 UNION ALL 合并为一条语句，一次往返完成
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, Select, String, cast, func, literal, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Genre, movie_genre_association, tv_show_genre_association
+
+FACET_TOTAL = "total"
+FACET_GENRE = "genre"
+FACET_YEAR = "year"
+FACET_RATING = "rating"
+FACET_STATUS = "status"
+
+# 主表 -> (类型关联表, 关联表中的标题列)
+GENRE_ASSOCIATIONS = {
+    "movies": (movie_genre_association, "movie_id"),
+    "tv_shows": (tv_show_genre_association, "tv_show_id"),
+}
+
+
+@dataclass
+class Facets:
+    """分面统计结果：各分面为 (值, 数量) 列表"""
+    total: int = 0
+    genres: List[Tuple[str, int]] = field(default_factory=list)
+    years: List[Tuple[int, int]] = field(default_factory=list)
+    decades: List[Tuple[int, int]] = field(default_factory=list)
+    ratings: List[Tuple[int, int]] = field(default_factory=list)  # 评分区间下限（0-9）
+    statuses: List[Tuple[str, int]] = field(default_factory=list)
+
+
+def facet_base(model) -> Select:
+    """分面统计的基础查询（在此之上添加与列表接口相同的筛选条件）"""
+    return select(model.id, model.year, model.vote_average, model.status)
+
+
+def facet_query(query: Select, model) -> Select:
+    """把筛选后的查询汇总为各分面的分组计数：(分面, 值, 数量)"""
+    filtered = query.order_by(None).cte("filtered")
+    association, owner_column = GENRE_ASSOCIATIONS[model.__tablename__]
+    # 评分区间：按整数下限分组，10 分并入 9
+    rating = func.min(cast(filtered.c.vote_average, Integer), 9)
+    
+    def grouped(facet: str, value):
+        return (
+            select(literal(facet).label("facet"), cast(value, String).label("value"), func.count().label("count"))
+            .select_from(filtered)
+            .where(value.isnot(None))
+            .group_by(value)
+        )
+    
+    genres = (
+        select(literal(FACET_GENRE), Genre.name, func.count())
+        .select_from(filtered)
+        .join(association, association.c[owner_column] == filtered.c.id)
+        .join(Genre, Genre.id == association.c.genre_id)
+        .group_by(Genre.name)
+    )
+    return union_all(
+        select(
+            literal(FACET_TOTAL).label("facet"), cast(null(), String).label("value"), func.count().label("count")
+        ).select_from(filtered),
+        genres,
+        grouped(FACET_YEAR, filtered.c.year),
+        grouped(FACET_RATING, rating),
+        grouped(FACET_STATUS, filtered.c.status),
+    )
+
+
+async def compute_facets(db: AsyncSession, query: Select, model) -> Facets:
+    """执行分面统计（单条语句）"""
+    groups: Dict[str, List[Tuple[str, int]]] = {}
+    for facet, value, count in await db.execute(facet_query(query, model)):
+        groups.setdefault(facet, []).append((value, count))
+    
+    years = sorted((int(value), count) for value, count in groups.get(FACET_YEAR, []))
+    decades: Dict[int, int] = {}
+    for year, count in years:
+        decades[year // 10 * 10] = decades.get(year // 10 * 10, 0) + count
+    
+    def by_count(items):
+        return sorted(items, key=lambda item: (-item[1], item[0]))
+    
+    return Facets(
+        total=groups[FACET_TOTAL][0][1],
+        genres=by_count(groups.get(FACET_GENRE, [])),
+        years=years,
+        decades=sorted(decades.items()),
+        ratings=sorted((int(value), count) for value, count in groups.get(FACET_RATING, [])),
+        statuses=by_count(groups.get(FACET_STATUS, [])),
+    )
@@ -5,20 +5,175 @@ SceneScape Backend - 图片下载和缓存服务
 """
 
 import asyncio
+import base64
 import hashlib
+import io
 import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import aiofiles
 import aiohttp
 from PIL import Image
+from sqlalchemy import bindparam, update
+from starlette.staticfiles import StaticFiles
 
+from .cache import bump_library_generation
 from .config import settings
+from .database import AsyncSessionLocal, Movie, TVShow, next_library_generation
+from .task_manager import BackgroundTask, TaskManager
 
 logger = logging.getLogger(__name__)
 
+IMAGE_TYPES = ("poster", "backdrop")
+
+# 流式下载的分块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 低质量占位图的最大边长（像素）
+PLACEHOLDER_SIZE = 16
+
+# 海报占位图批量写入数据库的间隔（秒）
+PLACEHOLDER_FLUSH_INTERVAL = 2.0
+
+
+def _partial_path(final_path: Path) -> Path:
+    """生成与目标文件同目录的临时文件路径（保证 os.replace 为原子操作）"""
+    return final_path.with_name(f".{final_path.name}.{uuid.uuid4().hex}.part")
+
+
+class ImageCacheIndex:
+    """
+    图片缓存索引
+
+    使用独立的小型 SQLite 数据库记录每个缓存文件的大小、最后访问时间和变体，
+    淘汰和统计都基于索引完成，不再遍历缓存目录。
+    """
+    
+    def __init__(self, index_path: Path):
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.is_new = not index_path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(index_path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cached_images (
+                cache_key TEXT PRIMARY KEY,
+                image_type TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cached_images_last_access "
+            "ON cached_images (last_access)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cached_images)")}
+        if "placeholder" not in columns:
+            self._conn.execute("ALTER TABLE cached_images ADD COLUMN placeholder TEXT")
+    
+    def upsert(self, cache_key: str, image_type: str, variant: str, size: int) -> int:
+        """写入或更新索引记录，返回旧记录的大小（不存在时为-1）"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM cached_images WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO cached_images
+                    (cache_key, image_type, variant, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    size = excluded.size,
+                    variant = excluded.variant,
+                    last_access = excluded.last_access
+                """,
+                (cache_key, image_type, variant, size, now, now),
+            )
+        return row[0] if row else -1
+    
+    def set_placeholder(self, cache_key: str, placeholder: str):
+        """保存图片的低质量占位图"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE cached_images SET placeholder = ? WHERE cache_key = ?",
+                (placeholder, cache_key),
+            )
+    
+    def get_placeholder(self, cache_key: str) -> Optional[str]:
+        """读取图片的低质量占位图"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT placeholder FROM cached_images WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def touch_many(self, accesses: Dict[str, float]):
+        """批量更新最后访问时间"""
+        if not accesses:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE cached_images SET last_access = ? WHERE cache_key = ?",
+                [(ts, key) for key, ts in accesses.items()],
+            )
+            self._conn.execute("COMMIT")
+    
+    def least_recently_used(self, limit: int) -> List[Tuple[str, str, int]]:
+        """按最后访问时间升序返回 (cache_key, image_type, size)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT cache_key, image_type, size FROM cached_images "
+                "ORDER BY last_access LIMIT ?",
+                (limit,),
+            ).fetchall()
+    
+    def accessed_before(self, timestamp: float) -> List[Tuple[str, str, int]]:
+        """返回最后访问时间早于指定时间的记录"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT cache_key, image_type, size FROM cached_images "
+                "WHERE last_access < ?",
+                (timestamp,),
+            ).fetchall()
+    
+    def remove(self, cache_keys: List[str]):
+        """删除索引记录"""
+        if not cache_keys:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "DELETE FROM cached_images WHERE cache_key = ?",
+                [(key,) for key in cache_keys],
+            )
+            self._conn.execute("COMMIT")
+    
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        """按图片类型汇总 (文件数, 总字节数)，仅在启动时调用一次"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT image_type, COUNT(*), COALESCE(SUM(size), 0) "
+                "FROM cached_images GROUP BY image_type"
+            ).fetchall()
+        return {image_type: (count, size) for image_type, count, size in rows}
+
+
 class ImageCacheService:
     """图片缓存服务"""
     
@@ -28,6 +183,28 @@ class ImageCacheService:
         self.poster_dir.mkdir(parents=True, exist_ok=True)
         self.backdrop_dir.mkdir(parents=True, exist_ok=True)
         
+        # 缓存索引和计数器（写入和淘汰时更新，统计时无需遍历目录）
+        self.index = ImageCacheIndex(Path(settings.image_cache_index_path))
+        self.max_bytes = settings.image_cache_max_bytes
+        self._stats_lock = threading.Lock()
+        self._counters = {image_type: {"count": 0, "size": 0} for image_type in IMAGE_TYPES}
+        for image_type, (count, size) in self.index.totals().items():
+            if image_type in self._counters:
+                self._counters[image_type] = {"count": count, "size": size}
+        
+        # 待写入索引的访问记录，由后台任务批量落盘（事件循环写入、线程池中取出，交换时加锁）
+        self._pending_access: Dict[str, float] = {}
+        self._access_lock = threading.Lock()
+        self._evict_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # 待写入标题记录的海报占位图（(媒体类型, id) -> data URI），由后台任务按批次写入
+        self._pending_placeholders: Dict[Tuple[str, int], str] = {}
+        
+        # 进行中的下载（按缓存键去重）和共享的HTTP会话
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        
         # TMDb图片基础URL
         self.tmdb_image_base_url = "https://image.tmdb.org/t/p/"
         
@@ -65,6 +242,66 @@ class ImageCacheService:
         else:
             raise ValueError(f"Unknown image type: {image_type}")
     
+    @staticmethod
+    def _get_cache_key(image_type: str, filename: str) -> str:
+        """生成索引键（与静态文件URL路径一致）"""
+        return f"{image_type}s/{filename}"
+    
+    @staticmethod
+    def _get_variant(file_path: Path) -> str:
+        """索引中的文件类别：缩略图或下载的原图（按文件名判断，下载与重建索引时一致）"""
+        return "thumb" if "_thumb_" in file_path.stem else "original"
+    
+    def _record_file(self, image_type: str, file_path: Path):
+        """记录新写入的缓存文件并更新计数器"""
+        size = file_path.stat().st_size
+        old_size = self.index.upsert(
+            self._get_cache_key(image_type, file_path.name), image_type, self._get_variant(file_path), size
+        )
+        with self._stats_lock:
+            counter = self._counters[image_type]
+            if old_size < 0:
+                counter["count"] += 1
+                counter["size"] += size
+            else:
+                counter["size"] += size - old_size
+            over_budget = self._total_size() > self.max_bytes
+        
+        # 超出预算时唤醒后台淘汰任务（可能在线程池中调用）
+        if over_budget and self._evict_event is not None:
+            self._loop.call_soon_threadsafe(self._evict_event.set)
+    
+    def _forget_files(self, entries: List[Tuple[str, str, int]]) -> Dict[str, int]:
+        """删除缓存文件和索引记录，返回各类型删除数量及释放字节数"""
+        removed = {image_type: 0 for image_type in IMAGE_TYPES}
+        freed = 0
+        keys = []
+        for cache_key, image_type, size in entries:
+            image_dir = self.poster_dir if image_type == "poster" else self.backdrop_dir
+            try:
+                (image_dir / Path(cache_key).name).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"删除缓存文件失败 {cache_key}: {e}")
+                continue
+            keys.append(cache_key)
+            removed[image_type] += 1
+            freed += size
+            with self._stats_lock:
+                self._counters[image_type]["count"] -= 1
+                self._counters[image_type]["size"] -= size
+        
+        self.index.remove(keys)
+        removed["freed"] = freed
+        return removed
+    
+    def _total_size(self) -> int:
+        return sum(counter["size"] for counter in self._counters.values())
+    
+    def touch(self, image_type: str, filename: str):
+        """记录一次缓存命中（仅写入内存，由后台任务批量落盘）"""
+        with self._access_lock:
+            self._pending_access[self._get_cache_key(image_type, filename)] = time.time()
+    
     async def download_image(
         self, 
         image_path: str, 
@@ -95,37 +332,79 @@ class ImageCacheService:
         
         # 如果文件已存在，直接返回
         if cache_path.exists():
+            self.touch(image_type, cache_filename)
             return f"/{image_type}s/{cache_filename}"
         
-        # 构建完整的图片URL
+        # 同一图片的并发请求共享一次下载
+        cache_key = self._get_cache_key(image_type, cache_filename)
+        download = self._inflight.get(cache_key)
+        if download is None:
+            download = asyncio.ensure_future(
+                self._fetch_image(image_path, image_type, size, cache_path)
+            )
+            self._inflight[cache_key] = download
+            download.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        
+        # shield: 单个调用方被取消时不影响其他等待者
+        return await asyncio.shield(download)
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话（复用连接）"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=settings.request_timeout)
+            )
+        return self._session
+    
+    async def close(self):
+        """关闭HTTP会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+    
+    async def _fetch_image(
+        self,
+        image_path: str,
+        image_type: str,
+        size: str,
+        cache_path: Path
+    ) -> Optional[str]:
+        """流式下载图片到临时文件，完成后原子重命名为缓存文件"""
         image_url = f"{self.tmdb_image_base_url}{size}{image_path}"
+        partial_path = _partial_path(cache_path)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        # 下载图片
-                        image_data = await response.read()
-                        
-                        # 保存原始图片
-                        async with aiofiles.open(cache_path, 'wb') as f:
-                            await f.write(image_data)
-                        
-                        # 生成缩略图（可选）
-                        await self._generate_thumbnails(cache_path, image_type)
-                        
-                        logger.info(f"成功下载图片: {image_url} -> {cache_path}")
-                        return f"/{image_type}s/{cache_filename}"
-                    else:
-                        logger.warning(f"下载图片失败 {image_url}: HTTP {response.status}")
-                        return None
-                        
+            session = await self._get_session()
+            async with session.get(image_url) as response:
+                if response.status != 200:
+                    logger.warning(f"下载图片失败 {image_url}: HTTP {response.status}")
+                    return None
+                
+                # 分块写入临时文件，内存占用与图片大小无关
+                async with aiofiles.open(partial_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
+            
+            os.replace(partial_path, cache_path)
+            self._record_file(image_type, cache_path)
+            
+            # 生成缩略图和低质量占位图
+            placeholder = await self._generate_thumbnails(cache_path, image_type)
+            if placeholder:
+                self.index.set_placeholder(
+                    self._get_cache_key(image_type, cache_path.name), placeholder
+                )
+            
+            logger.info(f"成功下载图片: {image_url} -> {cache_path}")
+            return f"/{image_type}s/{cache_path.name}"
+            
         except Exception as e:
             logger.error(f"下载图片时出错 {image_url}: {e}")
             return None
+        finally:
+            partial_path.unlink(missing_ok=True)
     
-    async def _generate_thumbnails(self, image_path: Path, image_type: str):
-        """生成不同尺寸的缩略图"""
+    async def _generate_thumbnails(self, image_path: Path, image_type: str) -> Optional[str]:
+        """生成不同尺寸的缩略图，返回低质量占位图"""
         try:
             # 定义缩略图尺寸
             thumbnail_sizes = {
@@ -134,21 +413,34 @@ class ImageCacheService:
             }
             
             if image_type not in thumbnail_sizes:
-                return
+                return None
             
             # 使用线程池处理图片操作
-            await asyncio.get_event_loop().run_in_executor(
+            return await asyncio.get_event_loop().run_in_executor(
                 None, 
                 self._create_thumbnails_sync, 
                 image_path, 
+                image_type,
                 thumbnail_sizes[image_type]
             )
             
         except Exception as e:
             logger.error(f"生成缩略图失败 {image_path}: {e}")
+            return None
     
-    def _create_thumbnails_sync(self, image_path: Path, sizes: list):
-        """同步创建缩略图"""
+    @staticmethod
+    def _make_placeholder(img: Image.Image) -> str:
+        """生成极小尺寸的 base64 JPEG（data URI），用于首屏模糊占位"""
+        tiny = img.copy()
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+        buffer = io.BytesIO()
+        tiny.save(buffer, "JPEG", quality=50)
+        return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    
+    def _create_thumbnails_sync(
+        self, image_path: Path, image_type: str, sizes: list
+    ) -> Optional[str]:
+        """同步创建缩略图，返回低质量占位图"""
         try:
             with Image.open(image_path) as img:
                 # 转换为RGB模式（处理RGBA等格式）
@@ -160,12 +452,22 @@ class ImageCacheService:
                     thumb_filename = f"{image_path.stem}_thumb_{width}x{height}{image_path.suffix}"
                     thumb_path = image_path.parent / thumb_filename
                     
-                    # 创建缩略图
-                    img.thumbnail((width, height), Image.Resampling.LANCZOS)
-                    img.save(thumb_path, "JPEG", quality=85, optimize=True)
+                    # 创建缩略图（基于副本，避免后续尺寸在已缩小的图片上生成）
+                    thumb = img.copy()
+                    thumb.thumbnail((width, height), Image.Resampling.LANCZOS)
+                    partial_path = _partial_path(thumb_path)
+                    try:
+                        thumb.save(partial_path, "JPEG", quality=85, optimize=True)
+                        os.replace(partial_path, thumb_path)
+                    finally:
+                        partial_path.unlink(missing_ok=True)
+                    self._record_file(image_type, thumb_path)
+                
+                return self._make_placeholder(img)
                     
         except Exception as e:
             logger.error(f"创建缩略图时出错: {e}")
+            return None
     
     async def download_poster(self, poster_path: str, size: str = None) -> Optional[str]:
         """下载海报图片"""
@@ -233,13 +535,44 @@ class ImageCacheService:
         cache_path = self._get_cache_path(image_type, cache_filename)
         
         if cache_path.exists():
+            self.touch(image_type, cache_filename)
             return f"/{image_type}s/{cache_filename}"
         
         return None
     
+    async def get_placeholder(
+        self, image_path: str, image_type: str, size: str = None
+    ) -> Optional[str]:
+        """获取已缓存图片的占位图，缺失时（如旧缓存）从缓存文件补算"""
+        if not size:
+            size = self.default_poster_size if image_type == "poster" else self.default_backdrop_size
+        
+        cache_filename = self._get_cache_filename(image_path, size)
+        cache_key = self._get_cache_key(image_type, cache_filename)
+        placeholder = self.index.get_placeholder(cache_key)
+        if placeholder:
+            return placeholder
+        
+        cache_path = self._get_cache_path(image_type, cache_filename)
+        if not cache_path.exists():
+            return None
+        
+        def _compute() -> Optional[str]:
+            with Image.open(cache_path) as img:
+                return self._make_placeholder(img.convert('RGB'))
+        
+        try:
+            placeholder = await asyncio.get_event_loop().run_in_executor(None, _compute)
+        except Exception as e:
+            logger.error(f"生成占位图失败 {cache_path}: {e}")
+            return None
+        
+        self.index.set_placeholder(cache_key, placeholder)
+        return placeholder
+    
     def cleanup_cache(self, max_age_days: int = 30) -> dict:
         """
-        清理过期的缓存文件
+        清理长时间未访问的缓存文件
         
         Args:
             max_age_days: 最大保存天数
@@ -247,72 +580,270 @@ class ImageCacheService:
         Returns:
             清理结果统计
         """
-        import time
-        from datetime import datetime, timedelta
-        
-        max_age = datetime.now() - timedelta(days=max_age_days)
-        max_age_timestamp = max_age.timestamp()
+        self.flush_access_log()
+        cutoff = time.time() - max_age_days * 86400
+        removed = self._forget_files(self.index.accessed_before(cutoff))
         
         cleanup_stats = {
-            "posters_deleted": 0,
-            "backdrops_deleted": 0,
-            "total_size_freed": 0
+            "posters_deleted": removed["poster"],
+            "backdrops_deleted": removed["backdrop"],
+            "total_size_freed": removed["freed"]
         }
         
-        # 清理海报缓存
-        for poster_file in self.poster_dir.iterdir():
-            if poster_file.is_file():
-                file_mtime = poster_file.stat().st_mtime
-                if file_mtime < max_age_timestamp:
-                    file_size = poster_file.stat().st_size
-                    poster_file.unlink()
-                    cleanup_stats["posters_deleted"] += 1
-                    cleanup_stats["total_size_freed"] += file_size
-        
-        # 清理背景图片缓存
-        for backdrop_file in self.backdrop_dir.iterdir():
-            if backdrop_file.is_file():
-                file_mtime = backdrop_file.stat().st_mtime
-                if file_mtime < max_age_timestamp:
-                    file_size = backdrop_file.stat().st_size
-                    backdrop_file.unlink()
-                    cleanup_stats["backdrops_deleted"] += 1
-                    cleanup_stats["total_size_freed"] += file_size
-        
         logger.info(f"缓存清理完成: {cleanup_stats}")
         return cleanup_stats
     
+    def enforce_budget(self, batch_size: int = 200) -> dict:
+        """
+        按LRU淘汰缓存，直到总大小回落到预算的90%以内
+        
+        Args:
+            batch_size: 每次从索引读取的候选数量
+            
+        Returns:
+            淘汰结果统计
+        """
+        self.flush_access_log()
+        target = int(self.max_bytes * 0.9)
+        evicted = {"posters_evicted": 0, "backdrops_evicted": 0, "total_size_freed": 0}
+        
+        if self._total_size() <= self.max_bytes:
+            return evicted
+        
+        while self._total_size() > target:
+            candidates = self.index.least_recently_used(batch_size)
+            if not candidates:
+                break
+            
+            to_remove = []
+            excess = self._total_size() - target
+            for entry in candidates:
+                if excess <= 0:
+                    break
+                to_remove.append(entry)
+                excess -= entry[2]
+            
+            removed = self._forget_files(to_remove)
+            if not removed["poster"] and not removed["backdrop"]:
+                break
+            evicted["posters_evicted"] += removed["poster"]
+            evicted["backdrops_evicted"] += removed["backdrop"]
+            evicted["total_size_freed"] += removed["freed"]
+        
+        if evicted["total_size_freed"]:
+            logger.info(f"缓存LRU淘汰完成: {evicted}")
+        return evicted
+    
+    def flush_access_log(self):
+        """将内存中的访问记录批量写入索引"""
+        with self._access_lock:
+            if not self._pending_access:
+                return
+            pending, self._pending_access = self._pending_access, {}
+        self.index.touch_many(pending)
+    
+    def queue_placeholder(self, media_type: str, media_id: int, placeholder: str):
+        """记录标题的海报占位图（仅写入内存，由后台任务批量写入数据库）"""
+        self._pending_placeholders[(media_type, media_id)] = placeholder
+    
+    async def flush_placeholders(self) -> int:
+        """
+        将待写入的占位图在一个事务中写入电影/电视剧记录（按主键批量更新，已删除的标题跳过）
+        
+        整批只递增一次媒体库代数；写入失败时放回队列，下次重试
+        """
+        if not self._pending_placeholders:
+            return 0
+        pending, self._pending_placeholders = self._pending_placeholders, {}
+        rows = {Movie: [], TVShow: []}
+        for (media_type, media_id), placeholder in pending.items():
+            model = Movie if media_type == "movie" else TVShow
+            rows[model].append({"title_id": media_id, "placeholder": placeholder})
+        
+        try:
+            async with AsyncSessionLocal() as db:
+                for model, values in rows.items():
+                    if values:
+                        table = model.__table__
+                        await db.execute(
+                            update(table)
+                            .where(table.c.id == bindparam("title_id"))
+                            .values(poster_placeholder=bindparam("placeholder")),
+                            values
+                        )
+                generation = await db.run_sync(next_library_generation)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"写入海报占位图失败，{len(pending)} 条稍后重试: {e}")
+            self._pending_placeholders = {**pending, **self._pending_placeholders}
+            return 0
+        
+        # 占位图包含在列表/详情响应中
+        bump_library_generation(generation)
+        return len(pending)
+    
+    async def run_placeholder_writer(self):
+        """后台任务：定期批量写入海报占位图"""
+        while True:
+            await asyncio.sleep(PLACEHOLDER_FLUSH_INTERVAL)
+            await self.flush_placeholders()
+    
+    def _purge_partial_files(self):
+        """删除上次异常退出遗留的未完成下载"""
+        for directory in (self.poster_dir, self.backdrop_dir):
+            for partial in directory.glob(".*.part"):
+                partial.unlink(missing_ok=True)
+    
+    def rebuild_index(self) -> int:
+        """根据磁盘文件重建索引（仅在索引首次创建时执行一次）"""
+        count = 0
+        for image_type, directory in (("poster", self.poster_dir), ("backdrop", self.backdrop_dir)):
+            for file_path in directory.iterdir():
+                if file_path.is_file() and not file_path.name.startswith("."):
+                    self._record_file(image_type, file_path)
+                    count += 1
+        
+        self.index.is_new = False
+        logger.info(f"图片缓存索引重建完成，共 {count} 个文件")
+        return count
+    
+    async def run_eviction_worker(self):
+        """后台淘汰任务：定期落盘访问记录并执行容量预算"""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._evict_event = asyncio.Event()
+        
+        await loop.run_in_executor(None, self._purge_partial_files)
+        if self.index.is_new:
+            await loop.run_in_executor(None, self.rebuild_index)
+        
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._evict_event.wait(),
+                    timeout=settings.image_cache_evict_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._evict_event.clear()
+            
+            try:
+                await loop.run_in_executor(None, self.enforce_budget)
+            except Exception as e:
+                logger.error(f"图片缓存淘汰出错: {e}")
+    
     def get_cache_stats(self) -> dict:
-        """获取缓存统计信息"""
-        poster_stats = self._get_directory_stats(self.poster_dir)
-        backdrop_stats = self._get_directory_stats(self.backdrop_dir)
+        """获取缓存统计信息（来自计数器，不遍历目录）"""
+        with self._stats_lock:
+            poster_stats = self._format_stats(self._counters["poster"])
+            backdrop_stats = self._format_stats(self._counters["backdrop"])
         
         return {
             "posters": poster_stats,
             "backdrops": backdrop_stats,
             "total_files": poster_stats["count"] + backdrop_stats["count"],
-            "total_size": poster_stats["size"] + backdrop_stats["size"]
+            "total_size": poster_stats["size"] + backdrop_stats["size"],
+            "max_size": self.max_bytes
         }
     
-    def _get_directory_stats(self, directory: Path) -> dict:
-        """获取目录统计信息"""
-        total_size = 0
-        file_count = 0
-        
-        for file_path in directory.iterdir():
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
-                file_count += 1
-        
+    @staticmethod
+    def _format_stats(counter: dict) -> dict:
+        """格式化统计信息"""
         return {
-            "count": file_count,
-            "size": total_size,
-            "size_mb": round(total_size / (1024 * 1024), 2)
+            "count": counter["count"],
+            "size": counter["size"],
+            "size_mb": round(counter["size"] / (1024 * 1024), 2)
         }
 
+
+class CachedImageFiles(StaticFiles):
+    """图片静态文件服务，命中时记录访问以支持LRU淘汰"""
+    
+    def __init__(self, *args, image_type: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_type = image_type
+    
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            image_cache_service.touch(self.image_type, Path(path).name)
+            # 缓存文件名由 TMDb 图片路径和尺寸决定，内容不会变化，浏览器可长期缓存
+            response.headers["Cache-Control"] = f"public, max-age={settings.image_http_max_age}, immutable"
+        return response
+
 # 全局图片缓存服务实例
 image_cache_service = ImageCacheService()
 
+# 封面预取任务管理器（独立的并发预算，不与元数据解析争抢资源）
+artwork_task_manager = TaskManager(
+    max_concurrent_tasks=settings.artwork_prefetch_concurrency,
+    name="artwork"
+)
+
+
+async def prefetch_artwork(
+    task: BackgroundTask,
+    media_type: str,
+    media_id: int,
+    poster_path: Optional[str],
+    backdrop_path: Optional[str]
+) -> dict:
+    """预取任务：下载海报和背景图（缩略图随下载生成），海报占位图交给批量写入"""
+    results = {}
+    if poster_path:
+        results["poster"] = await image_cache_service.download_poster(poster_path)
+        placeholder = results["poster"] and await image_cache_service.get_placeholder(
+            poster_path, "poster"
+        )
+        if placeholder:
+            image_cache_service.queue_placeholder(media_type, media_id, placeholder)
+    if backdrop_path:
+        results["backdrop"] = await image_cache_service.download_backdrop(backdrop_path)
+    return results
+
+
+def enqueue_artwork_prefetch(
+    media_type: str,
+    media_id: int,
+    poster_path: Optional[str],
+    backdrop_path: Optional[str],
+    has_placeholder: bool = False
+) -> Optional[str]:
+    """
+    将标题的封面加入独立的预取队列（由并发数较低的 artwork 任务管理器执行）
+    
+    Args:
+        media_type: movie 或 tv_show
+        media_id: 本地记录ID
+        poster_path: TMDb海报路径
+        backdrop_path: TMDb背景图路径
+        has_placeholder: 记录是否已有海报占位图
+    
+    Returns:
+        任务ID，图片均已缓存且占位图已存在或无图片时返回None
+    """
+    if (
+        poster_path
+        and has_placeholder
+        and image_cache_service.get_cached_image_path(poster_path, "poster")
+    ):
+        poster_path = None
+    if backdrop_path and image_cache_service.get_cached_image_path(backdrop_path, "backdrop"):
+        backdrop_path = None
+    if not poster_path and not backdrop_path:
+        return None
+    
+    return artwork_task_manager.create_task(
+        f"预取封面 {media_type}:{media_id}",
+        prefetch_artwork,
+        media_type,
+        media_id,
+        poster_path,
+        backdrop_path,
+        metadata={"media_type": media_type, "media_id": media_id}
+    )
+
+
 # 便捷函数
 async def download_poster(poster_path: str, size: str = None) -> Optional[str]:
     """下载海报的便捷函数"""
@@ -0,0 +1,256 @@
+"""
+SceneScape Backend - 媒体库统计
+统计数据物化在 library_stats 表中：扫描写入器在同一写事务内比较受影响行写入前后的快照，
+把差值累加到统计行；维护任务可按当前数据整体重建。/api/stats 只需读取少量统计行
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .database import (
+    LibraryStat, Movie, TVEpisode, TVSeason, TVShow,
+    movie_genre_association, tv_show_genre_association
+)
+
+logger = logging.getLogger(__name__)
+
+# 统计范围
+SCOPE_TOTAL = "total"
+SCOPE_GENRE = "genre"
+SCOPE_YEAR = "year"
+SCOPE_DAY = "day"
+
+STAT_FIELDS = ("movie_count", "tv_show_count", "episode_count", "total_bytes")
+
+
+@dataclass(frozen=True)
+class TitleFacts:
+    """影响统计的标题属性"""
+    year: Optional[int]
+    file_size: int
+    added_on: Optional[str]  # 入库日期 YYYY-MM-DD
+    genre_ids: Tuple[int, ...]
+
+
+@dataclass
+class LibrarySnapshot:
+    """受影响行在某一时刻的统计属性"""
+    movies: Dict[int, TitleFacts] = field(default_factory=dict)
+    tv_shows: Dict[int, TitleFacts] = field(default_factory=dict)
+    episodes: Dict[int, int] = field(default_factory=dict)  # 剧集 id -> 文件大小
+
+
+class StatsDelta:
+    """统计行的增量：(scope, key) -> 各字段变化量"""
+    
+    def __init__(self):
+        self.rows: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    
+    def add(self, scope: str, key, stat: str, amount: int = 1):
+        self.rows[(scope, "" if key is None else str(key))][stat] += amount
+    
+    def add_title(self, facts: TitleFacts, stat: str, sign: int):
+        """计入（sign=1）或移除（sign=-1）一部电影/电视剧"""
+        self.add(SCOPE_TOTAL, "", stat, sign)
+        if facts.year is not None:
+            self.add(SCOPE_YEAR, facts.year, stat, sign)
+        if facts.added_on:
+            self.add(SCOPE_DAY, facts.added_on, stat, sign)
+        for genre_id in facts.genre_ids:
+            self.add(SCOPE_GENRE, genre_id, stat, sign)
+    
+    def changes(self) -> List[Dict]:
+        """非零的增量行"""
+        return [
+            {"scope": scope, "key": key, **values}
+            for (scope, key), values in self.rows.items()
+            if any(values.values())
+        ]
+
+
+def _added_on(created_at) -> Optional[str]:
+    if created_at is None:
+        return None
+    if isinstance(created_at, str):
+        return created_at[:10]
+    return created_at.strftime("%Y-%m-%d")
+
+
+def _title_facts(db: Session, model, association, owner_column: str, conditions: list) -> Dict[int, TitleFacts]:
+    columns = [model.id, model.year, model.created_at]
+    if model is Movie:
+        # 电视剧的文件大小由其剧集计入
+        columns.append(Movie.file_size)
+    rows = db.execute(select(*columns).where(or_(*conditions))).all()
+    if not rows:
+        return {}
+    
+    owner = association.c[owner_column]
+    genres = defaultdict(list)
+    for owner_id, genre_id in db.execute(
+        select(owner, association.c.genre_id).where(owner.in_([row.id for row in rows]))
+    ):
+        genres[owner_id].append(genre_id)
+    return {
+        row.id: TitleFacts(
+            row.year,
+            getattr(row, "file_size", None) or 0,
+            _added_on(row.created_at),
+            tuple(sorted(genres[row.id]))
+        )
+        for row in rows
+    }
+
+
+def take_snapshot(
+    db: Session,
+    movie_tmdb_ids: Iterable[int] = (),
+    show_tmdb_ids: Iterable[int] = (),
+    movie_paths: Iterable[str] = (),
+    episode_paths: Iterable[str] = ()
+) -> LibrarySnapshot:
+    """读取一个批次会影响到的电影、电视剧和剧集（写入前后各调用一次）"""
+    movie_tmdb_ids, show_tmdb_ids = list(movie_tmdb_ids), list(show_tmdb_ids)
+    movie_paths, episode_paths = list(movie_paths), list(episode_paths)
+    snapshot = LibrarySnapshot()
+    
+    movie_conditions = []
+    if movie_tmdb_ids:
+        movie_conditions.append(Movie.tmdb_id.in_(movie_tmdb_ids))
+    if movie_paths:
+        movie_conditions.append(Movie.local_path.in_(movie_paths))
+    if movie_conditions:
+        snapshot.movies = _title_facts(db, Movie, movie_genre_association, "movie_id", movie_conditions)
+    
+    if show_tmdb_ids:
+        snapshot.tv_shows = _title_facts(
+            db, TVShow, tv_show_genre_association, "tv_show_id", [TVShow.tmdb_id.in_(show_tmdb_ids)]
+        )
+        snapshot.episodes.update(db.execute(
+            select(TVEpisode.id, TVEpisode.file_size)
+            .join(TVSeason, TVEpisode.season_id == TVSeason.id)
+            .where(TVSeason.tv_show_id.in_(list(snapshot.tv_shows)))
+        ).all())
+    if episode_paths:
+        snapshot.episodes.update(db.execute(
+            select(TVEpisode.id, TVEpisode.file_size).where(TVEpisode.local_path.in_(episode_paths))
+        ).all())
+    return snapshot
+
+
+def diff_snapshots(before: LibrarySnapshot, after: LibrarySnapshot) -> StatsDelta:
+    """写入前后快照之差"""
+    delta = StatsDelta()
+    for attr, stat in (("movies", "movie_count"), ("tv_shows", "tv_show_count")):
+        old, new = getattr(before, attr), getattr(after, attr)
+        for title_id in old.keys() | new.keys():
+            old_facts, new_facts = old.get(title_id), new.get(title_id)
+            if old_facts == new_facts:
+                continue
+            if old_facts is not None:
+                delta.add_title(old_facts, stat, -1)
+                delta.add(SCOPE_TOTAL, "", "total_bytes", -old_facts.file_size)
+            if new_facts is not None:
+                delta.add_title(new_facts, stat, 1)
+                delta.add(SCOPE_TOTAL, "", "total_bytes", new_facts.file_size)
+    
+    delta.add(SCOPE_TOTAL, "", "episode_count", len(after.episodes.keys() - before.episodes.keys()))
+    delta.add(
+        SCOPE_TOTAL, "", "total_bytes",
+        sum(size or 0 for size in after.episodes.values()) - sum(size or 0 for size in before.episodes.values())
+    )
+    return delta
+
+
+def apply_stats_delta(db: Session, delta: StatsDelta):
+    """在当前事务中把增量累加到统计行"""
+    rows = delta.changes()
+    if not rows:
+        return
+    now = datetime.utcnow()
+    stmt = sqlite_insert(LibraryStat)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["scope", "key"],
+            set_={
+                **{name: getattr(LibraryStat, name) + stmt.excluded[name] for name in STAT_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ),
+        [{**row, "updated_at": now} for row in rows]
+    )
+
+
+def rebuild_library_stats(db: Session) -> int:
+    """按当前数据在当前事务中重建全部统计行（维护任务，由调用方提交），返回写入的行数"""
+    delta = StatsDelta()
+    
+    movie_totals = db.execute(select(func.count(), func.coalesce(func.sum(Movie.file_size), 0))).one()
+    episode_totals = db.execute(
+        select(func.count(), func.coalesce(func.sum(TVEpisode.file_size), 0))
+    ).one()
+    delta.add(SCOPE_TOTAL, "", "movie_count", movie_totals[0])
+    delta.add(SCOPE_TOTAL, "", "tv_show_count", db.scalar(select(func.count()).select_from(TVShow)))
+    delta.add(SCOPE_TOTAL, "", "episode_count", episode_totals[0])
+    delta.add(SCOPE_TOTAL, "", "total_bytes", movie_totals[1] + episode_totals[1])
+    
+    for model, association, owner_column, stat in (
+        (Movie, movie_genre_association, "movie_id", "movie_count"),
+        (TVShow, tv_show_genre_association, "tv_show_id", "tv_show_count"),
+    ):
+        for year, count in db.execute(
+            select(model.year, func.count()).where(model.year.isnot(None)).group_by(model.year)
+        ):
+            delta.add(SCOPE_YEAR, year, stat, count)
+        for added_on, count in db.execute(
+            select(func.date(model.created_at), func.count()).group_by(func.date(model.created_at))
+        ):
+            if added_on:
+                delta.add(SCOPE_DAY, added_on, stat, count)
+        genre_id = association.c.genre_id
+        for genre, count in db.execute(
+            select(genre_id, func.count(func.distinct(association.c[owner_column]))).group_by(genre_id)
+        ):
+            delta.add(SCOPE_GENRE, genre, stat, count)
+    
+    # 空库同样写入 total 行，表示统计已建立
+    db.execute(delete(LibraryStat))
+    rows = [{"scope": scope, "key": key, **values} for (scope, key), values in delta.rows.items()]
+    now = datetime.utcnow()
+    db.execute(sqlite_insert(LibraryStat), [{**row, "updated_at": now} for row in rows])
+    logger.info(f"媒体库统计已重建: {len(rows)} 行")
+    return len(rows)
+
+
+def ensure_library_stats(db: Session) -> bool:
+    """统计表为空（新建或从旧版本升级）时在当前事务中重建（由调用方提交），返回是否执行了重建"""
+    exists = db.scalar(
+        select(LibraryStat.scope).where(LibraryStat.scope == SCOPE_TOTAL, LibraryStat.key == "")
+    )
+    if exists is not None:
+        return False
+    rebuild_library_stats(db)
+    return True
+
+
+if __name__ == "__main__":
+    # 直接运行此文件时重建统计
+    from .database import SessionLocal, init_db, next_library_generation
+    
+    init_db()
+    session = SessionLocal()
+    try:
+        count = rebuild_library_stats(session)
+        # 运行中的服务按代数使缓存的统计失效
+        next_library_generation(session)
+        session.commit()
+        print(f"媒体库统计已重建: {count} 行")
+    finally:
+        session.close()
@@ -8,22 +8,46 @@ import asyncio
 import logging
 import uuid
 from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Any
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from pydantic import BaseModel
 
 from .config import settings
 from .database import (
-    get_db, init_db, SessionLocal, 
-    Movie, TVShow, TVSeason, TVEpisode, Genre, ScanTask
+    get_async_db, get_async_read_db, init_db, AsyncSessionLocal, AsyncReadSessionLocal, dispose_async_engines,
+    Movie, TVShow, TVSeason, TVEpisode, Genre, ScanTask, LibraryStat, SessionLocal, DuplicateFile,
+    Person, MovieCredit, TVCredit, Language, Country, Company, Network,
+    movie_language_association, movie_country_association, movie_company_association,
+    tv_show_language_association, tv_show_country_association, tv_show_company_association,
+    tv_show_network_association, movie_genre_association, tv_show_genre_association, next_library_generation
 )
 from . import tmdb_api, media_parser
+from .cache import (
+    ResponseCacheMiddleware, bump_library_generation, count_cache, etag_matches, facet_cache,
+    refresh_library_generation, response_cache, run_generation_refresher
+)
+from .facets import Facets, compute_facets, facet_base
+from .library_stats import SCOPE_DAY, SCOPE_TOTAL, ensure_library_stats, rebuild_library_stats
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry as metrics_registry
+from .pagination import DEFAULT_SORT, SORT_PATTERN, InvalidCursorError, fetch_rows, paginate
+from .progress import FINAL_STATUSES, format_event, progress_broker
+from .projection import FieldSpec, InvalidFieldsError, Projection, column_field
+from .search import apply_text_search, split_terms
+from .scan_writer import FileSizeUpdate, ResolvedEpisode, ResolvedMovie, ScanCounters, ScanWriter
+from .image_service import (
+    CachedImageFiles, artwork_task_manager, enqueue_artwork_prefetch,
+    image_cache_service
+)
 
 # 配置日志
 logging.basicConfig(
@@ -47,14 +71,39 @@ async def lifespan(app: FastAPI):
     init_db()
     logger.info("数据库初始化完成")
     
+    # 统计表为空（新库或旧版本升级）时按现有数据重建
+    with SessionLocal() as db:
+        if ensure_library_stats(db):
+            next_library_generation(db)
+            db.commit()
+            logger.info("媒体库统计初始化完成")
+    
+    # 读取共享的媒体库代数（多个工作进程的缓存键与 ETag 一致）
+    await refresh_library_generation()
+    
     # 初始化TMDb服务
     tmdb_service = tmdb_api.TMDbService()
     app.state.tmdb_service = tmdb_service
     logger.info("TMDb服务初始化完成")
     
+    # 启动图片缓存淘汰任务和封面预取工作进程
+    eviction_task = asyncio.create_task(image_cache_service.run_eviction_worker())
+    artwork_workers = asyncio.create_task(artwork_task_manager.start_workers())
+    placeholder_writer = asyncio.create_task(image_cache_service.run_placeholder_writer())
+    generation_refresher = asyncio.create_task(run_generation_refresher())
+    
     yield
     
     logger.info("关闭 SceneScape 后端服务...")
+    await artwork_task_manager.stop_workers()
+    artwork_workers.cancel()
+    placeholder_writer.cancel()
+    generation_refresher.cancel()
+    await image_cache_service.flush_placeholders()
+    eviction_task.cancel()
+    image_cache_service.flush_access_log()
+    await image_cache_service.close()
+    await dispose_async_engines()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -64,6 +113,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 只读接口响应缓存与条件请求（媒体库代数变化前直接返回缓存的响应体或 304；CORS 在外层，按请求添加跨域头）
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    paths=["/api/movies", "/api/tv-shows", "/api/people", "/api/search", "/api/stats", "/api/facets"],
+    # 统计中的 recent_additions 为最近 7 天的入库数，跨日时即使没有写入也会变化
+    dated_paths=["/api/stats"],
+)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -71,18 +129,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Cache", "ETag"],
 )
 
+# 响应压缩（最外层：缓存中保存未压缩的响应体，按请求的 Accept-Encoding 压缩）
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.gzip_minimum_size,
+    compresslevel=settings.gzip_compress_level,
+)
+
+# 请求耗时指标（最外层：包含压缩与响应缓存命中的请求）
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+
 # 静态文件服务
-app.mount("/posters", StaticFiles(directory=str(poster_dir)), name="posters")
-app.mount("/backdrops", StaticFiles(directory=str(backdrop_dir)), name="backdrops")
+app.mount("/posters", CachedImageFiles(directory=str(poster_dir), image_type="poster"), name="posters")
+app.mount("/backdrops", CachedImageFiles(directory=str(backdrop_dir), image_type="backdrop"), name="backdrops")
 
 # Pydantic模型
 class ScanRequest(BaseModel):
     path: str
     recursive: bool = True
+    prefetch_artwork: bool | None = None  # 未指定时使用配置 artwork_prefetch_enabled
 
 class ScanResponse(BaseModel):
+    id: int  # 扫描任务 id（查询状态、订阅进度时使用）
     task_id: str
     message: str
 
@@ -93,6 +165,7 @@ class MovieResponse(BaseModel):
     year: int
     overview: str
     poster_path: str | None
+    poster_placeholder: str | None = None
     backdrop_path: str | None
     rating: float
     release_date: str | None
@@ -103,17 +176,50 @@ class TVShowResponse(BaseModel):
     id: int
     title: str
     original_title: str
+    year: int | None = None
     first_air_date: str | None
     last_air_date: str | None
     overview: str
     poster_path: str | None
+    poster_placeholder: str | None = None
     backdrop_path: str | None
     rating: float
     status: str
     number_of_seasons: int
     number_of_episodes: int
+    episode_runtime: int | None = None
     genres: list[str]
 
+class EpisodeResponse(BaseModel):
+    id: int
+    episode_number: int
+    name: str | None
+    overview: str
+    air_date: str | None
+    runtime: int | None
+    rating: float
+    still_path: str | None
+    local_path: str
+    file_size: int | None
+
+class SeasonResponse(BaseModel):
+    id: int
+    season_number: int
+    name: str | None
+    overview: str
+    air_date: str | None
+    episode_count: int
+    poster_path: str | None
+    episodes: list[EpisodeResponse]
+
+class TVShowDetailResponse(TVShowResponse):
+    seasons: list[SeasonResponse] = []  # 仅 expand=seasons 时返回
+
+class SearchResponse(BaseModel):
+    movies: list[MovieResponse]
+    tv_shows: list[TVShowResponse]
+    total: int
+
 class StatsResponse(BaseModel):
     total_movies: int
     total_tv_shows: int
@@ -121,6 +227,340 @@ class StatsResponse(BaseModel):
     total_size: int
     recent_additions: int
 
+class FacetCount(BaseModel):
+    value: str | int
+    count: int
+
+class FacetsResponse(BaseModel):
+    media_type: str
+    total: int
+    genres: list[FacetCount]
+    years: list[FacetCount]
+    decades: list[FacetCount]  # 年代（年份下限，如 1990）
+    ratings: list[FacetCount]  # 评分区间下限（0-9，9 含 10 分）
+    statuses: list[FacetCount]
+
+class CreditResponse(BaseModel):
+    id: int  # 人物 id
+    tmdb_id: int
+    name: str
+    profile_path: str | None
+    credit_type: str  # cast 或 crew
+    character: str | None
+    department: str | None
+    job: str | None
+    order: int | None
+
+class CreditRoleResponse(BaseModel):
+    credit_type: str
+    character: str | None
+    department: str | None
+    job: str | None
+
+class PersonMovieResponse(BaseModel):
+    movie: MovieResponse
+    roles: list[CreditRoleResponse]
+
+class PersonTVShowResponse(BaseModel):
+    tv_show: TVShowResponse
+    roles: list[CreditRoleResponse]
+
+class PersonTitlesResponse(BaseModel):
+    id: int
+    tmdb_id: int
+    name: str
+    profile_path: str | None
+    known_for_department: str | None
+    movies: list[PersonMovieResponse]
+    tv_shows: list[PersonTVShowResponse]
+
+def movie_to_response(movie: Movie) -> MovieResponse:
+    """电影模型转换为接口响应"""
+    return MovieResponse(
+        id=movie.id,
+        title=movie.title,
+        original_title=movie.original_title or movie.title,
+        year=movie.year or 0,
+        overview=movie.overview or "",
+        poster_path=movie.poster_path,
+        poster_placeholder=movie.poster_placeholder,
+        backdrop_path=movie.backdrop_path,
+        rating=movie.vote_average or 0.0,
+        release_date=movie.release_date,
+        runtime=movie.runtime,
+        genres=[g.name for g in movie.genres]
+    )
+
+def tv_show_to_response(show: TVShow) -> TVShowResponse:
+    """电视剧模型转换为接口响应"""
+    return TVShowResponse(
+        id=show.id,
+        title=show.name,
+        original_title=show.original_name or show.name,
+        year=show.year,
+        first_air_date=show.first_air_date,
+        last_air_date=show.last_air_date,
+        overview=show.overview or "",
+        poster_path=show.poster_path,
+        poster_placeholder=show.poster_placeholder,
+        backdrop_path=show.backdrop_path,
+        rating=show.vote_average or 0.0,
+        status=show.status or "",
+        number_of_seasons=show.number_of_seasons or 0,
+        number_of_episodes=show.number_of_episodes or 0,
+        episode_runtime=show.episode_runtime,
+        genres=[g.name for g in show.genres]
+    )
+
+# 列表接口的稀疏字段（取值方式与 movie_to_response / tv_show_to_response 一致）
+GRID_FIELDS = ("title", "year", "poster_path", "poster_placeholder", "rating")
+
+MOVIE_PROJECTION = Projection(
+    model=Movie,
+    response=MovieResponse,
+    fields={
+        "id": column_field("id"),
+        "title": column_field("title"),
+        "original_title": FieldSpec(("original_title", "title"), lambda row: row.original_title or row.title),
+        "year": column_field("year", 0),
+        "overview": column_field("overview", ""),
+        "poster_path": column_field("poster_path"),
+        "poster_placeholder": column_field("poster_placeholder"),
+        "backdrop_path": column_field("backdrop_path"),
+        "rating": column_field("vote_average", 0.0),
+        "release_date": column_field("release_date"),
+        "runtime": column_field("runtime"),
+    },
+    genre_association=movie_genre_association,
+    owner_column="movie_id",
+    presets={"grid": GRID_FIELDS},
+)
+
+TV_SHOW_PROJECTION = Projection(
+    model=TVShow,
+    response=TVShowResponse,
+    fields={
+        "id": column_field("id"),
+        "title": column_field("name"),
+        "original_title": FieldSpec(("original_name", "name"), lambda row: row.original_name or row.name),
+        "year": column_field("year"),
+        "first_air_date": column_field("first_air_date"),
+        "last_air_date": column_field("last_air_date"),
+        "overview": column_field("overview", ""),
+        "poster_path": column_field("poster_path"),
+        "poster_placeholder": column_field("poster_placeholder"),
+        "backdrop_path": column_field("backdrop_path"),
+        "rating": column_field("vote_average", 0.0),
+        "status": column_field("status", ""),
+        "number_of_seasons": column_field("number_of_seasons", 0),
+        "number_of_episodes": column_field("number_of_episodes", 0),
+        "episode_runtime": column_field("episode_runtime"),
+    },
+    genre_association=tv_show_genre_association,
+    owner_column="tv_show_id",
+    presets={"grid": GRID_FIELDS},
+)
+
+def parse_fields(projection: Projection, value: str | None):
+    try:
+        return projection.parse(value)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 批量详情接口单次请求的最大 id 数
+BATCH_MAX_IDS = 100
+
+def parse_batch_ids(ids: str) -> list[int]:
+    """解析逗号分隔的 id 列表（去重，保持顺序）"""
+    try:
+        values = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 必须是逗号分隔的整数")
+    if not values:
+        raise HTTPException(status_code=400, detail="ids 不能为空")
+    if len(values) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"ids 最多 {BATCH_MAX_IDS} 个")
+    return values
+
+def season_to_response(season: TVSeason) -> SeasonResponse:
+    """季（已加载剧集）转换为接口响应，剧集按集号排序"""
+    return SeasonResponse(
+        id=season.id,
+        season_number=season.season_number,
+        name=season.name,
+        overview=season.overview or "",
+        air_date=season.air_date,
+        episode_count=season.episode_count or len(season.episodes),
+        poster_path=season.poster_path,
+        episodes=[
+            EpisodeResponse(
+                id=episode.id,
+                episode_number=episode.episode_number,
+                name=episode.name,
+                overview=episode.overview or "",
+                air_date=episode.air_date,
+                runtime=episode.runtime,
+                rating=episode.vote_average or 0.0,
+                still_path=episode.still_path,
+                local_path=episode.local_path,
+                file_size=episode.file_size
+            )
+            for episode in sorted(season.episodes, key=lambda episode: episode.episode_number)
+        ]
+    )
+
+def updated_stamp(row) -> int:
+    return int(row.updated_at.timestamp() * 1_000_000) if row.updated_at else 0
+
+def row_etag(row) -> str:
+    """
+    按行 updated_at 生成的 ETag（详情接口）
+    
+    只依赖该行本身，其他标题变化（代数递增）或服务重启后仍保持不变
+    """
+    return f'W/"{row.__tablename__}-{row.id}-{updated_stamp(row):x}"'
+
+def show_tree_etag(show: TVShow) -> str:
+    """
+    含季和剧集的电视剧详情的 ETag
+    
+    取剧、季、集中最新的 updated_at，并带上季数和集数（删除季或集时同样变化）
+    """
+    episodes = [episode for season in show.seasons for episode in season.episodes]
+    stamp = max(updated_stamp(row) for row in [show, *show.seasons, *episodes])
+    return f'W/"{show.__tablename__}-{show.id}-{stamp:x}-{len(show.seasons)}-{len(episodes)}"'
+
+def credit_to_response(credit) -> CreditResponse:
+    """演职员记录（MovieCredit/TVCredit，已加载 person）转换为接口响应"""
+    return CreditResponse(
+        id=credit.person.id,
+        tmdb_id=credit.person.tmdb_id,
+        name=credit.person.name,
+        profile_path=credit.person.profile_path,
+        credit_type=credit.credit_type,
+        character=credit.character,
+        department=credit.department,
+        job=credit.job,
+        order=credit.order
+    )
+
+def credit_role(credit) -> CreditRoleResponse:
+    return CreditRoleResponse(
+        credit_type=credit.credit_type,
+        character=credit.character,
+        department=credit.department,
+        job=credit.job
+    )
+
+async def get_title_credits(db: AsyncSession, model, owner_column: str, owner_id: int) -> list[CreditResponse]:
+    """作品的演职员：演员按排序在前，工作人员在后"""
+    credits = (await db.scalars(
+        select(model)
+        .where(getattr(model, owner_column) == owner_id)
+        .options(joinedload(model.person))
+        .order_by(model.credit_type, model.order, model.id)
+    )).all()
+    return [credit_to_response(credit) for credit in credits]
+
+# 查找表筛选：参数名 -> (查找表匹配列, 条目列, {主表: 关联表})
+LOOKUP_FILTERS = {
+    "language": (Language.iso_639_1, "language_id", {
+        "movies": movie_language_association, "tv_shows": tv_show_language_association
+    }),
+    "country": (Country.iso_3166_1, "country_id", {
+        "movies": movie_country_association, "tv_shows": tv_show_country_association
+    }),
+    "company": (Company.tmdb_id, "company_id", {
+        "movies": movie_company_association, "tv_shows": tv_show_company_association
+    }),
+    "network": (Network.tmdb_id, "network_id", {"tv_shows": tv_show_network_association}),
+}
+
+def apply_lookup_filters(query, model, values: Dict[str, Any]):
+    """
+    按语言、国家、公司、播出网络筛选
+    
+    查找表按唯一键定位条目 id，再经关联表 (条目, 标题) 索引取得标题 id，均为索引查找
+    """
+    owner_column = "movie_id" if model is Movie else "tv_show_id"
+    for name, value in values.items():
+        if value is None or value == "":
+            continue
+        lookup_column, item_column, associations = LOOKUP_FILTERS[name]
+        association = associations[model.__tablename__]
+        lookup = lookup_column.class_
+        query = query.filter(model.id.in_(
+            select(association.c[owner_column])
+            .join(lookup, lookup.id == association.c[item_column])
+            .where(lookup_column == value)
+        ))
+    return query
+
+def apply_title_filters(
+    query,
+    model,
+    search: str | None,
+    genre: str | None,
+    year: int | None,
+    lookups: Dict[str, Any],
+    status: str | None = None
+):
+    """列表与分面统计共用的筛选条件"""
+    if search:
+        query = apply_text_search(query, model, search)
+    
+    if year:
+        query = query.filter(model.year == year)
+    
+    if status:
+        query = query.filter(model.status == status)
+    
+    if genre:
+        query = query.join(model.genres).filter(Genre.name == genre)
+    
+    return apply_lookup_filters(query, model, lookups)
+
+async def count_rows(db: AsyncSession, query) -> int:
+    """统计查询结果行数"""
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+async def paginate_list(
+    db: AsyncSession,
+    response: Response,
+    query,
+    model,
+    count_key: tuple,
+    page: int,
+    limit: int,
+    sort: str | None,
+    cursor: str | None,
+    with_total: bool,
+    relevance: bool = False
+):
+    """
+    列表分页
+    
+    默认按游标分页，下一页游标通过 X-Next-Cursor 响应头返回；未传游标时兼容 page 参数。
+    搜索且未指定排序时按相关度排序，只能按页码翻页。
+    with_total=true 时通过 X-Total-Count 返回总数（按媒体库代数缓存）。
+    """
+    if with_total:
+        total = await count_cache.get_or_compute(count_key, lambda: count_rows(db, query))
+        response.headers["X-Total-Count"] = str(total)
+    
+    offset = 0 if cursor else (page - 1) * limit
+    if relevance and not sort:
+        return await fetch_rows(db, query.offset(offset).limit(limit))
+    
+    try:
+        rows, next_cursor = await paginate(db, query, model, sort or DEFAULT_SORT, limit, cursor, offset)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 # API路由
 
 @app.get("/")
@@ -138,7 +578,7 @@ async def health_check():
 async def scan_media_library(
     scan_request: ScanRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """扫描媒体库"""
     scan_path = Path(scan_request.path)
@@ -159,281 +599,591 @@ async def scan_media_library(
         processed_files=0
     )
     db.add(scan_task)
-    db.commit()
-    db.refresh(scan_task)
+    await db.commit()
+    # 进度通道在任务启动前建立，订阅者可以立即连接
+    progress_broker.open(scan_task.id, path=scan_task.path, created_at=scan_task.created_at)
     
     # 添加后台任务
+    prefetch_artwork = scan_request.prefetch_artwork
+    if prefetch_artwork is None:
+        prefetch_artwork = settings.artwork_prefetch_enabled
+    
     background_tasks.add_task(
         perform_media_scan,
         scan_task.id,
         str(scan_path),
-        scan_request.recursive
+        scan_request.recursive,
+        prefetch_artwork
     )
     
     return ScanResponse(
+        id=scan_task.id,
         task_id=task_id,
         message=f"开始扫描 {scan_path}"
     )
 
-@app.get("/api/scan/{task_id}")
-async def get_scan_status(task_id: int, db: Session = Depends(get_db)):
-    """获取扫描任务状态"""
-    task = db.query(ScanTask).filter(ScanTask.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="扫描任务不存在")
-    
+def scan_task_state(task: ScanTask) -> dict:
+    """数据库中的扫描任务状态（与进度通道的快照字段相同）"""
     return {
         "id": task.id,
         "status": task.status,
         "path": task.path,
         "total_files": task.total_files,
         "processed_files": task.processed_files,
+        "found_movies": task.found_movies,
+        "found_tv_shows": task.found_tv_shows,
+        "found_episodes": task.found_episodes,
         "progress": (task.processed_files / task.total_files * 100) if task.total_files > 0 else 0,
         "error_message": task.error_message,
         "created_at": task.created_at,
         "updated_at": task.updated_at
     }
 
+async def read_scan_task(task_id: int) -> dict:
+    async with AsyncReadSessionLocal() as db:
+        task = await db.get(ScanTask, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="扫描任务不存在")
+    return scan_task_state(task)
+
+@app.get("/api/scan/{task_id}")
+async def get_scan_status(task_id: int):
+    """获取扫描任务状态（进行中的任务直接读取内存中的进度，不查询数据库）"""
+    channel = progress_broker.get(task_id)
+    if channel is not None:
+        return channel.snapshot()
+    return await read_scan_task(task_id)
+
+@app.get("/api/scan/{task_id}/events")
+async def stream_scan_progress(task_id: int):
+    """
+    以 Server-Sent Events 推送扫描进度
+    
+    progress 事件为任务状态（与 /api/scan/{task_id} 相同），最短间隔由 scan_progress_interval 控制；
+    任务结束时发送 done 事件并关闭连接。已结束的任务直接返回一次 done 事件
+    """
+    channel = progress_broker.get(task_id)
+    if channel is not None:
+        events = channel.stream(settings.scan_progress_interval)
+    else:
+        state = await read_scan_task(task_id)
+        events = iter([format_event("done" if state["status"] in FINAL_STATUSES else "progress", state)])
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 电影相关接口
-@app.get("/api/movies", response_model=list[MovieResponse])
+@app.get("/api/movies", response_model=list[MovieResponse], response_model_exclude_unset=True)
 async def get_movies(
+    response: Response,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str = Query(None),
     genre: str = Query(None),
     year: int = Query(None),
-    db: Session = Depends(get_db)
+    language: str = Query(None, description="对白语言代码（ISO 639-1），如 en"),
+    country: str = Query(None, description="出品国家代码（ISO 3166-1），如 US"),
+    company: int = Query(None, description="出品公司 TMDb id"),
+    sort: str = Query(None, pattern=SORT_PATTERN),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    fields: str = Query(None, description="只返回指定字段（逗号分隔），grid 为网格视图字段"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """获取电影列表"""
-    query = db.query(Movie)
-    
-    if search:
-        query = query.filter(Movie.title.contains(search))
+    """
+    获取电影列表（sort: title/added/rating/popularity/released/year，cursor 为上一页响应头 X-Next-Cursor 的值）
     
-    if year:
-        query = query.filter(Movie.year == year)
-    
-    if genre:
-        query = query.join(Movie.genres).filter(Genre.name == genre)
+    指定 fields 时只查询所需的列，如 fields=grid 或 fields=title,overview
+    """
+    selected = parse_fields(MOVIE_PROJECTION, fields)
+    if selected:
+        query = MOVIE_PROJECTION.query(selected, sort)
+    else:
+        # 类型一次性批量加载（IN 查询），避免逐行懒加载
+        query = select(Movie).options(selectinload(Movie.genres))
     
-    total = query.count()
-    movies = query.offset((page - 1) * limit).limit(limit).all()
+    lookups = {"language": language, "country": country, "company": company}
+    query = apply_title_filters(query, Movie, search, genre, year, lookups)
     
-    result = []
-    for movie in movies:
-        # 从 release_date 提取年份
-        year = None
-        if movie.release_date:
-            try:
-                year = int(movie.release_date.split('-')[0]) if isinstance(movie.release_date, str) else movie.release_date.year
-            except (ValueError, AttributeError):
-                year = 0
-        
-        result.append(MovieResponse(
-            id=movie.id,
-            title=movie.title,
-            original_title=movie.original_title or movie.title,
-            year=year or 0,
-            overview=movie.overview or "",
-            poster_path=movie.poster_path,
-            backdrop_path=movie.backdrop_path,
-            rating=movie.vote_average or 0.0,
-            release_date=movie.release_date,
-            runtime=movie.runtime,
-            genres=[g.name for g in movie.genres]
-        ))
+    count_key = ("movies", " ".join(split_terms(search)), genre, year, *lookups.values())
+    movies = await paginate_list(
+        db, response, query, Movie, count_key, page, limit, sort, cursor, with_total, relevance=bool(search)
+    )
     
-    return result
+    if selected:
+        return await MOVIE_PROJECTION.to_response(db, movies, selected)
+    return [movie_to_response(movie) for movie in movies]
+
+@app.get("/api/movies/batch", response_model=dict[int, MovieResponse])
+async def get_movies_batch(
+    ids: str = Query(..., description=f"逗号分隔的电影 id，最多 {BATCH_MAX_IDS} 个"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """批量获取电影详情：一次 IN 查询 + 类型批量加载，按 id 返回（不存在的 id 不出现在结果中）"""
+    movies = (await db.scalars(
+        select(Movie).where(Movie.id.in_(parse_batch_ids(ids))).options(selectinload(Movie.genres))
+    )).all()
+    return {movie.id: movie_to_response(movie) for movie in movies}
 
 @app.get("/api/movies/{movie_id}", response_model=MovieResponse)
-async def get_movie(movie_id: int, db: Session = Depends(get_db)):
-    """获取电影详情"""
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
+async def get_movie(
+    movie_id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """获取电影详情（ETag 由 updated_at 生成，未变化时返回 304）"""
+    movie = await db.get(Movie, movie_id, options=[selectinload(Movie.genres)])
     if not movie:
         raise HTTPException(status_code=404, detail="电影不存在")
     
-    # 从 release_date 提取年份
-    year = None
-    if movie.release_date:
-        try:
-            year = int(movie.release_date.split('-')[0]) if isinstance(movie.release_date, str) else movie.release_date.year
-        except (ValueError, AttributeError):
-            year = 0
-    
-    return MovieResponse(
-        id=movie.id,
-        title=movie.title,
-        original_title=movie.original_title or movie.title,
-        year=year or 0,
-        overview=movie.overview or "",
-        poster_path=movie.poster_path,
-        backdrop_path=movie.backdrop_path,
-        rating=movie.vote_average or 0.0,
-        release_date=movie.release_date,
-        runtime=movie.runtime,
-        genres=[g.name for g in movie.genres]
-    )
+    etag = row_etag(movie)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    return movie_to_response(movie)
+
+@app.get("/api/movies/{movie_id}/credits", response_model=list[CreditResponse])
+async def get_movie_credits(movie_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """获取电影演职员"""
+    credits = await get_title_credits(db, MovieCredit, "movie_id", movie_id)
+    if not credits and await db.get(Movie, movie_id) is None:
+        raise HTTPException(status_code=404, detail="电影不存在")
+    return credits
 
 # 电视剧相关接口
-@app.get("/api/tv-shows", response_model=list[TVShowResponse])
+@app.get("/api/tv-shows", response_model=list[TVShowResponse], response_model_exclude_unset=True)
 async def get_tv_shows(
+    response: Response,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str = Query(None),
     genre: str = Query(None),
     status: str = Query(None),
-    db: Session = Depends(get_db)
+    year: int = Query(None),
+    language: str = Query(None, description="对白语言代码（ISO 639-1），如 en"),
+    country: str = Query(None, description="出品国家代码（ISO 3166-1），如 US"),
+    company: int = Query(None, description="出品公司 TMDb id"),
+    network: int = Query(None, description="播出网络 TMDb id"),
+    sort: str = Query(None, pattern=SORT_PATTERN),
+    cursor: str = Query(None),
+    with_total: bool = Query(False),
+    fields: str = Query(None, description="只返回指定字段（逗号分隔），grid 为网格视图字段"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """获取电视剧列表"""
-    query = db.query(TVShow)
+    """
+    获取电视剧列表（sort: title/added/rating/popularity/released/year，cursor 为上一页响应头 X-Next-Cursor 的值）
     
-    if search:
-        query = query.filter(TVShow.name.contains(search))
+    指定 fields 时只查询所需的列，如 fields=grid 或 fields=title,status
+    """
+    selected = parse_fields(TV_SHOW_PROJECTION, fields)
+    if selected:
+        query = TV_SHOW_PROJECTION.query(selected, sort)
+    else:
+        query = select(TVShow).options(selectinload(TVShow.genres))
     
-    if status:
-        query = query.filter(TVShow.status == status)
+    lookups = {"language": language, "country": country, "company": company, "network": network}
+    query = apply_title_filters(query, TVShow, search, genre, year, lookups, status)
     
-    if genre:
-        query = query.join(TVShow.genres).filter(Genre.name == genre)
-    
-    tv_shows = query.offset((page - 1) * limit).limit(limit).all()
-    
-    result = []
-    for show in tv_shows:
-        result.append(TVShowResponse(
-            id=show.id,
-            title=show.name,
-            original_title=show.original_name or show.name,
-            first_air_date=show.first_air_date,
-            last_air_date=show.last_air_date,
-            overview=show.overview or "",
-            poster_path=show.poster_path,
-            backdrop_path=show.backdrop_path,
-            rating=show.vote_average or 0.0,
-            status=show.status or "",
-            number_of_seasons=show.number_of_seasons or 0,
-            number_of_episodes=show.number_of_episodes or 0,
-            genres=[g.name for g in show.genres]
-        ))
+    count_key = ("tv_shows", " ".join(split_terms(search)), genre, status, year, *lookups.values())
+    tv_shows = await paginate_list(
+        db, response, query, TVShow, count_key, page, limit, sort, cursor, with_total, relevance=bool(search)
+    )
     
-    return result
+    if selected:
+        return await TV_SHOW_PROJECTION.to_response(db, tv_shows, selected)
+    return [tv_show_to_response(show) for show in tv_shows]
 
-@app.get("/api/tv-shows/{show_id}", response_model=TVShowResponse)
-async def get_tv_show(show_id: int, db: Session = Depends(get_db)):
-    """获取电视剧详情"""
-    show = db.query(TVShow).filter(TVShow.id == show_id).first()
+@app.get("/api/tv-shows/batch", response_model=dict[int, TVShowResponse])
+async def get_tv_shows_batch(
+    ids: str = Query(..., description=f"逗号分隔的电视剧 id，最多 {BATCH_MAX_IDS} 个"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """批量获取电视剧详情：一次 IN 查询 + 类型批量加载，按 id 返回（不存在的 id 不出现在结果中）"""
+    shows = (await db.scalars(
+        select(TVShow).where(TVShow.id.in_(parse_batch_ids(ids))).options(selectinload(TVShow.genres))
+    )).all()
+    return {show.id: tv_show_to_response(show) for show in shows}
+
+@app.get("/api/tv-shows/{show_id}", response_model=TVShowDetailResponse, response_model_exclude_unset=True)
+async def get_tv_show(
+    show_id: int,
+    response: Response,
+    expand: str = Query(None, pattern="^seasons$", description="seasons: 同时返回所有季及其剧集"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    获取电视剧详情（ETag 由 updated_at 生成，未变化时返回 304）
+    
+    expand=seasons 时一次返回所有季和剧集：剧、类型、季、剧集各一次查询（季和剧集按 IN 批量加载），
+    查询数与季数、集数无关
+    """
+    options = [selectinload(TVShow.genres)]
+    if expand:
+        options.append(selectinload(TVShow.seasons).selectinload(TVSeason.episodes))
+    show = await db.get(TVShow, show_id, options=options)
     if not show:
         raise HTTPException(status_code=404, detail="电视剧不存在")
     
-    return TVShowResponse(
-        id=show.id,
-        title=show.name,
-        original_title=show.original_name or show.name,
-        first_air_date=show.first_air_date,
-        last_air_date=show.last_air_date,
-        overview=show.overview or "",
-        poster_path=show.poster_path,
-        backdrop_path=show.backdrop_path,
-        rating=show.vote_average or 0.0,
-        status=show.status or "",
-        number_of_seasons=show.number_of_seasons or 0,
-        number_of_episodes=show.number_of_episodes or 0,
-        genres=[g.name for g in show.genres]
+    etag = show_tree_etag(show) if expand else row_etag(show)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    
+    # 未展开时不设置 seasons，响应与 TVShowResponse 相同
+    detail = tv_show_to_response(show).model_dump()
+    if expand:
+        detail["seasons"] = [
+            season_to_response(season)
+            for season in sorted(show.seasons, key=lambda season: season.season_number)
+        ]
+    return TVShowDetailResponse.model_construct(**detail)
+
+@app.get("/api/tv-shows/{show_id}/credits", response_model=list[CreditResponse])
+async def get_tv_show_credits(show_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """获取电视剧演职员（含创作者）"""
+    credits = await get_title_credits(db, TVCredit, "tv_show_id", show_id)
+    if not credits and await db.get(TVShow, show_id) is None:
+        raise HTTPException(status_code=404, detail="电视剧不存在")
+    return credits
+
+# 人物相关接口
+@app.get("/api/people/{person_id}/titles", response_model=PersonTitlesResponse)
+async def get_person_titles(person_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """获取人物参与的电影和电视剧（按 person_id 走索引查询，同一作品的多个职位合并）"""
+    person = await db.get(Person, person_id)
+    if not person:
+        raise HTTPException(status_code=404, detail="人物不存在")
+    
+    movie_credits = (await db.scalars(
+        select(MovieCredit)
+        .where(MovieCredit.person_id == person_id)
+        .options(joinedload(MovieCredit.movie).selectinload(Movie.genres))
+        .order_by(MovieCredit.movie_id, MovieCredit.id)
+    )).all()
+    tv_credits = (await db.scalars(
+        select(TVCredit)
+        .where(TVCredit.person_id == person_id)
+        .options(joinedload(TVCredit.tv_show).selectinload(TVShow.genres))
+        .order_by(TVCredit.tv_show_id, TVCredit.id)
+    )).all()
+    
+    movies: Dict[int, PersonMovieResponse] = {}
+    for credit in movie_credits:
+        if credit.movie_id not in movies:
+            movies[credit.movie_id] = PersonMovieResponse(movie=movie_to_response(credit.movie), roles=[])
+        movies[credit.movie_id].roles.append(credit_role(credit))
+    tv_shows: Dict[int, PersonTVShowResponse] = {}
+    for credit in tv_credits:
+        if credit.tv_show_id not in tv_shows:
+            tv_shows[credit.tv_show_id] = PersonTVShowResponse(tv_show=tv_show_to_response(credit.tv_show), roles=[])
+        tv_shows[credit.tv_show_id].roles.append(credit_role(credit))
+    
+    # 新作品在前
+    return PersonTitlesResponse(
+        id=person.id,
+        tmdb_id=person.tmdb_id,
+        name=person.name,
+        profile_path=person.profile_path,
+        known_for_department=person.known_for_department,
+        movies=sorted(movies.values(), key=lambda item: item.movie.release_date or "", reverse=True),
+        tv_shows=sorted(tv_shows.values(), key=lambda item: item.tv_show.first_air_date or "", reverse=True)
     )
 
+# 全文搜索
+@app.get("/api/search", response_model=SearchResponse)
+async def search_media(
+    query: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """搜索电影和电视剧（标题、原始标题、简介），按相关度排序，相关度相同时按热度排序"""
+    movie_query = apply_text_search(select(Movie).options(selectinload(Movie.genres)), Movie, query)
+    show_query = apply_text_search(select(TVShow).options(selectinload(TVShow.genres)), TVShow, query)
+    offset = (page - 1) * limit
+    
+    movies = (await db.scalars(movie_query.order_by(Movie.popularity.desc()).offset(offset).limit(limit))).all()
+    tv_shows = (await db.scalars(show_query.order_by(TVShow.popularity.desc()).offset(offset).limit(limit))).all()
+    
+    async def count_matches():
+        return await count_rows(db, movie_query) + await count_rows(db, show_query)
+    
+    return SearchResponse(
+        movies=[movie_to_response(movie) for movie in movies],
+        tv_shows=[tv_show_to_response(show) for show in tv_shows],
+        total=await count_cache.get_or_compute(("search", " ".join(split_terms(query))), count_matches)
+    )
+
+# 分面统计
+def facets_to_response(media_type: str, facets: Facets) -> FacetsResponse:
+    def counts(items):
+        return [FacetCount(value=value, count=count) for value, count in items]
+    
+    return FacetsResponse(
+        media_type=media_type,
+        total=facets.total,
+        genres=counts(facets.genres),
+        years=counts(facets.years),
+        decades=counts(facets.decades),
+        ratings=counts(facets.ratings),
+        statuses=counts(facets.statuses)
+    )
+
+@app.get("/api/facets", response_model=FacetsResponse)
+async def get_facets(
+    media_type: str = Query("movie", pattern="^(movie|tv_show)$"),
+    search: str = Query(None),
+    genre: str = Query(None),
+    year: int = Query(None),
+    status: str = Query(None),
+    language: str = Query(None, description="对白语言代码（ISO 639-1），如 en"),
+    country: str = Query(None, description="出品国家代码（ISO 3166-1），如 US"),
+    company: int = Query(None, description="出品公司 TMDb id"),
+    network: int = Query(None, description="播出网络 TMDb id（仅电视剧）"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    筛选侧栏的分面统计：当前筛选条件下的类型、年份/年代、评分区间和状态计数
+    
+    筛选参数与列表接口相同；所有分面由一条语句统计，结果按媒体库代数缓存
+    """
+    model = Movie if media_type == "movie" else TVShow
+    lookups = {"language": language, "country": country, "company": company}
+    if model is TVShow:
+        lookups["network"] = network
+    query = apply_title_filters(facet_base(model), model, search, genre, year, lookups, status)
+    
+    key = ("facets", media_type, " ".join(split_terms(search)), genre, year, status, *lookups.values())
+    facets = await facet_cache.get_or_compute(key, lambda: compute_facets(db, query, model))
+    return facets_to_response(media_type, facets)
+
 # 统计信息
-@app.get("/api/stats", response_model=StatsResponse)
-async def get_stats(db: Session = Depends(get_db)):
-    """获取媒体库统计信息"""
-    total_movies = db.query(Movie).count()
-    total_tv_shows = db.query(TVShow).count()
-    total_episodes = db.query(TVEpisode).count()
-    
-    # 计算总文件大小（简化版本）
-    total_size = 0
-    
-    # 计算最近添加的数量（最近7天）
-    from datetime import datetime, timedelta
-    recent_date = datetime.now() - timedelta(days=7)
-    recent_movies = db.query(Movie).filter(Movie.created_at >= recent_date).count()
-    recent_shows = db.query(TVShow).filter(TVShow.created_at >= recent_date).count()
-    recent_additions = recent_movies + recent_shows
+async def read_library_stats(db: AsyncSession) -> StatsResponse:
+    """读取物化统计：total 行 + 最近 7 天的按日入库行"""
+    recent_since = (datetime.utcnow() - timedelta(days=7)).strftime("%Y-%m-%d")
+    rows = (await db.scalars(
+        select(LibraryStat).where(
+            or_(
+                LibraryStat.scope == SCOPE_TOTAL,
+                and_(LibraryStat.scope == SCOPE_DAY, LibraryStat.key >= recent_since)
+            )
+        )
+    )).all()
+    total = next((row for row in rows if row.scope == SCOPE_TOTAL), None)
+    recent = [row for row in rows if row.scope == SCOPE_DAY]
     
     return StatsResponse(
-        total_movies=total_movies,
-        total_tv_shows=total_tv_shows,
-        total_episodes=total_episodes,
-        total_size=total_size,
-        recent_additions=recent_additions
+        total_movies=total.movie_count if total else 0,
+        total_tv_shows=total.tv_show_count if total else 0,
+        total_episodes=total.episode_count if total else 0,
+        total_size=total.total_bytes if total else 0,
+        recent_additions=sum(row.movie_count + row.tv_show_count for row in recent)
     )
 
+@app.get("/api/stats", response_model=StatsResponse)
+async def get_stats(db: AsyncSession = Depends(get_async_read_db)):
+    """获取媒体库统计信息（读取扫描时增量维护的统计表）"""
+    return await read_library_stats(db)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """响应缓存、列表总数缓存与分面统计缓存的命中率"""
+    return {
+        "responses": response_cache.get_stats(),
+        "counts": count_cache.get_stats(),
+        "facets": facet_cache.get_stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """运行指标（Prometheus 文本格式）"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="指标未启用")
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/api/maintenance/rebuild-stats", response_model=StatsResponse)
+async def rebuild_stats(db: AsyncSession = Depends(get_async_db)):
+    """按当前数据重建媒体库统计（数据被外部修改或统计出现偏差时使用）"""
+    # 重建的统计与代数递增在同一事务中提交，缓存的统计响应与 ETag 不会与数据不一致
+    await db.run_sync(rebuild_library_stats)
+    generation = await db.run_sync(next_library_generation)
+    await db.commit()
+    bump_library_generation(generation)
+    return await read_library_stats(db)
+
 # 后台任务函数
-async def perform_media_scan(task_id: int, scan_path: str, recursive: bool = True):
-    """执行媒体扫描的后台任务"""
-    db = SessionLocal()
+class TMDbLookupCache:
+    """单次扫描内的TMDb查询缓存（同一剧集的多个文件只查询一次，并发查询合并）"""
+    
+    def __init__(self):
+        self._entries: Dict[tuple, asyncio.Task] = {}
+    
+    async def get(self, key: tuple, factory):
+        task = self._entries.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._entries[key] = task
+        try:
+            return await task
+        except Exception:
+            # 失败的查询不缓存，后续文件可以重试
+            self._entries.pop(key, None)
+            raise
+
+
+async def perform_media_scan(
+    task_id: int,
+    scan_path: str,
+    recursive: bool = True,
+    prefetch_artwork: bool = False
+):
+    """执行媒体扫描的后台任务（数据库读写均为异步，目录遍历在线程池中执行，不阻塞其他请求）"""
+    tmdb_service = tmdb_api.TMDbService()
+    channel = progress_broker.get(task_id) or progress_broker.open(task_id)
     try:
         # 更新任务状态
-        task = db.query(ScanTask).filter(ScanTask.id == task_id).first()
-        task.status = "running"
-        db.commit()
+        async with AsyncSessionLocal() as db:
+            task = await db.get(ScanTask, task_id)
+            task.status = "running"
+            task.started_at = datetime.utcnow()
+            await db.commit()
+        channel.update(status="running")
         
         logger.info(f"开始扫描路径: {scan_path}")
         
-        # 获取TMDb服务
-        tmdb_service = tmdb_api.TMDbService()
-        
         # 扫描媒体文件
         parser = media_parser.MediaFileParser()
-        media_files = parser.scan_directory(scan_path, recursive)
+        media_files = await asyncio.to_thread(parser.scan_directory, scan_path, recursive)
+        
+        async with AsyncSessionLocal() as db:
+            task = await db.get(ScanTask, task_id)
+            task.total_files = len(media_files)
+            await db.commit()
+            channel.update(total_files=len(media_files))
+            
+            # 已入库文件（路径 -> 大小），已知文件无需再查询TMDb
+            known_files = dict((await db.execute(select(Movie.local_path, Movie.file_size))).all())
+            known_files.update((await db.execute(select(TVEpisode.local_path, TVEpisode.file_size))).all())
+            duplicates = (await db.execute(select(DuplicateFile.local_path, DuplicateFile.kept_path))).all()
         
-        task.total_files = len(media_files)
-        db.commit()
+        # 已记录的重复文件（同一标题的其他版本）：保留的路径仍在库中且文件存在时跳过
+        duplicate_files = await asyncio.to_thread(lambda: {
+            local_path for local_path, kept_path in duplicates
+            if kept_path in known_files and Path(kept_path).exists()
+        })
         
-        processed = 0
-        for media_info in media_files:
+        # 元数据写入后，将封面加入独立的预取队列（并发数较低，不与元数据解析争抢）；
+        # 未开启预取时只缓存缺少占位图的海报（占位图在海报首次缓存时生成）
+        prefetched = set()
+        
+        def on_persisted(titles):
+            if not prefetch_artwork and not settings.scan_poster_placeholders:
+                return
+            for title in titles:
+                key = (title.media_type, title.id)
+                if key in prefetched:
+                    continue
+                prefetched.add(key)
+                if prefetch_artwork:
+                    enqueue_artwork_prefetch(
+                        title.media_type, title.id, title.poster_path, title.backdrop_path,
+                        has_placeholder=bool(title.poster_placeholder)
+                    )
+                elif not title.poster_placeholder:
+                    enqueue_artwork_prefetch(title.media_type, title.id, title.poster_path, None)
+        
+        # 实时进度只更新内存中的通道，数据库中的计数随数据批次写入
+        def on_progress(counters: ScanCounters):
+            channel.update(**asdict(counters))
+        
+        writer = ScanWriter(task_id, on_persisted=on_persisted, on_progress=on_progress)
+        await writer.start()
+        
+        lookups = TMDbLookupCache()
+        
+        async def handle(media_info: media_parser.ParsedMedia):
             try:
-                if media_info.media_type == "movie":
-                    await process_movie(db, tmdb_service, media_info)
+                local_path = str(media_info.file_path)
+                if local_path in duplicate_files:
+                    return
+                if local_path in known_files:
+                    if known_files[local_path] != media_info.file_size:
+                        await writer.put(FileSizeUpdate(
+                            media_info.media_type, local_path, media_info.file_size
+                        ))
+                elif media_info.media_type == "movie":
+                    await process_movie(writer, tmdb_service, media_info)
                 elif media_info.media_type == "tv_episode":
-                    await process_tv_show(db, tmdb_service, media_info)
-                
-                processed += 1
-                task.processed_files = processed
-                db.commit()
-                
-                # 避免API请求过快
-                await asyncio.sleep(0.1)
-                
+                    await process_tv_show(writer, tmdb_service, lookups, media_info)
             except Exception as e:
                 logger.error(f"处理文件 {media_info.file_path} 时出错: {e}")
-                continue
+            finally:
+                writer.file_processed()
         
-        task.status = "completed"
-        db.commit()
-        logger.info(f"扫描完成，处理了 {processed} 个文件")
+        # 待处理文件队列：固定数量的解析协程依次取文件，不为每个文件创建任务
+        pending: asyncio.Queue = asyncio.Queue()
+        for media_info in media_files:
+            pending.put_nowait(media_info)
+        
+        async def worker():
+            while True:
+                try:
+                    media_info = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await handle(media_info)
+        
+        # 解析协程并发查询TMDb（由共享限速器控制请求速率），写入统一交给写入器
+        await asyncio.gather(*(worker() for _ in range(max(1, settings.scan_concurrency))))
+        await writer.close()
+        
+        # 最终计数与完成状态一起写入（最后一个批次之后处理的文件没有单独提交进度）
+        final_counters = asdict(writer.counters)
+        status, error_message = "completed", None
+        if writer.failed_items:
+            # 有数据未能写入时不报告成功（未写入的文件不在库中，下次扫描会重新处理）
+            status = "failed"
+            error_message = f"{writer.failed_items} 个条目写入数据库失败: {writer.last_error}"
+        async with AsyncSessionLocal() as db:
+            task = await db.get(ScanTask, task_id)
+            task.status = status
+            task.error_message = error_message
+            task.completed_at = datetime.utcnow()
+            for name, value in final_counters.items():
+                setattr(task, name, value)
+            await db.commit()
+        progress_broker.close(task_id, status, error_message=error_message, **final_counters)
+        if error_message:
+            logger.error(f"扫描结束但部分数据未写入，处理了 {writer.counters.processed_files} 个文件: {error_message}")
+        else:
+            logger.info(f"扫描完成，处理了 {writer.counters.processed_files} 个文件")
         
     except Exception as e:
         logger.error(f"扫描任务失败: {e}")
-        task.status = "failed"
-        task.error_message = str(e)
-        db.commit()
+        async with AsyncSessionLocal() as db:
+            task = await db.get(ScanTask, task_id)
+            if task:
+                task.status = "failed"
+                task.error_message = str(e)
+                await db.commit()
+        progress_broker.close(task_id, "failed", error_message=str(e))
     finally:
-        db.close()
-
-async def process_movie(db: Session, tmdb_service: tmdb_api.TMDbService, media_info: media_parser.ParsedMedia):
-    """处理电影信息"""
-    # 检查是否已存在 - 使用文件路径作为唯一标识
-    existing = db.query(Movie).filter(
-        Movie.local_path == str(media_info.file_path)
-    ).first()
-    
-    if existing:
-        # 更新文件路径
-        existing.local_path = str(media_info.file_path)
-        existing.file_size = media_info.file_size
-        db.commit()
-        return existing
-    
+        await tmdb_service.close()
+
+def credits_append():
+    """详情请求附带演职员（append_to_response），同一次请求返回，不额外消耗配额"""
+    return "credits" if settings.credits_enabled else None
+
+async def process_movie(
+    writer: ScanWriter,
+    tmdb_service: tmdb_api.TMDbService,
+    media_info: media_parser.ParsedMedia
+):
+    """解析电影信息并提交给写入器"""
     # 搜索TMDb
     search_results = await tmdb_service.search_movie(media_info.title, media_info.year)
     if not search_results:
@@ -442,178 +1192,58 @@ async def process_movie(db: Session, tmdb_service: tmdb_api.TMDbService, media_i
     
     # 获取详细信息
     tmdb_movie = search_results[0]
-    movie_details = await tmdb_service.get_movie_details(tmdb_movie['id'])
-    
-    # 创建电影记录
-    movie = Movie(
-        tmdb_id=movie_details['id'],
-        title=movie_details['title'],
-        original_title=movie_details['original_title'],
-        overview=movie_details.get('overview'),
-        release_date=movie_details.get('release_date'),
-        runtime=movie_details.get('runtime'),
-        vote_average=movie_details.get('vote_average'),
-        poster_path=movie_details.get('poster_path'),
-        backdrop_path=movie_details.get('backdrop_path'),
+    movie_details = await tmdb_service.get_movie_details(tmdb_movie['id'], credits_append())
+    
+    resolved = ResolvedMovie(
+        details=movie_details,
         local_path=str(media_info.file_path),
         file_size=media_info.file_size
     )
-    
-    db.add(movie)
-    db.commit()
-    db.refresh(movie)
-    
-    # 添加类型
-    for genre_data in movie_details.get('genres', []):
-        genre = db.query(Genre).filter(Genre.tmdb_id == genre_data['id']).first()
-        if not genre:
-            genre = Genre(
-                tmdb_id=genre_data['id'],
-                name=genre_data['name']
-            )
-            db.add(genre)
-            db.commit()
-            db.refresh(genre)
-        
-        movie.genres.append(genre)
-    
-    db.commit()
-    return movie
+    await writer.put(resolved)
+    return resolved
 
-async def process_tv_show(db: Session, tmdb_service: tmdb_api.TMDbService, media_info: media_parser.ParsedMedia):
-    """处理电视剧信息"""
-    # 搜索TMDb获取正确的ID
-    search_results = await tmdb_service.search_tv(media_info.title)
+async def process_tv_show(
+    writer: ScanWriter,
+    tmdb_service: tmdb_api.TMDbService,
+    lookups: TMDbLookupCache,
+    media_info: media_parser.ParsedMedia
+):
+    """解析电视剧信息并提交给写入器"""
+    # 搜索TMDb获取正确的ID（同名剧集在本次扫描中只查询一次）
+    search_results = await lookups.get(
+        ("search_tv", media_info.title),
+        lambda: tmdb_service.search_tv(media_info.title)
+    )
     if not search_results:
         logger.warning(f"未找到电视剧: {media_info.title}")
         return None
     
     # 获取详细信息
-    tmdb_show = search_results[0]
-    show_details = await tmdb_service.get_tv_details(tmdb_show['id'])
-    
-    # 首先检查是否已经存在相同的tmdb_id
-    show = db.query(TVShow).filter(TVShow.tmdb_id == show_details['id']).first()
-    
-    if not show:
-        # 创建电视剧记录
-        try:
-            show = TVShow(
-                tmdb_id=show_details['id'],
-                name=show_details['name'],
-                original_name=show_details['original_name'],
-                overview=show_details.get('overview'),
-                first_air_date=show_details.get('first_air_date'),
-                last_air_date=show_details.get('last_air_date'),
-                status=show_details.get('status'),
-                number_of_seasons=show_details.get('number_of_seasons'),
-                number_of_episodes=show_details.get('number_of_episodes'),
-                vote_average=show_details.get('vote_average'),
-                poster_path=show_details.get('poster_path'),
-                backdrop_path=show_details.get('backdrop_path'),
-                local_path=str(Path(media_info.file_path).parent)  # 电视剧使用目录路径
-            )
-            
-            db.add(show)
-            db.commit()
-            db.refresh(show)
-            
-            # 添加类型
-            for genre_data in show_details.get('genres', []):
-                genre = db.query(Genre).filter(Genre.tmdb_id == genre_data['id']).first()
-                if not genre:
-                    genre = Genre(
-                        tmdb_id=genre_data['id'],
-                        name=genre_data['name']
-                    )
-                    db.add(genre)
-                    db.commit()
-                    db.refresh(genre)
-                
-                show.genres.append(genre)
-            
-            db.commit()
-            logger.info(f"成功添加电视剧: {show.name}")
-            
-        except Exception as e:
-            logger.error(f"添加电视剧失败: {e}")
-            db.rollback()
-            # 再次尝试查找，可能是并发创建导致的
-            show = db.query(TVShow).filter(TVShow.tmdb_id == show_details['id']).first()
-            if not show:
-                return None
-    else:
-        logger.info(f"电视剧已存在: {show.name}")
-        
-        # 添加类型
-        for genre_data in show_details.get('genres', []):
-            genre = db.query(Genre).filter(Genre.tmdb_id == genre_data['id']).first()
-            if not genre:
-                genre = Genre(
-                    tmdb_id=genre_data['id'],
-                    name=genre_data['name']
-                )
-                db.add(genre)
-                db.commit()
-                db.refresh(genre)
-            
-            show.genres.append(genre)
-        
-        db.commit()
+    tmdb_show_id = search_results[0]['id']
+    show_details = await lookups.get(
+        ("tv", tmdb_show_id),
+        lambda: tmdb_service.get_tv_details(tmdb_show_id, credits_append())
+    )
     
-    # 处理剧集信息（如果有季和集信息）
+    # 获取季详情（包含该季所有剧集信息）
+    season_details = None
     if media_info.season and media_info.episode:
-        # 查找或创建季
-        season = db.query(TVSeason).filter(
-            TVSeason.tv_show_id == show.id,
-            TVSeason.season_number == media_info.season
-        ).first()
-        
-        if not season:
-            season_details = await tmdb_service.get_tv_season_details(show.tmdb_id, media_info.season)
-            season = TVSeason(
-                tv_show_id=show.id,
-                season_number=media_info.season,
-                name=season_details.get('name', f"Season {media_info.season}"),
-                overview=season_details.get('overview'),
-                air_date=season_details.get('air_date'),
-                episode_count=season_details.get('episode_count')
-            )
-            db.add(season)
-            db.commit()
-            db.refresh(season)
-        
-        # 查找或创建剧集
-        episode = db.query(TVEpisode).filter(
-            TVEpisode.season_id == season.id,
-            TVEpisode.episode_number == media_info.episode
-        ).first()
-        
-        if not episode:
-            # 获取剧集详情
-            season_details = await tmdb_service.get_tv_season_details(show.tmdb_id, media_info.season)
-            episode_data = None
-            for ep in season_details.get('episodes', []):
-                if ep['episode_number'] == media_info.episode:
-                    episode_data = ep
-                    break
-            
-            if episode_data:
-                episode = TVEpisode(
-                    season_id=season.id,
-                    episode_number=media_info.episode,
-                    title=episode_data.get('name'),
-                    overview=episode_data.get('overview'),
-                    air_date=episode_data.get('air_date'),
-                    runtime=episode_data.get('runtime'),
-                    rating=episode_data.get('vote_average'),
-                    file_path=str(media_info.file_path),
-                    file_size=media_info.file_size
-                )
-                db.add(episode)
-                db.commit()
-    
-    return show
+        season_details = await lookups.get(
+            ("season", tmdb_show_id, media_info.season),
+            lambda: tmdb_service.get_tv_season_details(tmdb_show_id, media_info.season)
+        )
+    
+    resolved = ResolvedEpisode(
+        show_details=show_details,
+        show_path=str(Path(media_info.file_path).parent),  # 电视剧使用目录路径
+        local_path=str(media_info.file_path),
+        file_size=media_info.file_size,
+        season_number=media_info.season,
+        episode_number=media_info.episode,
+        season_details=season_details
+    )
+    await writer.put(resolved)
+    return resolved
 
 if __name__ == "__main__":
     import uvicorn
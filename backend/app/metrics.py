@@ -0,0 +1,266 @@
+"""
+SceneScape Backend - 运行指标
+轻量的 Prometheus 文本格式指标：计数器、仪表和直方图，常驻开启。
+记录只是加锁后更新内存中的数值（直方图按桶二分查找），不产生 I/O；
+缓存命中率、任务队列等已有统计在抓取 /metrics 时由采集函数读取，平时不额外记录
+"""
+
+import bisect
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认的耗时直方图分桶（秒）：接口与查询多在毫秒级，额外细分 10ms 以下
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """指标基类：按标签值（元组）保存各序列"""
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def samples(self) -> Iterable[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(名称, 标签名, 标签值, 数值)"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """只增的计数器"""
+    type = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def set(self, value: float, **labels):
+        """采集函数用：写入外部维护的累计值"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    """可增可减的当前值"""
+    type = "gauge"
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """分桶直方图（每个序列保存各桶计数、总和与次数）"""
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [各桶计数..., +Inf 桶计数, 总和]
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        labelnames = self.labelnames + ("le",)
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                yield f"{self.name}_bucket", labelnames, key + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, series[-1]
+            yield f"{self.name}_count", self.labelnames, key, cumulative
+
+
+class MetricsRegistry:
+    """指标注册表：常驻指标 + 抓取时调用的采集函数"""
+    
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+    
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        """注册采集函数（抓取时调用，返回由现有统计构造的指标）"""
+        self._collectors.append(collector)
+        return collector
+    
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "scenescape_http_request_duration_seconds", "HTTP 请求处理耗时（按路由模板）", ("method", "route")
+)
+http_requests = registry.counter(
+    "scenescape_http_requests_total", "HTTP 请求数（按路由模板与状态码）", ("method", "route", "status")
+)
+db_query_duration = registry.histogram(
+    "scenescape_db_query_duration_seconds", "数据库语句执行耗时（按引擎）", ("engine",)
+)
+tmdb_request_duration = registry.histogram(
+    "scenescape_tmdb_request_duration_seconds", "TMDb 请求耗时（不含限速等待）", ("endpoint",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+tmdb_requests = registry.counter(
+    "scenescape_tmdb_requests_total", "TMDb 请求数（按接口与状态码，网络错误为 error）", ("endpoint", "status")
+)
+tmdb_rate_limit_wait = registry.histogram(
+    "scenescape_tmdb_rate_limit_wait_seconds", "TMDb 请求在共享限速器上的等待时长",
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+scan_files_processed = registry.counter(
+    "scenescape_scan_files_processed_total", "扫描已处理的文件数"
+)
+
+# TMDb 接口路径中的数字 ID 归并为占位符，避免标签基数随数据增长
+_ID_SEGMENT = re.compile(r"/\d+")
+
+
+def tmdb_endpoint_label(endpoint: str) -> str:
+    return _ID_SEGMENT.sub("/{id}", endpoint)
+
+
+def instrument_engine(engine: Engine, name: str):
+    """记录引擎上每条语句的执行耗时（异步引擎传入 sync_engine）"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_start"] = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("metrics_start", None)
+        if start is not None:
+            db_query_duration.observe(time.perf_counter() - start, engine=name)
+
+
+class MetricsMiddleware:
+    """
+    记录每个 HTTP 请求的耗时与状态码（纯 ASGI 中间件）
+    
+    路由标签使用路由模板（如 /api/movies/{movie_id}）而非实际路径；
+    由外层中间件直接返回的请求（响应缓存命中）按路径匹配路由模板，未匹配的请求记为 unmatched
+    """
+    
+    def __init__(self, app, routes: Optional[Sequence] = None):
+        self.app = app
+        self.routes = routes
+        self._templates: Dict[Tuple[str, str], str] = {}
+    
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return getattr(route, "path", "unmatched")
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is None:
+            template = "unmatched"
+            for candidate in self.routes or ():
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL:
+                    template = candidate.path
+                    break
+            # 带 ID 的路径数量不受限制，超出上限时清空重新记录
+            if len(self._templates) >= 4096:
+                self._templates.clear()
+            self._templates[key] = template
+        return template
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route_template(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - start, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status)
@@ -0,0 +1,138 @@
+"""
+SceneScape Backend - 游标分页（keyset pagination）
+按 (排序列, id) 定位上一页最后一行，下一页直接从索引位置继续读取，
+翻页开销与页码无关；游标为不透明的 base64 令牌
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """排序方式：排序列 + 方向，id 作为同值时的稳定次序"""
+    column: str
+    descending: bool = False
+
+
+# 各列表支持的排序方式（每个排序列都有索引，SQLite 索引隐含 rowid 即 id，
+# 按 (排序列, id) 排序和游标定位都是有界的索引扫描，不需要临时排序）
+SORT_KEYS: Dict[str, Dict[str, SortKey]] = {
+    "movies": {
+        "title": SortKey("title"),
+        "added": SortKey("created_at", descending=True),
+        "rating": SortKey("vote_average", descending=True),
+        "popularity": SortKey("popularity", descending=True),
+        "released": SortKey("release_ts", descending=True),
+        "year": SortKey("year", descending=True),
+    },
+    "tv_shows": {
+        "title": SortKey("name"),
+        "added": SortKey("created_at", descending=True),
+        "rating": SortKey("vote_average", descending=True),
+        "popularity": SortKey("popularity", descending=True),
+        "released": SortKey("first_air_ts", descending=True),
+        "year": SortKey("year", descending=True),
+    },
+}
+
+DEFAULT_SORT = "title"
+SORT_PATTERN = "^(" + "|".join(SORT_KEYS["movies"]) + ")$"
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """生成游标令牌"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str) -> Tuple[Any, int]:
+    """解析游标令牌，返回 (排序列的值, id)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = payload["v"], int(payload["id"])
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("无效的分页游标") from e
+    
+    if payload.get("s") != sort:
+        raise InvalidCursorError("分页游标与排序方式不一致")
+    return value, row_id
+
+
+def _after(column, id_column, key: SortKey, value: Any, row_id: int):
+    """
+    位于 (value, row_id) 之后的行
+    
+    SQLite 升序时 NULL 排在最前，降序时排在最后，谓词与该顺序保持一致
+    """
+    if key.descending:
+        if value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(tuple_(column, id_column) < tuple_(value, row_id), column.is_(None))
+    
+    if value is None:
+        return or_(and_(column.is_(None), id_column > row_id), column.isnot(None))
+    return tuple_(column, id_column) > tuple_(value, row_id)
+
+
+async def fetch_rows(db: AsyncSession, query: Select) -> List[Any]:
+    """执行列表查询：实体查询返回 ORM 实例，列投影查询返回结果行"""
+    result = await db.execute(query)
+    descriptions = query.column_descriptions
+    if len(descriptions) == 1 and descriptions[0]["expr"] is descriptions[0]["entity"]:
+        return result.scalars().all()
+    return result.all()
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model,
+    sort: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    按排序方式读取一页，返回 (本页数据, 下一页游标)
+    
+    query 中已有的排序会被替换；没有更多数据时下一页游标为 None。
+    列投影查询需要包含 id 和排序列。
+    offset 仅用于兼容按页码翻页的旧客户端，返回的游标同样可用于继续翻页
+    """
+    key = SORT_KEYS[model.__tablename__][sort]
+    column = getattr(model, key.column)
+    id_column = model.id
+    
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort)
+        query = query.filter(_after(column, id_column, key, value, row_id))
+    
+    if key.descending:
+        query = query.order_by(None).order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(column.asc(), id_column.asc())
+    
+    # 多取一行判断是否还有下一页
+    rows = await fetch_rows(db, query.offset(offset).limit(limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, key.column), last.id)
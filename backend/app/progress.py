@@ -0,0 +1,117 @@
+"""
+SceneScape Backend - 扫描进度推送
+扫描任务在内存中的进度通道：扫描过程只更新内存中的最新状态，
+订阅者（SSE 连接）在状态变化时读取最新值，按配置的间隔限流推送，无需轮询数据库
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 任务结束状态
+FINAL_STATUSES = ("completed", "failed")
+
+
+class ProgressChannel:
+    """
+    单个扫描任务的进度通道
+    
+    只保留最新状态（版本号递增），慢订阅者不会积压事件，只会跳过中间状态
+    """
+    
+    def __init__(self, task_id: int, **state):
+        self.task_id = task_id
+        self.state: Dict = {"id": task_id, "status": "pending", "total_files": 0, "processed_files": 0, **state}
+        self.version = 0
+        self._changed = asyncio.Event()
+    
+    @property
+    def finished(self) -> bool:
+        return self.state["status"] in FINAL_STATUSES
+    
+    def update(self, **changes):
+        """更新状态并唤醒订阅者（在事件循环线程中调用，不阻塞）"""
+        if all(self.state.get(key) == value for key, value in changes.items()):
+            return
+        self.state.update(changes, updated_at=datetime.utcnow())
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    def snapshot(self) -> Dict:
+        """当前状态（附带百分比）"""
+        state = dict(self.state)
+        total = state.get("total_files") or 0
+        state["progress"] = state.get("processed_files", 0) / total * 100 if total > 0 else 0
+        return state
+    
+    async def wait_newer(self, version: int, timeout: float) -> bool:
+        """等待版本号超过 version，超时返回 False"""
+        if self.version > version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+    
+    async def stream(self, interval: float, keepalive: float = 15.0) -> AsyncIterator[str]:
+        """
+        以 SSE 格式输出进度事件
+        
+        两次推送之间至少间隔 interval 秒（期间的变化合并为一次推送），
+        空闲时发送注释行保持连接；任务结束时发送 done 事件后结束
+        """
+        version = -1
+        while True:
+            if not await self.wait_newer(version, keepalive):
+                yield ": keepalive\n\n"
+                continue
+            version = self.version
+            finished = self.finished
+            yield format_event("done" if finished else "progress", self.snapshot())
+            if finished:
+                return
+            await asyncio.sleep(interval)
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def format_event(event: str, data: Dict) -> str:
+    """SSE 事件文本"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=_json_default)}\n\n"
+
+
+class ProgressBroker:
+    """进行中扫描任务的进度通道注册表"""
+    
+    def __init__(self):
+        self.channels: Dict[int, ProgressChannel] = {}
+    
+    def open(self, task_id: int, **state) -> ProgressChannel:
+        channel = ProgressChannel(task_id, **state)
+        self.channels[task_id] = channel
+        return channel
+    
+    def get(self, task_id: int) -> Optional[ProgressChannel]:
+        return self.channels.get(task_id)
+    
+    def close(self, task_id: int, status: str, **changes):
+        """
+        标记任务结束并移除通道
+        
+        已连接的订阅者仍持有通道，会收到结束事件；之后的请求改为读取数据库中的最终状态
+        """
+        channel = self.channels.pop(task_id, None)
+        if channel is not None:
+            channel.update(status=status, **changes)
+
+
+# 全局进度通道注册表
+progress_broker = ProgressBroker()
@@ -0,0 +1,104 @@
+"""
+SceneScape Backend - 稀疏字段投影
+列表接口的 fields 参数：SQL 只选取所需的列，由结果行直接构造响应（不创建 ORM 实例），
+未选取的字段不出现在响应中；grid 为网格视图使用的预设字段
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Select, Table, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Genre
+from .pagination import DEFAULT_SORT, SORT_KEYS
+
+# 类型名称来自关联表，不对应主表的列
+GENRES_FIELD = "genres"
+
+
+class InvalidFieldsError(ValueError):
+    """fields 参数包含未知字段"""
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """响应字段：需要读取的列 + 由结果行取值的函数"""
+    columns: Tuple[str, ...]
+    value: Callable[[Any], Any]
+
+
+def column_field(column: str, default: Any = None) -> FieldSpec:
+    """直接取自一列的字段（列值为空时使用 default）"""
+    if default is None:
+        return FieldSpec((column,), lambda row: getattr(row, column))
+    return FieldSpec((column,), lambda row: getattr(row, column) or default)
+
+
+@dataclass(frozen=True)
+class Projection:
+    """一个列表接口的可选字段"""
+    model: Any
+    response: Type[BaseModel]
+    fields: Dict[str, FieldSpec]
+    genre_association: Table
+    owner_column: str
+    presets: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    
+    def parse(self, value: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        解析 fields 参数（逗号分隔的字段名或预设名），未指定时返回 None 表示完整响应
+        
+        id 总是包含在内
+        """
+        if not value:
+            return None
+        names = ["id"]
+        for name in (part.strip() for part in value.split(",")):
+            if not name:
+                continue
+            if name in self.presets:
+                names.extend(self.presets[name])
+            elif name in self.fields or name == GENRES_FIELD:
+                names.append(name)
+            else:
+                allowed = ", ".join([*self.presets, *self.fields, GENRES_FIELD])
+                raise InvalidFieldsError(f"未知字段: {name}（可选: {allowed}）")
+        return tuple(dict.fromkeys(names))
+    
+    def query(self, fields: Sequence[str], sort: Optional[str]) -> Select:
+        """只选取所需列的查询（附带游标分页需要的排序列）"""
+        columns = ["id", SORT_KEYS[self.model.__tablename__][sort or DEFAULT_SORT].column]
+        for name in fields:
+            if name != GENRES_FIELD:
+                columns.extend(self.fields[name].columns)
+        return select(*(getattr(self.model, column) for column in dict.fromkeys(columns)))
+    
+    async def load_genres(self, db: AsyncSession, ids: List[int]) -> Dict[int, List[str]]:
+        """一次查询取得本页各行的类型名称"""
+        owner = self.genre_association.c[self.owner_column]
+        genres = defaultdict(list)
+        if ids:
+            for owner_id, name in await db.execute(
+                select(owner, Genre.name)
+                .join(Genre, Genre.id == self.genre_association.c.genre_id)
+                .where(owner.in_(ids))
+            ):
+                genres[owner_id].append(name)
+        return genres
+    
+    async def to_response(self, db: AsyncSession, rows: Sequence[Any], fields: Sequence[str]) -> List[BaseModel]:
+        """
+        由结果行构造响应模型（model_construct 不做校验，
+        接口以 response_model_exclude_unset 输出，只包含选取的字段）
+        """
+        genres = await self.load_genres(db, [row.id for row in rows]) if GENRES_FIELD in fields else None
+        result = []
+        for row in rows:
+            values = {name: self.fields[name].value(row) for name in fields if name != GENRES_FIELD}
+            if genres is not None:
+                values[GENRES_FIELD] = genres[row.id]
+            result.append(self.response.model_construct(**values))
+        return result
@@ -0,0 +1,774 @@
+"""
+SceneScape Backend - 扫描批量写入器
+解析器只负责查询TMDb，解析结果交给单一写入器按批次合并为事务，
+使用 INSERT ... ON CONFLICT DO UPDATE 批量写入，避免逐文件提交；
+事务通过异步会话执行，数据库 IO 不阻塞事件循环；媒体库统计在同一事务内增量更新
+"""
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from .cache import bump_library_generation
+from .config import settings
+from .database import (
+    AsyncSessionLocal, Company, Country, DuplicateFile, Genre, Language, Movie, MovieCredit, Network, Person, ScanTask,
+    TVCredit, TVEpisode, TVSeason, TVShow, derive_release_fields, movie_company_association,
+    movie_country_association, movie_genre_association, movie_language_association,
+    tv_show_company_association, tv_show_country_association, tv_show_genre_association,
+    tv_show_language_association, tv_show_network_association, next_library_generation
+)
+from .library_stats import apply_stats_delta, diff_snapshots, take_snapshot
+from .metrics import Gauge, registry, scan_files_processed
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResolvedMovie:
+    """已解析的电影文件"""
+    details: Dict[str, Any]  # TMDb 电影详情
+    local_path: str
+    file_size: int = 0
+
+
+@dataclass
+class ResolvedEpisode:
+    """已解析的剧集文件（无季/集信息时只写入电视剧）"""
+    show_details: Dict[str, Any]  # TMDb 电视剧详情
+    show_path: str
+    local_path: str
+    file_size: int = 0
+    season_number: Optional[int] = None
+    episode_number: Optional[int] = None
+    season_details: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class FileSizeUpdate:
+    """已入库文件的大小变更"""
+    media_type: str  # movie 或 tv_episode
+    local_path: str
+    file_size: int
+
+
+@dataclass
+class PersistedTitle:
+    """已写入数据库的标题（提交后回调使用）"""
+    media_type: str  # movie 或 tv_show
+    id: int
+    poster_path: Optional[str]
+    backdrop_path: Optional[str]
+    poster_placeholder: Optional[str]
+
+
+@dataclass
+class ScanCounters:
+    """扫描进度计数"""
+    processed_files: int = 0
+    found_movies: int = 0
+    found_tv_shows: int = 0
+    found_episodes: int = 0
+
+
+@dataclass(frozen=True)
+class LookupSpec:
+    """TMDb 详情中的条目数组（语言、国家、公司、播出网络）-> 查找表"""
+    details_key: str  # TMDb 详情字段
+    model: Any  # 查找表模型
+    key_column: str  # 查找表唯一键列
+    source_key: str  # 条目中对应唯一键的字段
+    columns: Sequence[str]  # 其他列（与条目字段同名）
+    item_column: str  # 关联表中的条目列
+
+
+LANGUAGES = LookupSpec("spoken_languages", Language, "iso_639_1", "iso_639_1", ("name", "english_name"), "language_id")
+COUNTRIES = LookupSpec("production_countries", Country, "iso_3166_1", "iso_3166_1", ("name",), "country_id")
+COMPANIES = LookupSpec(
+    "production_companies", Company, "tmdb_id", "id", ("name", "logo_path", "origin_country"), "company_id"
+)
+NETWORKS = LookupSpec("networks", Network, "tmdb_id", "id", ("name", "logo_path", "origin_country"), "network_id")
+
+MOVIE_LOOKUPS = [
+    (LANGUAGES, movie_language_association),
+    (COUNTRIES, movie_country_association),
+    (COMPANIES, movie_company_association),
+]
+TV_SHOW_LOOKUPS = [
+    (LANGUAGES, tv_show_language_association),
+    (COUNTRIES, tv_show_country_association),
+    (COMPANIES, tv_show_company_association),
+    (NETWORKS, tv_show_network_association),
+]
+
+
+# 写入器队列控制信号
+_STOP = object()
+
+
+def _movie_row(item: ResolvedMovie, now: datetime) -> Dict[str, Any]:
+    """TMDb 电影详情 -> movies 表行"""
+    details = item.details
+    year, release_ts = derive_release_fields(details.get("release_date"))
+    return {
+        "tmdb_id": details["id"],
+        "imdb_id": details.get("imdb_id"),
+        "title": details["title"],
+        "original_title": details.get("original_title"),
+        "overview": details.get("overview"),
+        "tagline": details.get("tagline"),
+        "release_date": details.get("release_date"),
+        "year": year,
+        "release_ts": release_ts,
+        "status": details.get("status"),
+        "vote_average": details.get("vote_average"),
+        "vote_count": details.get("vote_count"),
+        "popularity": details.get("popularity"),
+        "runtime": details.get("runtime"),
+        "budget": details.get("budget"),
+        "revenue": details.get("revenue"),
+        "poster_path": details.get("poster_path"),
+        "backdrop_path": details.get("backdrop_path"),
+        "local_path": item.local_path,
+        "file_size": item.file_size,
+        "original_language": details.get("original_language"),
+        "adult": details.get("adult", False),
+        "video": details.get("video", False),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _show_row(item: ResolvedEpisode, now: datetime) -> Dict[str, Any]:
+    """TMDb 电视剧详情 -> tv_shows 表行"""
+    details = item.show_details
+    year, first_air_ts = derive_release_fields(details.get("first_air_date"))
+    return {
+        "tmdb_id": details["id"],
+        "name": details["name"],
+        "original_name": details.get("original_name"),
+        "overview": details.get("overview"),
+        "tagline": details.get("tagline"),
+        "first_air_date": details.get("first_air_date"),
+        "year": year,
+        "first_air_ts": first_air_ts,
+        "last_air_date": details.get("last_air_date"),
+        "status": details.get("status"),
+        "type": details.get("type"),
+        "vote_average": details.get("vote_average"),
+        "vote_count": details.get("vote_count"),
+        "popularity": details.get("popularity"),
+        "number_of_seasons": details.get("number_of_seasons"),
+        "number_of_episodes": details.get("number_of_episodes"),
+        "episode_runtime": next(iter(details.get("episode_run_time") or []), None),
+        "poster_path": details.get("poster_path"),
+        "backdrop_path": details.get("backdrop_path"),
+        "local_path": item.show_path,
+        "original_language": details.get("original_language"),
+        "adult": details.get("adult", False),
+        "in_production": details.get("in_production", False),
+        "homepage": details.get("homepage"),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _credit_entries(details: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    TMDb 详情中的演职员 -> [{"person": 人物, 演职员字段...}]
+    
+    演员按 TMDb 给出的顺序截取前 credits_max_cast 位，工作人员只保留 credits_crew_jobs 中的职位，
+    电视剧创作者（created_by）记为 Creator；详情未附带 credits 时返回 None（不改动已有数据）
+    """
+    credits = details.get("credits")
+    if credits is None:
+        return None
+    
+    crew_jobs = {job.strip() for job in settings.credits_crew_jobs.split(",") if job.strip()}
+    entries = [
+        {"person": member, "credit_type": "cast", "credit_id": member.get("credit_id"),
+         "character": member.get("character"), "department": None, "job": None, "order": member.get("order")}
+        for member in credits.get("cast", [])[:settings.credits_max_cast]
+    ]
+    entries.extend(
+        {"person": member, "credit_type": "crew", "credit_id": member.get("credit_id"),
+         "character": None, "department": member.get("department"), "job": member.get("job"), "order": None}
+        for member in credits.get("crew", []) if member.get("job") in crew_jobs
+    )
+    entries.extend(
+        {"person": creator, "credit_type": "crew", "credit_id": creator.get("credit_id"),
+         "character": None, "department": "Writing", "job": "Creator", "order": None}
+        for creator in details.get("created_by", [])
+    )
+    return [entry for entry in entries if entry["person"].get("id") and entry["credit_id"]]
+
+
+def _person_row(member: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """TMDb 演职员中的人物信息 -> people 表行"""
+    return {
+        "tmdb_id": member["id"],
+        "name": member.get("name") or "",
+        "known_for_department": member.get("known_for_department"),
+        "profile_path": member.get("profile_path"),
+        "gender": member.get("gender"),
+        "popularity": member.get("popularity"),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _upsert(db: Session, model, rows: List[Dict[str, Any]], conflict: Sequence[str]):
+    """按冲突列批量 upsert，冲突时更新除 created_at 以外的列"""
+    if not rows:
+        return
+    stmt = sqlite_insert(model)
+    update_columns = {
+        name: stmt.excluded[name]
+        for name in rows[0]
+        if name not in conflict and name != "created_at"
+    }
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=list(conflict), set_=update_columns),
+        rows
+    )
+
+
+def _keep_one_file(
+    db: Session,
+    media_type: str,
+    items: Sequence[Tuple[Hashable, Any]],
+    stored_paths: Dict[Hashable, str],
+    now: datetime
+) -> Dict[Hashable, Any]:
+    """
+    同一电影（tmdb_id）或同一集（季, 集号）对应多个文件时只保留一个路径，返回 键 -> 保留的条目
+    
+    已入库的路径对应的文件仍存在时保留原路径，否则（文件改名或替换）使用新路径；
+    同一批次中先出现的文件优先。其余文件记入 duplicate_files，之后的扫描直接跳过
+    """
+    kept: Dict[Hashable, Any] = {}
+    duplicates = {}
+    for key, item in items:
+        stored = stored_paths.get(key)
+        if key in kept:
+            kept_path = kept[key].local_path
+        elif stored is not None and stored != item.local_path and os.path.exists(stored):
+            kept_path = stored
+        else:
+            kept[key] = item
+            continue
+        if kept_path == item.local_path:
+            continue
+        logger.warning(f"重复的媒体文件，保留 {kept_path}，跳过 {item.local_path}")
+        duplicates[item.local_path] = {
+            "media_type": media_type,
+            "local_path": item.local_path,
+            "file_size": item.file_size,
+            "kept_path": kept_path,
+            "created_at": now,
+            "updated_at": now,
+        }
+    
+    # 成为入库路径的文件不再是重复文件（保留的文件删除后由其他版本接替）
+    if kept:
+        db.execute(delete(DuplicateFile).where(
+            DuplicateFile.local_path.in_([item.local_path for item in kept.values()])
+        ))
+    _upsert(db, DuplicateFile, list(duplicates.values()), ["local_path"])
+    return kept
+
+
+def _replace_links(db: Session, table, owner_column: str, links: Dict[int, List[int]], item_column: str = "genre_id"):
+    """重写标题与类型等查找表条目的关联（先删后插，同一事务内完成）"""
+    if not links:
+        return
+    owner = table.c[owner_column]
+    db.execute(delete(table).where(owner.in_(list(links))))
+    rows = [
+        {owner_column: owner_id, item_column: item_id}
+        for owner_id, item_ids in links.items()
+        for item_id in dict.fromkeys(item_ids)
+    ]
+    if rows:
+        db.execute(table.insert(), rows)
+
+
+def _write_lookups(db: Session, lookups, owner_column: str, details: Dict[int, Dict[str, Any]], now: datetime):
+    """写入查找表条目并重写标题的关联；详情中缺少某字段时不改动该字段的已有关联"""
+    for spec, table in lookups:
+        rows: Dict[Any, Dict[str, Any]] = {}
+        keys_by_owner: Dict[int, List[Any]] = {}
+        for owner_id, owner_details in details.items():
+            entries = owner_details.get(spec.details_key)
+            if entries is None:
+                continue
+            keys_by_owner[owner_id] = []
+            for entry in entries:
+                key = entry.get(spec.source_key)
+                if key is None or key == "":
+                    continue
+                rows[key] = {
+                    spec.key_column: key,
+                    **{column: entry.get(column) for column in spec.columns},
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                keys_by_owner[owner_id].append(key)
+        if not keys_by_owner:
+            continue
+        
+        key_column = getattr(spec.model, spec.key_column)
+        ids = {}
+        if rows:
+            _upsert(db, spec.model, list(rows.values()), [spec.key_column])
+            ids = dict(db.execute(select(key_column, spec.model.id).where(key_column.in_(list(rows)))).all())
+        _replace_links(db, table, owner_column, {
+            owner_id: [ids[key] for key in keys] for owner_id, keys in keys_by_owner.items()
+        }, spec.item_column)
+
+
+def _write_credits(db: Session, model, owner_column: str, entries: Dict[int, List[Dict[str, Any]]], now: datetime):
+    """批量写入人物并重写作品的演职员（先删后插，同一事务内完成）"""
+    if not entries:
+        return
+    people = {
+        entry["person"]["id"]: _person_row(entry["person"], now)
+        for owner_entries in entries.values() for entry in owner_entries
+    }
+    _upsert(db, Person, list(people.values()), ["tmdb_id"])
+    person_ids = dict(db.execute(
+        select(Person.tmdb_id, Person.id).where(Person.tmdb_id.in_(list(people)))
+    ).all())
+    
+    owner = getattr(model, owner_column)
+    db.execute(delete(model).where(owner.in_(list(entries))))
+    rows = {
+        (owner_id, entry["credit_id"]): {
+            owner_column: owner_id,
+            "person_id": person_ids[entry["person"]["id"]],
+            **{key: value for key, value in entry.items() if key != "person"},
+        }
+        for owner_id, owner_entries in entries.items()
+        for entry in owner_entries
+    }
+    if rows:
+        db.execute(model.__table__.insert(), list(rows.values()))
+
+
+class ScanWriter:
+    """
+    扫描写入器
+    
+    所有解析结果经由同一个队列进入唯一的写入协程，按 batch_size 合并为一个事务，
+    事务在异步会话中执行，不阻塞事件循环；同一时刻只有一个写事务，不会争用 SQLite 写锁。
+    进度计数随数据批次写入扫描任务，实时进度通过 on_progress 回调推送，不单独提交。
+    写入失败的条目计入 failed_items（最后一个错误为 last_error），由调用方决定扫描结果。
+    """
+    
+    def __init__(
+        self,
+        scan_task_id: Optional[int] = None,
+        batch_size: int = None,
+        flush_interval: float = 1.0,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        on_persisted: Optional[Callable[[List[PersistedTitle]], None]] = None,
+        on_progress: Optional[Callable[[ScanCounters], None]] = None
+    ):
+        self.scan_task_id = scan_task_id
+        self.batch_size = batch_size or settings.batch_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self.on_persisted = on_persisted
+        self.on_progress = on_progress
+        self.counters = ScanCounters()
+        self.failed_items = 0
+        self.last_error: Optional[str] = None
+        # 有界队列：写入跟不上时对解析器形成背压
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        self._runner: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+    
+    async def start(self):
+        """启动写入协程"""
+        self.started_at = time.monotonic()
+        self._runner = asyncio.create_task(self._run())
+        _active_writers.add(self)
+    
+    async def put(self, item):
+        """提交一个解析结果"""
+        await self.queue.put(item)
+    
+    def file_processed(self, count: int = 1):
+        """记录已处理的文件数（推送给进度回调，随下一批次写入）"""
+        self.counters.processed_files += count
+        scan_files_processed.inc(count)
+        self._notify_progress()
+    
+    def _notify_progress(self):
+        if self.on_progress:
+            try:
+                self.on_progress(self.counters)
+            except Exception as e:
+                logger.error(f"进度回调出错: {e}")
+    
+    async def close(self):
+        """写入剩余数据并停止写入协程"""
+        await self.queue.put(_STOP)
+        try:
+            await self._runner
+        finally:
+            _active_writers.discard(self)
+    
+    async def _run(self):
+        batch: list = []
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                item = None
+            
+            if item is _STOP:
+                break
+            if item is not None:
+                batch.append(item)
+            
+            if len(batch) >= self.batch_size or (item is None and batch):
+                await self._flush(batch)
+                batch = []
+        
+        if batch:
+            await self._flush(batch)
+    
+    async def _flush(self, batch: list):
+        """在异步会话中执行一次批量写事务"""
+        processed = self.counters.processed_files
+        try:
+            async with self.session_factory() as db:
+                persisted, generation = await db.run_sync(self._flush_sync, batch, processed)
+        except Exception as e:
+            # 整个事务失败（数据库锁定、磁盘已满等）：整批数据未写入
+            self._record_failure(len(batch), e)
+            logger.error(f"批量写入失败，{len(batch)} 个条目未写入: {e}")
+            return
+        
+        # 媒体库数据已变化，依赖旧数据的缓存（列表总数等）随之失效
+        bump_library_generation(generation)
+        self._notify_progress()
+        if persisted and self.on_persisted:
+            try:
+                self.on_persisted(persisted)
+            except Exception as e:
+                logger.error(f"写入回调出错: {e}")
+    
+    def _flush_sync(self, db: Session, batch: list, processed: int) -> Tuple[List[PersistedTitle], Optional[int]]:
+        """
+        写入一个批次（由 AsyncSession.run_sync 调用，db 为其同步视图）
+        
+        返回写入的标题与本次提交的媒体库代数
+        """
+        try:
+            delta = ScanCounters()
+            persisted = self._write_items(db, batch, delta)
+            self._write_progress(db, processed, delta)
+            generation = next_library_generation(db)
+            db.commit()
+            self._merge_counters(delta)
+            return persisted, generation
+        except Exception as e:
+            db.rollback()
+            if len(batch) <= 1:
+                raise
+            logger.warning(f"批次写入失败，逐条重试: {e}")
+        
+        # 批次中存在冲突数据时逐条写入，隔离出错的条目
+        persisted = []
+        for item in batch:
+            try:
+                delta = ScanCounters()
+                written = self._write_items(db, [item], delta)
+                db.commit()
+                self._merge_counters(delta)
+                persisted.extend(written)
+            except Exception as e:
+                db.rollback()
+                self._record_failure(1, e)
+                logger.error(f"写入 {getattr(item, 'local_path', item)} 失败: {e}")
+        self._write_progress(db, processed, ScanCounters())
+        generation = next_library_generation(db)
+        db.commit()
+        return persisted, generation
+    
+    def _record_failure(self, count: int, error: Exception):
+        """记录未能写入的条目"""
+        self.failed_items += count
+        self.last_error = str(error)
+    
+    def _merge_counters(self, delta: ScanCounters):
+        """事务提交后累加计数"""
+        self.counters.found_movies += delta.found_movies
+        self.counters.found_tv_shows += delta.found_tv_shows
+        self.counters.found_episodes += delta.found_episodes
+    
+    def _write_progress(self, db: Session, processed: int, delta: ScanCounters):
+        """更新扫描任务进度（与数据写入同一事务）"""
+        if self.scan_task_id is None:
+            return
+        counters = self.counters
+        db.execute(
+            update(ScanTask)
+            .where(ScanTask.id == self.scan_task_id)
+            .values(
+                processed_files=processed,
+                found_movies=counters.found_movies + delta.found_movies,
+                found_tv_shows=counters.found_tv_shows + delta.found_tv_shows,
+                found_episodes=counters.found_episodes + delta.found_episodes,
+                updated_at=datetime.utcnow()
+            )
+        )
+    
+    def _write_items(self, db: Session, items: list, delta: ScanCounters) -> List[PersistedTitle]:
+        """在当前事务中写入一批解析结果"""
+        now = datetime.utcnow()
+        movies = [item for item in items if isinstance(item, ResolvedMovie)]
+        episodes = [item for item in items if isinstance(item, ResolvedEpisode)]
+        size_updates = [item for item in items if isinstance(item, FileSizeUpdate)]
+        persisted: List[PersistedTitle] = []
+        
+        # 受影响行写入前的快照，写入后比较差值更新媒体库统计（同一事务）
+        affected = dict(
+            movie_tmdb_ids={item.details["id"] for item in movies},
+            show_tmdb_ids={item.show_details["id"] for item in episodes},
+            movie_paths=[item.local_path for item in size_updates if item.media_type == "movie"],
+            episode_paths=[item.local_path for item in size_updates if item.media_type != "movie"],
+        )
+        stats_before = take_snapshot(db, **affected)
+        
+        # 类型：名称或 tmdb_id 已存在时忽略
+        genres = {}
+        for item in movies:
+            genres.update({g["id"]: g["name"] for g in item.details.get("genres", [])})
+        for item in episodes:
+            genres.update({g["id"]: g["name"] for g in item.show_details.get("genres", [])})
+        genre_ids: Dict[int, int] = {}
+        if genres:
+            db.execute(
+                sqlite_insert(Genre).on_conflict_do_nothing(),
+                [
+                    {"tmdb_id": tmdb_id, "name": name, "created_at": now, "updated_at": now}
+                    for tmdb_id, name in genres.items()
+                ]
+            )
+            genre_ids = dict(db.execute(
+                select(Genre.tmdb_id, Genre.id).where(Genre.tmdb_id.in_(list(genres)))
+            ).all())
+        
+        # 电影（每部电影只保存一个文件路径，其他版本记为重复文件）
+        if movies:
+            stored_paths = dict(db.execute(
+                select(Movie.tmdb_id, Movie.local_path)
+                .where(Movie.tmdb_id.in_(list(affected["movie_tmdb_ids"])))
+            ).all())
+            kept = _keep_one_file(
+                db, "movie", [(item.details["id"], item) for item in movies], stored_paths, now
+            )
+            movies = list(kept.values())
+        if movies:
+            movie_rows = {item.details["id"]: _movie_row(item, now) for item in movies}
+            _upsert(db, Movie, list(movie_rows.values()), ["tmdb_id"])
+            
+            rows = db.execute(
+                select(
+                    Movie.tmdb_id, Movie.id, Movie.poster_path,
+                    Movie.backdrop_path, Movie.poster_placeholder
+                ).where(Movie.tmdb_id.in_(list(movie_rows)))
+            ).all()
+            movie_ids = {row.tmdb_id: row.id for row in rows}
+            persisted.extend(
+                PersistedTitle("movie", row.id, row.poster_path, row.backdrop_path, row.poster_placeholder)
+                for row in rows
+            )
+            _replace_links(db, movie_genre_association, "movie_id", {
+                movie_ids[item.details["id"]]: [
+                    genre_ids[g["id"]] for g in item.details.get("genres", []) if g["id"] in genre_ids
+                ]
+                for item in movies
+            })
+            _write_lookups(db, MOVIE_LOOKUPS, "movie_id", {
+                movie_ids[item.details["id"]]: item.details for item in movies
+            }, now)
+            movie_credits = {}
+            for item in movies:
+                entries = _credit_entries(item.details)
+                if entries is not None:
+                    movie_credits[movie_ids[item.details["id"]]] = entries
+            _write_credits(db, MovieCredit, "movie_id", movie_credits, now)
+            delta.found_movies += len(movie_rows)
+        
+        if episodes:
+            persisted.extend(self._write_episodes(db, episodes, genre_ids, delta, now))
+        
+        # 已入库文件的大小变更
+        for item in size_updates:
+            model = Movie if item.media_type == "movie" else TVEpisode
+            db.execute(
+                update(model)
+                .where(model.local_path == item.local_path)
+                .values(file_size=item.file_size, updated_at=now)
+            )
+        
+        apply_stats_delta(db, diff_snapshots(stats_before, take_snapshot(db, **affected)))
+        return persisted
+    
+    def _write_episodes(
+        self,
+        db: Session,
+        episodes: List[ResolvedEpisode],
+        genre_ids: Dict[int, int],
+        delta: ScanCounters,
+        now: datetime
+    ) -> List[PersistedTitle]:
+        """写入电视剧、季和剧集"""
+        show_rows = {item.show_details["id"]: _show_row(item, now) for item in episodes}
+        existing_shows = set(db.execute(
+            select(TVShow.tmdb_id).where(TVShow.tmdb_id.in_(list(show_rows)))
+        ).scalars())
+        _upsert(db, TVShow, list(show_rows.values()), ["tmdb_id"])
+        
+        rows = db.execute(
+            select(
+                TVShow.tmdb_id, TVShow.id, TVShow.poster_path,
+                TVShow.backdrop_path, TVShow.poster_placeholder
+            ).where(TVShow.tmdb_id.in_(list(show_rows)))
+        ).all()
+        show_ids = {row.tmdb_id: row.id for row in rows}
+        persisted = [
+            PersistedTitle("tv_show", row.id, row.poster_path, row.backdrop_path, row.poster_placeholder)
+            for row in rows
+        ]
+        _replace_links(db, tv_show_genre_association, "tv_show_id", {
+            show_ids[item.show_details["id"]]: [
+                genre_ids[g["id"]]
+                for g in item.show_details.get("genres", []) if g["id"] in genre_ids
+            ]
+            for item in episodes
+        })
+        _write_lookups(db, TV_SHOW_LOOKUPS, "tv_show_id", {
+            show_ids[item.show_details["id"]]: item.show_details for item in episodes
+        }, now)
+        show_credits = {}
+        for item in episodes:
+            entries = _credit_entries(item.show_details)
+            if entries is not None:
+                show_credits[show_ids[item.show_details["id"]]] = entries
+        _write_credits(db, TVCredit, "tv_show_id", show_credits, now)
+        delta.found_tv_shows += len(set(show_rows) - existing_shows)
+        
+        # 季
+        with_episode = [
+            item for item in episodes
+            if item.season_number is not None and item.episode_number is not None
+        ]
+        season_rows = {}
+        for item in with_episode:
+            season = item.season_details or {}
+            if not season.get("id"):
+                continue
+            season_rows[(show_ids[item.show_details["id"]], item.season_number)] = {
+                "tmdb_id": season["id"],
+                "tv_show_id": show_ids[item.show_details["id"]],
+                "season_number": item.season_number,
+                "name": season.get("name") or f"Season {item.season_number}",
+                "overview": season.get("overview"),
+                "air_date": season.get("air_date"),
+                "episode_count": len(season.get("episodes", [])),
+                "poster_path": season.get("poster_path"),
+                "created_at": now,
+                "updated_at": now,
+            }
+        _upsert(db, TVSeason, list(season_rows.values()), ["tv_show_id", "season_number"])
+        
+        season_ids = {
+            (row.tv_show_id, row.season_number): row.id
+            for row in db.execute(
+                select(TVSeason.id, TVSeason.tv_show_id, TVSeason.season_number)
+                .where(TVSeason.tv_show_id.in_(list(show_ids.values())))
+            )
+        }
+        
+        # 剧集（按 (季, 集号) upsert，每一集只保存一个文件路径，其他版本记为重复文件）
+        candidates = []
+        for item in with_episode:
+            season_id = season_ids.get((show_ids[item.show_details["id"]], item.season_number))
+            if season_id is None:
+                logger.warning(f"未找到季信息，跳过剧集: {item.local_path}")
+                continue
+            candidates.append(((season_id, item.episode_number), item))
+        stored_paths = {
+            (row.season_id, row.episode_number): row.local_path
+            for row in db.execute(
+                select(TVEpisode.season_id, TVEpisode.episode_number, TVEpisode.local_path)
+                .where(TVEpisode.season_id.in_(list({season_id for (season_id, _), _ in candidates})))
+            )
+        }
+        kept = _keep_one_file(db, "tv_episode", candidates, stored_paths, now)
+        
+        episode_rows = {}
+        for (season_id, _), item in kept.items():
+            episode = next(
+                (
+                    ep for ep in (item.season_details or {}).get("episodes", [])
+                    if ep.get("episode_number") == item.episode_number
+                ),
+                {}
+            )
+            episode_rows[(season_id, item.episode_number)] = {
+                "tmdb_id": episode.get("id"),
+                "season_id": season_id,
+                "episode_number": item.episode_number,
+                "name": episode.get("name"),
+                "overview": episode.get("overview"),
+                "air_date": episode.get("air_date"),
+                "runtime": episode.get("runtime"),
+                "vote_average": episode.get("vote_average"),
+                "vote_count": episode.get("vote_count"),
+                "still_path": episode.get("still_path"),
+                "local_path": item.local_path,
+                "file_size": item.file_size,
+                "created_at": now,
+                "updated_at": now,
+            }
+        _upsert(db, TVEpisode, list(episode_rows.values()), ["season_id", "episode_number"])
+        delta.found_episodes += len(episode_rows)
+        
+        return persisted
+
+
+# 运行中的写入器（抓取指标时读取队列长度与处理速度）
+_active_writers: "weakref.WeakSet[ScanWriter]" = weakref.WeakSet()
+
+
+@registry.add_collector
+def collect_scan_metrics() -> List[Gauge]:
+    """进行中扫描的待写入队列长度与文件处理速度"""
+    active = Gauge("scenescape_scan_active", "进行中的扫描数")
+    queue_depth = Gauge("scenescape_scan_queue_depth", "等待写入的解析结果数")
+    files_per_second = Gauge("scenescape_scan_files_per_second", "进行中扫描自开始以来的平均文件处理速度")
+    writers = list(_active_writers)
+    now = time.monotonic()
+    active.set(len(writers))
+    queue_depth.set(sum(writer.queue.qsize() for writer in writers))
+    files_per_second.set(sum(
+        writer.counters.processed_files / (now - writer.started_at)
+        for writer in writers if writer.started_at is not None and now > writer.started_at
+    ))
+    return [active, queue_depth, files_per_second]
@@ -0,0 +1,94 @@
+"""
+SceneScape Backend - 全文搜索
+基于 SQLite FTS5（trigram 分词）搜索标题、原始标题和简介，按 bm25 相关度排序；
+过短的搜索词（trigram 至少需要 3 个字符）以及 FTS5 不可用时使用 LIKE 子串匹配
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, Select, or_, text
+
+from . import database
+from .database import FULLTEXT_TABLES
+
+# trigram 分词下能命中索引的最短搜索词
+MIN_TERM_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class FullTextSpec:
+    """主表对应的全文索引"""
+    fts_table: str
+    columns: Tuple[str, ...]
+    weights: Tuple[float, ...]  # bm25 列权重：标题 > 原始标题 > 简介
+
+
+FULLTEXT_SPECS = {
+    "movies": FullTextSpec("movies_fts", FULLTEXT_TABLES["movies_fts"][1], (10.0, 5.0, 1.0)),
+    "tv_shows": FullTextSpec("tv_shows_fts", FULLTEXT_TABLES["tv_shows_fts"][1], (10.0, 5.0, 1.0)),
+}
+
+def fulltext_available() -> bool:
+    """全文索引是否可用（启动迁移时检测）"""
+    return database.fulltext_enabled
+
+
+def split_terms(search: Optional[str]) -> List[str]:
+    """按空白拆分搜索词（多个词之间为 AND 关系）"""
+    return (search or "").split()
+
+
+def build_match_query(terms: List[str]) -> str:
+    """构造 FTS5 MATCH 表达式：每个词作为短语匹配，避免用户输入被解析为 FTS 语法"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _partition_terms(terms: List[str]) -> Tuple[List[str], List[str]]:
+    """拆分为 (走全文索引的词, 走 LIKE 的词)"""
+    if not fulltext_available():
+        return [], terms
+    indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    return indexed, [term for term in terms if len(term) < MIN_TERM_LENGTH]
+
+
+def _ranked_matches(spec: FullTextSpec, match: str):
+    """全文匹配子查询：(id, rank)，rank 越小越相关"""
+    weights = ", ".join(str(weight) for weight in spec.weights)
+    return (
+        text(
+            f"SELECT rowid AS id, bm25({spec.fts_table}, {weights}) AS rank "
+            f"FROM {spec.fts_table} WHERE {spec.fts_table} MATCH :match"
+        )
+        .bindparams(match=match)
+        .columns(id=Integer, rank=Float)
+        .subquery()
+    )
+
+
+def _like_filter(model, spec: FullTextSpec, terms: List[str]):
+    columns = [getattr(model, column) for column in spec.columns]
+    return [
+        or_(*(column.contains(term, autoescape=True) for column in columns))
+        for term in terms
+    ]
+
+
+def apply_text_search(query: Select, model, search: Optional[str]) -> Select:
+    """
+    为列表查询添加搜索条件
+    
+    含全文索引词时结果按相关度排序，否则按原有顺序返回子串匹配结果
+    """
+    terms = split_terms(search)
+    if not terms:
+        return query
+    
+    spec = FULLTEXT_SPECS[model.__tablename__]
+    indexed, unindexed = _partition_terms(terms)
+    if indexed:
+        ranked = _ranked_matches(spec, build_match_query(indexed))
+        query = query.join(ranked, ranked.c.id == model.id).order_by(ranked.c.rank)
+    if unindexed:
+        query = query.filter(*_like_filter(model, spec, unindexed))
+    return query
@@ -7,11 +7,14 @@ SceneScape Backend - 后台任务管理器
 import asyncio
 import logging
 import uuid
+import weakref
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Dict, Any, Optional, Callable, List
 from dataclasses import dataclass, field
 
+from .metrics import Gauge, registry
+
 logger = logging.getLogger(__name__)
 
 class TaskStatus(Enum):
@@ -62,7 +65,8 @@ class BackgroundTask:
 class TaskManager:
     """后台任务管理器"""
     
-    def __init__(self, max_concurrent_tasks: int = 5):
+    def __init__(self, max_concurrent_tasks: int = 5, name: str = "default"):
+        self.name = name
         self.max_concurrent_tasks = max_concurrent_tasks
         self.tasks: Dict[str, BackgroundTask] = {}
         self.running_tasks: Dict[str, asyncio.Task] = {}
@@ -70,6 +74,7 @@ class TaskManager:
         self.workers_running = False
         self._cleanup_interval = 3600  # 1小时清理一次
         self._max_task_history = 100  # 最多保留100个历史任务
+        _task_managers.add(self)
     
     async def start_workers(self):
         """启动工作进程"""
@@ -88,7 +93,7 @@ class TaskManager:
         cleanup_task = asyncio.create_task(self._cleanup_worker())
         workers.append(cleanup_task)
         
-        logger.info(f"启动了 {self.max_concurrent_tasks} 个工作进程")
+        logger.info(f"任务管理器 {self.name} 启动了 {self.max_concurrent_tasks} 个工作进程")
         
         # 等待所有工作进程（这在正常情况下不会返回）
         await asyncio.gather(*workers)
@@ -122,6 +127,7 @@ class TaskManager:
                 task = self.tasks.get(task_id)
                 
                 if not task or task.status != TaskStatus.PENDING:
+                    self.task_queue.task_done()
                     continue
                 
                 # 更新任务状态
@@ -242,10 +248,8 @@ class TaskManager:
         
         self.tasks[task_id] = task
         
-        # 添加到队列
-        asyncio.create_task(
-            self.task_queue.put((task_id, coro_func, args, kwargs))
-        )
+        # 添加到队列（无界队列，直接入队）
+        self.task_queue.put_nowait((task_id, coro_func, args, kwargs))
         
         logger.info(f"创建任务 {task_id}: {name}")
         return task_id
@@ -355,6 +359,7 @@ class TaskManager:
             "total_tasks": len(self.tasks),
             "running_tasks": len(self.running_tasks),
             "queue_size": self.task_queue.qsize(),
+            "name": self.name,
             "max_concurrent": self.max_concurrent_tasks,
             "workers_running": self.workers_running,
             "status_counts": {}
@@ -367,6 +372,23 @@ class TaskManager:
         
         return stats
 
+# 所有任务管理器实例（抓取指标时读取各自的统计）
+_task_managers: "weakref.WeakSet[TaskManager]" = weakref.WeakSet()
+
+@registry.add_collector
+def collect_task_metrics() -> List[Gauge]:
+    """各任务管理器的队列长度、运行中任务数与各状态任务数"""
+    queued = Gauge("scenescape_tasks_queued", "等待执行的后台任务数", ("manager",))
+    running = Gauge("scenescape_tasks_running", "正在执行的后台任务数", ("manager",))
+    by_status = Gauge("scenescape_tasks", "保留的后台任务数（按状态）", ("manager", "status"))
+    for manager in list(_task_managers):
+        stats = manager.get_stats()
+        queued.set(stats["queue_size"], manager=manager.name)
+        running.set(stats["running_tasks"], manager=manager.name)
+        for status, count in stats["status_counts"].items():
+            by_status.set(count, manager=manager.name, status=status)
+    return [queued, running, by_status]
+
 # 全局任务管理器实例
 task_manager = TaskManager()
 
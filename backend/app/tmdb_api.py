@@ -2,20 +2,53 @@
 
 import asyncio
 import logging
+import os
+import time
+import uuid
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+import aiofiles
 import httpx
-from .config import get_tmdb_settings
+from .config import get_settings, get_tmdb_settings
+from .metrics import tmdb_endpoint_label, tmdb_rate_limit_wait, tmdb_request_duration, tmdb_requests
 
 logger = logging.getLogger(__name__)
 
+# 图片流式下载的分块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 
 class TMDbAPIError(Exception):
     """TMDb API 错误"""
     pass
 
 
+class RateLimiter:
+    """简单的异步限速器：保证相邻请求之间的最小间隔"""
+    
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> float:
+        """等待下一个可用的请求时间片，返回等待时长（秒）"""
+        if not self.interval:
+            return 0.0
+        async with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+# 所有 TMDb 请求共享的限速器
+rate_limiter = RateLimiter(get_settings().tmdb_rate_limit)
+
+
 class TMDbAPIClient:
     """TMDb API 客户端"""
     
@@ -42,13 +75,20 @@ class TMDbAPIClient:
         if not self.client:
             raise TMDbAPIError("客户端未初始化")
         
+        label = tmdb_endpoint_label(endpoint)
         try:
             # 添加默认参数
             default_params = {"language": self.settings.language}
             if params:
                 default_params.update(params)
             
-            response = await self.client.get(endpoint, params=default_params)
+            tmdb_rate_limit_wait.observe(await rate_limiter.acquire())
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(endpoint, params=default_params)
+            finally:
+                tmdb_request_duration.observe(time.perf_counter() - start, endpoint=label)
+            tmdb_requests.inc(endpoint=label, status=response.status_code)
             response.raise_for_status()
             
             data = response.json()
@@ -59,6 +99,7 @@ class TMDbAPIClient:
             logger.error(f"TMDb API HTTP 错误: {e.response.status_code} - {endpoint}")
             raise TMDbAPIError(f"API请求失败: {e.response.status_code}")
         except httpx.RequestError as e:
+            tmdb_requests.inc(endpoint=label, status="error")
             logger.error(f"TMDb API 请求错误: {e} - {endpoint}")
             raise TMDbAPIError(f"网络请求失败: {e}")
         except Exception as e:
@@ -155,75 +196,110 @@ class TMDbService:
     
     def __init__(self):
         self.client = TMDbAPIClient()
+        # 进行中的图片下载（按保存路径去重）
+        self._inflight_downloads: Dict[str, asyncio.Task] = {}
+        # 并发的首次请求只创建一个 httpx 客户端
+        self._client_lock = asyncio.Lock()
+    
+    async def _api(self) -> TMDbAPIClient:
+        """获取已打开的API客户端（复用连接，支持并发调用）"""
+        if self.client.client is None:
+            async with self._client_lock:
+                if self.client.client is None:
+                    await self.client.__aenter__()
+        return self.client
+    
+    async def close(self):
+        """关闭API客户端"""
+        async with self._client_lock:
+            if self.client.client is not None:
+                await self.client.__aexit__(None, None, None)
+                self.client.client = None
     
     async def search_movie(self, query: str, year: Optional[int] = None) -> List[Dict]:
         """搜索电影"""
-        async with self.client as api:
-            result = await api.search_movie(query, year)
-            return result.get("results", [])
+        api = await self._api()
+        result = await api.search_movie(query, year)
+        return result.get("results", [])
     
     async def search_tv_show(self, query: str, year: Optional[int] = None) -> List[Dict]:
         """搜索电视剧"""
-        async with self.client as api:
-            result = await api.search_tv(query, year)
-            return result.get("results", [])
+        api = await self._api()
+        result = await api.search_tv(query, year)
+        return result.get("results", [])
     
     async def search_tv(self, query: str, year: Optional[int] = None) -> List[Dict]:
         """搜索电视剧（别名方法）"""
         return await self.search_tv_show(query, year)
     
-    async def get_movie_details(self, movie_id: int) -> Dict:
-        """获取电影详细信息"""
-        async with self.client as api:
-            return await api.get_movie_details(movie_id)
+    async def get_movie_details(self, movie_id: int, append_to_response: Optional[str] = None) -> Dict:
+        """获取电影详细信息（append_to_response 附带演职员等子资源，同一次请求返回）"""
+        api = await self._api()
+        return await api.get_movie_details(movie_id, append_to_response)
     
-    async def get_tv_details(self, tv_id: int) -> Dict:
-        """获取电视剧详细信息"""
-        async with self.client as api:
-            return await api.get_tv_details(tv_id)
+    async def get_tv_details(self, tv_id: int, append_to_response: Optional[str] = None) -> Dict:
+        """获取电视剧详细信息（append_to_response 附带演职员等子资源，同一次请求返回）"""
+        api = await self._api()
+        return await api.get_tv_details(tv_id, append_to_response)
     
     async def get_tv_season_details(self, tv_id: int, season_number: int) -> Dict:
         """获取电视剧季度详细信息"""
-        async with self.client as api:
-            return await api.get_tv_season_details(tv_id, season_number)
+        api = await self._api()
+        return await api.get_tv_season_details(tv_id, season_number)
     
     async def get_tv_episode_details(self, tv_id: int, season_number: int, episode_number: int) -> Dict:
         """获取电视剧单集详细信息"""
-        async with self.client as api:
-            return await api.get_tv_episode_details(tv_id, season_number, episode_number)
+        api = await self._api()
+        return await api.get_tv_episode_details(tv_id, season_number, episode_number)
 
     async def get_all_genres(self) -> Dict[str, List[Dict]]:
         """获取所有类型"""
-        async with self.client as api:
-            movie_genres = await api.get_genres_movie()
-            tv_genres = await api.get_genres_tv()
-            
-            return {
-                "movie_genres": movie_genres.get("genres", []),
-                "tv_genres": tv_genres.get("genres", []),
-            }
+        api = await self._api()
+        movie_genres = await api.get_genres_movie()
+        tv_genres = await api.get_genres_tv()
+        
+        return {
+            "movie_genres": movie_genres.get("genres", []),
+            "tv_genres": tv_genres.get("genres", []),
+        }
     
     async def download_image(self, image_url: str, save_path: str) -> bool:
-        """下载图片到本地"""
+        """下载图片到本地（同一保存路径的并发请求只下载一次）"""
+        download = self._inflight_downloads.get(save_path)
+        if download is None:
+            download = asyncio.ensure_future(self._stream_download(image_url, save_path))
+            self._inflight_downloads[save_path] = download
+            download.add_done_callback(
+                lambda _: self._inflight_downloads.pop(save_path, None)
+            )
+        
+        return await asyncio.shield(download)
+    
+    async def _stream_download(self, image_url: str, save_path: str) -> bool:
+        """流式写入临时文件，完成后原子重命名"""
+        # 确保目录存在
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        partial_path = f"{save_path}.{uuid.uuid4().hex}.part"
+        
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.get(image_url, timeout=30)
-                response.raise_for_status()
-                
-                # 确保目录存在
-                import os
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                
-                # 写入文件
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                
-                logger.info(f"图片下载成功: {save_path}")
-                return True
+                async with client.stream("GET", image_url, timeout=30) as response:
+                    response.raise_for_status()
+                    
+                    async with aiofiles.open(partial_path, 'wb') as f:
+                        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            await f.write(chunk)
+            
+            os.replace(partial_path, save_path)
+            logger.info(f"图片下载成功: {save_path}")
+            return True
                 
         except Exception as e:
             logger.error(f"图片下载失败 {image_url}: {e}")
             return False
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
     
     async def batch_download_images(self, image_tasks: List[Dict]) -> Dict[str, bool]:
         """批量下载图片"""
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+SceneScape Backend - 每个请求的 SQL 语句数检查
+在临时数据库上请求各个 GET 接口，统计每个请求发出的 SQL 语句数，
+同一接口在不同分页大小下语句数必须相同（不随行数增长，即没有 N+1 查询）
+（同样的断言在 tests/test_query_counts.py 中由 pytest 运行，此脚本用于更大数据量下的检查）
+
+用法:
+  python benchmarks/query_counts.py --max-statements 4
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+
+# 复用查询计划检查的临时数据库与数据构造（导入时即切换到临时数据库）
+from query_plans import _tmp_dir, run_scan, scan_items
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.cache import response_cache
+from app.database import async_engine, async_read_engine, engine, init_db, read_engine
+from app.main import app
+
+ENDPOINTS = [
+    "/api/movies",
+    "/api/movies?genre=动作",
+    "/api/movies?language=ja&country=US",
+    "/api/movies?sort=rating&with_total=true",
+    "/api/movies?search=Movie",
+    "/api/tv-shows",
+    "/api/tv-shows?status=Ended",
+    "/api/tv-shows?network=102",
+    "/api/movies?fields=grid",
+    "/api/movies?fields=grid,genres&genre=动作",
+    "/api/tv-shows?fields=grid,overview",
+    "/api/search?query=Show",
+]
+
+DETAIL_ENDPOINTS = [
+    "/api/movies/1",
+    "/api/tv-shows/1",
+    "/api/tv-shows/1?expand=seasons",
+    "/api/movies/1/credits",
+    "/api/movies/batch?ids=" + ",".join(str(i) for i in range(1, 101)),
+    "/api/tv-shows/batch?ids=" + ",".join(str(i) for i in range(1, 51)),
+    "/api/stats",
+    "/api/facets",
+    "/api/facets?media_type=tv_show&genre=剧情&network=102",
+]
+
+# 语句数固定但超过默认上限的接口：(URL, 允许的语句数)
+COMPOSITE_ENDPOINTS = [
+    # 人物 + 电影演职员及其类型 + 电视剧演职员及其类型
+    ("/api/people/1/titles", 5),
+]
+
+
+class StatementCounter:
+    """统计引擎发出的 SQL 语句数"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def measure(client: TestClient, counter: StatementCounter, url: str) -> int:
+    counter.count = 0
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} -> {response.status_code}: {response.text}")
+    return counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查每个请求发出的 SQL 语句数")
+    parser.add_argument("--movies", type=int, default=300, help="写入的电影数量")
+    parser.add_argument("--shows", type=int, default=120, help="写入的电视剧数量")
+    parser.add_argument("--max-statements", type=int, default=4, help="单个请求允许的最大语句数")
+    args = parser.parse_args()
+    
+    init_db()
+    # 统计的是实际执行的 SQL，不缓存响应（预算为 0 时不存入任何条目）
+    response_cache.max_bytes = 0
+    asyncio.run(run_scan(scan_items(args.movies, args.shows)))
+    
+    counter = StatementCounter()
+    for db_engine in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine):
+        event.listen(db_engine, "before_cursor_execute", counter)
+    client = TestClient(app)
+    # 预热：首次请求会检查全文索引是否可用，并填充列表总数缓存
+    for url in ENDPOINTS:
+        client.get(url)
+    
+    failures = 0
+    for url in ENDPOINTS:
+        separator = "&" if "?" in url else "?"
+        small = measure(client, counter, f"{url}{separator}limit=5")
+        large = measure(client, counter, f"{url}{separator}limit=100")
+        ok = small == large and large <= args.max_statements
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL':4}] {url:45} limit=5: {small:3}  limit=100: {large:3}")
+    
+    for url, budget in [(url, args.max_statements) for url in DETAIL_ENDPOINTS] + COMPOSITE_ENDPOINTS:
+        statements = measure(client, counter, url)
+        ok = statements <= budget
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL':4}] {url[:45]:45} {statements:3}")
+    
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+    checked = len(ENDPOINTS) + len(DETAIL_ENDPOINTS) + len(COMPOSITE_ENDPOINTS)
+    print(f"\n共检查 {checked} 个接口，不合格: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+SceneScape Backend - 查询计划检查
+在临时数据库上执行扫描写入和各个 API 查询，记录实际发出的 SQL，
+逐条执行 EXPLAIN QUERY PLAN，检查是否存在未使用索引的全表扫描，以及列表排序是否需要临时排序
+（ANALYZE 后查询规划器会按数据量选择计划，数据量过小时小表全表扫描属于正常现象）
+
+用法:
+  python benchmarks/query_plans.py --movies 2000 --shows 50
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# 使用临时数据库（必须在导入 app 之前设置）
+_tmp_dir = tempfile.mkdtemp(prefix="scenescape-plans-")
+_db_path = os.path.join(_tmp_dir, "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import (
+    Movie, SessionLocal, TVEpisode, async_engine, async_read_engine, engine, init_db, read_engine
+)
+from app.main import app
+from app.pagination import SORT_KEYS
+from app.scan_writer import FileSizeUpdate, ResolvedEpisode, ResolvedMovie, ScanWriter
+
+GENRES = [{"id": 18, "name": "剧情"}, {"id": 28, "name": "动作"}, {"id": 35, "name": "喜剧"}]
+LANGUAGES = [{"iso_639_1": "en", "name": "English"}, {"iso_639_1": "zh", "name": "普通话"}, {"iso_639_1": "ja", "name": "日本語"}]
+
+# 带筛选条件但按设计无法走索引的语句（正则, 原因）
+EXPECTED_FULL_SCANS = [
+    (re.compile(r"LIKE '%' \|\| \? \|\| '%'"), "子串搜索无法使用 B-tree 索引"),
+    (re.compile(r"^WITH filtered AS\s+\(SELECT [^()]*\sFROM \w+\)"), "无筛选条件的分面统计需要汇总整张表"),
+]
+
+
+class StatementRecorder:
+    """记录引擎发出的 SQL（去重，保留首次出现的参数）"""
+    
+    def __init__(self):
+        self.statements = {}
+        self.phase = None
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany and parameters:
+            parameters = parameters[0]
+        key = statement.strip()
+        if key.split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            self.statements.setdefault(key, (self.phase, parameters))
+
+
+def movie_details(i: int) -> dict:
+    return {
+        "id": i,
+        "title": f"Movie {i:05d}",
+        "original_title": f"Movie {i:05d}",
+        "release_date": f"{1970 + i % 50}-0{1 + i % 9}-15",
+        "vote_average": (i % 100) / 10,
+        "popularity": (i * 37) % 1000 / 10,
+        "poster_path": f"/p{i}.jpg",
+        "genres": GENRES[: 1 + i % 3],
+        "spoken_languages": [LANGUAGES[i % 3]],
+        "production_countries": [{"iso_3166_1": "US" if i % 2 else "CN", "name": "-"}],
+        "production_companies": [{"id": 1 + i % 20, "name": f"Studio {i % 20}"}],
+        "credits": {
+            "cast": [
+                {"id": 5000 + (i + k) % 400, "name": f"Actor {(i + k) % 400}", "character": "X",
+                 "credit_id": f"c{i}-{k}", "order": k}
+                for k in range(5)
+            ],
+            "crew": [{"id": 9000 + i % 50, "name": f"Director {i % 50}", "job": "Director",
+                      "department": "Directing", "credit_id": f"d{i}"}],
+        },
+    }
+
+
+def scan_items(movies: int, shows: int):
+    """构造扫描写入器的输入（无需访问 TMDb）"""
+    items = [ResolvedMovie(movie_details(i), f"/media/movies/{i}.mkv", 1000 + i) for i in range(movies)]
+    for s in range(shows):
+        show = {
+            "id": 10 ** 6 + s,
+            "name": f"Show {s:03d}",
+            "first_air_date": f"{2000 + s % 20}-01-20",
+            "status": "Ended" if s % 2 else "Returning Series",
+            "genres": GENRES[:2],
+            "networks": [{"id": 100 + s % 5, "name": f"Network {s % 5}"}],
+            "spoken_languages": [LANGUAGES[s % 3]],
+            "created_by": [{"id": 9000 + s % 50, "name": f"Director {s % 50}", "credit_id": f"cr{s}"}],
+            "credits": {"cast": [{"id": 5000 + s, "name": f"Actor {s}", "character": "Y", "credit_id": f"t{s}", "order": 0}]},
+        }
+        for season_number in (1, 2):
+            season = {
+                "id": 10 ** 7 + s * 10 + season_number,
+                "name": f"Season {season_number}",
+                "episodes": [{"id": 10 ** 8 + s * 1000 + season_number * 100 + e, "episode_number": e} for e in range(1, 11)],
+            }
+            for e in range(1, 11):
+                items.append(ResolvedEpisode(
+                    show, f"/media/tv/{s}", f"/media/tv/{s}/S{season_number:02d}E{e:02d}.mkv", 500,
+                    season_number, e, season
+                ))
+    return items
+
+
+async def run_scan(items):
+    writer = ScanWriter()
+    await writer.start()
+    for item in items:
+        await writer.put(item)
+    await writer.close()
+
+
+def run_workload(recorder: StatementRecorder, movies: int, shows: int):
+    """执行扫描写入与 API 查询"""
+    recorder.phase = "scan"
+    items = scan_items(movies, shows)
+    asyncio.run(run_scan(items))
+    
+    # 与 perform_media_scan 相同的已入库文件预加载
+    db = SessionLocal()
+    dict(db.query(Movie.local_path, Movie.file_size).all())
+    dict(db.query(TVEpisode.local_path, TVEpisode.file_size).all())
+    db.close()
+    
+    # 重复扫描：已知文件只更新大小，已有标题走 upsert 更新分支
+    asyncio.run(run_scan(items[:50] + [FileSizeUpdate("movie", "/media/movies/1.mkv", 1)]))
+    
+    recorder.phase = "api"
+    client = TestClient(app)
+    requests = [
+        "/api/movies",
+        "/api/movies?page=3&limit=50",
+        "/api/movies?year=1999",
+        "/api/movies?genre=动作",
+        "/api/movies?language=ja&country=US",
+        "/api/movies?company=7&sort=rating",
+        "/api/movies?search=Movie 01",
+        "/api/tv-shows?search=Show",
+        "/api/search?query=Movie 0012",
+        "/api/movies/1",
+        "/api/tv-shows",
+        "/api/tv-shows?status=Ended",
+        "/api/tv-shows?year=2005",
+        "/api/tv-shows?genre=剧情",
+        "/api/tv-shows?network=102&language=zh",
+        "/api/movies?fields=grid,genres&sort=added",
+        "/api/tv-shows?fields=grid&genre=剧情",
+        "/api/tv-shows/1",
+        "/api/tv-shows/2?expand=seasons",
+        "/api/movies/batch?ids=1,2,3,500",
+        "/api/tv-shows/batch?ids=1,2",
+        "/api/movies/1/credits",
+        "/api/tv-shows/1/credits",
+        "/api/people/1/titles",
+        "/api/stats",
+        "/api/facets",
+        "/api/facets?media_type=tv_show&status=Ended&language=zh",
+        "/api/facets?search=Movie 01&genre=动作",
+    ]
+    for url in requests:
+        response = client.get(url)
+        if response.status_code != 200:
+            print(f"  ! {url} -> {response.status_code}")
+
+    # 各排序方式的游标翻页（第二页带游标条件），完整行与网格投影各一次；这些语句不允许临时排序
+    recorder.phase = "sort"
+    for path in ("/api/movies", "/api/tv-shows"):
+        for sort in SORT_KEYS["movies"]:
+            for fields in (None, "grid"):
+                response = client.get(path, params={"sort": sort, "fields": fields, "with_total": "true"})
+                next_cursor = response.headers.get("X-Next-Cursor")
+                if next_cursor:
+                    client.get(path, params={"sort": sort, "fields": fields, "cursor": next_cursor})
+
+
+def explain(conn: sqlite3.Connection, statement: str, parameters):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    return [row[3] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查扫描与 API 查询的执行计划")
+    parser.add_argument("--movies", type=int, default=2000, help="写入的电影数量")
+    parser.add_argument("--shows", type=int, default=50, help="写入的电视剧数量（每部 2 季 × 10 集）")
+    parser.add_argument("--verbose", action="store_true", help="输出每条语句的完整执行计划")
+    args = parser.parse_args()
+    
+    init_db()
+    recorder = StatementRecorder()
+    for db_engine in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine):
+        event.listen(db_engine, "before_cursor_execute", recorder)
+    run_workload(recorder, args.movies, args.shows)
+    
+    conn = sqlite3.connect(_db_path)
+    conn.execute("ANALYZE")
+    # 只关心数据表的全表扫描（子查询协程、系统表不计）
+    tables = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )
+    }
+    failures = 0
+    for statement, (phase, parameters) in recorder.statements.items():
+        plan = explain(conn, statement, parameters)
+        full_scans = [
+            step for step in plan
+            if step.startswith("SCAN ") and "INDEX" not in step and step.split()[1] in tables
+        ]
+        temp_sorts = [step for step in plan if "TEMP B-TREE" in step]
+        expected = next((reason for pattern, reason in EXPECTED_FULL_SCANS if pattern.search(statement)), None)
+        # 没有筛选、连接和排序的语句本来就要读取整张表（或由 LIMIT 截断）
+        if expected is None and not re.search(r"\b(WHERE|JOIN|ORDER BY)\b", statement):
+            expected = "无筛选条件，按设计读取整张表"
+        
+        # 列表排序必须由索引提供顺序
+        unindexed_sort = phase == "sort" and any("FOR ORDER BY" in step for step in temp_sorts)
+        
+        if (full_scans and not expected) or unindexed_sort:
+            status = "FAIL"
+            failures += 1
+        elif full_scans:
+            status = "ok*"
+        else:
+            status = "ok"
+        
+        summary = " ".join(statement.split())
+        print(f"[{status:4}] {phase:4} {summary[:110]}")
+        if full_scans:
+            print(f"         全表扫描: {'; '.join(full_scans)}" + (f"（{expected}）" if expected else ""))
+        if temp_sorts:
+            print(f"         临时排序: {'; '.join(temp_sorts)}")
+        if args.verbose:
+            for step in plan:
+                print(f"         {step}")
+    
+    conn.close()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+    print(f"\n共检查 {len(recorder.statements)} 条语句，未使用索引的全表扫描或排序: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
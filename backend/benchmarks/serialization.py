@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+SceneScape Backend - 响应序列化与压缩对比
+在临时数据库上请求列表接口，比较不同 JSON 编码方式的耗时，
+以及请求端到端的 CPU 时间和不压缩 / gzip 时实际传输的字节数
+
+用法:
+  python benchmarks/serialization.py --movies 2000 --limit 100
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import time
+from typing import Any
+
+# 复用查询计划检查的临时数据库与数据构造（导入时即切换到临时数据库）
+from query_plans import _tmp_dir, run_scan, scan_items
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.cache import response_cache
+from app.database import init_db
+from app.main import app
+
+try:
+    import orjson
+except ImportError:  # 未安装时不参与对比
+    orjson = None
+
+ENDPOINTS = [
+    "/api/movies",
+    "/api/movies?sort=rating",
+    "/api/movies?fields=grid",
+    "/api/tv-shows",
+    "/api/search?query=Movie",
+]
+
+
+def response_adapter(path: str) -> TypeAdapter:
+    """接口声明的 response_model"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods:
+            return TypeAdapter(route.response_model)
+    raise RuntimeError(f"未找到接口: {path}")
+
+
+def timed(func, rounds: int) -> float:
+    """单次调用的平均 CPU 时间（毫秒）"""
+    start = time.process_time()
+    for _ in range(rounds):
+        func()
+    return (time.process_time() - start) * 1000 / rounds
+
+
+def encoders(adapter: TypeAdapter, value):
+    """各编码方式：名称 -> 生成响应体的函数"""
+    result = {
+        # JSONResponse：先转为 JSON 兼容的 Python 对象，再由标准库 json 编码
+        "stdlib json": lambda: JSONResponse.render(None, adapter.dump_python(value, mode="json")),
+        # FastAPI 默认路径（声明了 response_model 时）：pydantic 直接生成 JSON 字节
+        "pydantic": lambda: adapter.dump_json(value),
+    }
+    if orjson is not None:
+        # 自定义 orjson 响应类：同样需要先转为 Python 对象
+        result["orjson"] = lambda: orjson.dumps(
+            adapter.dump_python(value, mode="json"), option=orjson.OPT_NON_STR_KEYS
+        )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较列表接口的序列化耗时与传输字节数")
+    parser.add_argument("--movies", type=int, default=1000, help="写入的电影数量")
+    parser.add_argument("--shows", type=int, default=100, help="写入的电视剧数量")
+    parser.add_argument("--limit", type=int, default=100, help="每页条数")
+    parser.add_argument("--rounds", type=int, default=50, help="每项测量的重复次数")
+    args = parser.parse_args()
+    
+    init_db()
+    # 测量的是每次请求的完整处理，不缓存响应
+    response_cache.max_bytes = 0
+    asyncio.run(run_scan(scan_items(args.movies, args.shows)))
+    client = TestClient(app)
+    
+    print(f"orjson: {'已安装' if orjson is not None else '未安装（不参与对比）'}\n")
+    for endpoint in ENDPOINTS:
+        separator = "&" if "?" in endpoint else "?"
+        url = f"{endpoint}{separator}limit={args.limit}"
+        if "fields=" in endpoint:
+            # 稀疏字段的响应不是完整的 response_model，按普通字典编码
+            adapter = TypeAdapter(list[dict[str, Any]])
+        else:
+            adapter = response_adapter(endpoint.split("?")[0])
+        value = adapter.validate_python(client.get(url).json())
+        
+        identity = client.get(url, headers={"Accept-Encoding": "identity"})
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        request_ms = timed(lambda: client.get(url), args.rounds)
+        
+        print(f"{url}")
+        for name, encode in encoders(adapter, value).items():
+            print(f"  编码 {name:12} {timed(encode, args.rounds):7.3f} ms  {len(encode()):8} 字节")
+        print(f"  请求 CPU        {request_ms:7.3f} ms")
+        print(
+            f"  传输 identity {identity.num_bytes_downloaded:8} 字节  "
+            f"gzip {compressed.num_bytes_downloaded:8} 字节 "
+            f"({compressed.headers.get('content-encoding', '-')}, "
+            f"{compressed.num_bytes_downloaded / identity.num_bytes_downloaded:.0%})"
+        )
+        # 压缩与否返回的内容一致
+        assert json.loads(identity.content) == compressed.json()
+    
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
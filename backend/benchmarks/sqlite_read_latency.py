@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+SceneScape Backend - SQLite 读延迟基准测试
+模拟扫描时逐文件提交的写入负载，对比默认配置（回滚日志、单一引擎）
+与性能配置（WAL + PRAGMA + 独立只读连接池）下列表查询的读延迟
+
+用法:
+  python benchmarks/sqlite_read_latency.py --rows 5000 --duration 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import DatabaseSettings
+from app.database import Base, Movie, ScanTask, create_db_engine
+
+
+def seed(session_factory, rows: int) -> int:
+    """写入初始数据，返回扫描任务 id"""
+    db = session_factory()
+    task = ScanTask(task_id="bench", path="/media/scan", status="running")
+    db.add(task)
+    db.bulk_save_objects([
+        Movie(
+            tmdb_id=i,
+            title=f"Movie {i:06d}",
+            overview="x" * 400,
+            release_date="2001-01-01",
+            local_path=f"/media/seed/{i}.mkv",
+        )
+        for i in range(rows)
+    ])
+    db.commit()
+    task_id = task.id
+    db.close()
+    return task_id
+
+
+def scan_writer(session_factory, stop: threading.Event, start_id: int, task_id: int, counter: list):
+    """模拟旧扫描流程：每个文件一次插入提交 + 一次进度提交"""
+    db = session_factory()
+    tmdb_id = start_id
+    while not stop.is_set():
+        db.add(Movie(
+            tmdb_id=tmdb_id,
+            title=f"Scanned {tmdb_id}",
+            overview="y" * 400,
+            local_path=f"/media/scan/{tmdb_id}.mkv",
+        ))
+        db.commit()
+        counter[0] += 1
+        db.execute(
+            update(ScanTask)
+            .where(ScanTask.id == task_id)
+            .values(processed_files=counter[0], current_file=f"/media/scan/{tmdb_id}.mkv")
+        )
+        db.commit()
+        tmdb_id += 1
+    db.close()
+
+
+def measure_reads(session_factory, duration: float, rows: int) -> list:
+    """循环执行列表查询并记录每次耗时（毫秒）"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    page = 0
+    while time.perf_counter() < deadline:
+        db = session_factory()
+        started = time.perf_counter()
+        db.query(Movie).order_by(Movie.id).offset((page * 20) % rows).limit(20).all()
+        latencies.append((time.perf_counter() - started) * 1000)
+        db.close()
+        page += 1
+    return latencies
+
+
+def run(profile: bool, rows: int, duration: float) -> dict:
+    """在独立的临时数据库上运行一次基准"""
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = DatabaseSettings(
+            url=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            sqlite_performance_profile=profile,
+        )
+        write_engine = create_db_engine(settings)
+        read_engine = create_db_engine(settings, read_only=True) if profile else write_engine
+        Base.metadata.create_all(bind=write_engine)
+        
+        write_factory = sessionmaker(bind=write_engine)
+        read_factory = sessionmaker(bind=read_engine)
+        task_id = seed(write_factory, rows)
+        
+        stop = threading.Event()
+        written = [0]
+        writer = threading.Thread(
+            target=scan_writer, args=(write_factory, stop, rows, task_id, written), daemon=True
+        )
+        writer.start()
+        latencies = measure_reads(read_factory, duration, rows)
+        stop.set()
+        writer.join()
+        
+        write_engine.dispose()
+        read_engine.dispose()
+    
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "writes": written[0],
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 扫描期间读延迟基准测试")
+    parser.add_argument("--rows", type=int, default=5000, help="初始电影数量")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种配置的测试时长（秒）")
+    args = parser.parse_args()
+    
+    print(f"初始数据 {args.rows} 行，每种配置运行 {args.duration} 秒\n")
+    print(f"{'配置':<22}{'读次数':>8}{'写文件数':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for label, profile in (("默认 (rollback)", False), ("性能配置 (WAL+只读池)", True)):
+        result = run(profile, args.rows, args.duration)
+        print(
+            f"{label:<22}{result['reads']:>8}{result['writes']:>10}"
+            f"{result['p50']:>10.2f}{result['p95']:>10.2f}{result['p99']:>10.2f}{result['max']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
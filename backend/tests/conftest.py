@@ -0,0 +1,135 @@
+"""
+测试公共夹具
+
+app.database 在导入时按 DATABASE_URL 创建引擎，因此在导入 app 之前把数据库与缓存目录指向临时目录；
+每个测试开始前释放连接池、删除数据库文件并重新初始化，测试之间互不影响
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="scenescape-tests-")
+_db_path = Path(_tmp_dir) / "test.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["STATIC_FILES_PATH"] = os.path.join(_tmp_dir, "static")
+os.environ["UPLOAD_PATH"] = os.path.join(_tmp_dir, "static", "uploads")
+os.environ["IMAGES_PATH"] = os.path.join(_tmp_dir, "static", "images")
+os.environ["POSTER_PATH"] = os.path.join(_tmp_dir, "cache", "posters")
+os.environ["BACKDROP_PATH"] = os.path.join(_tmp_dir, "cache", "backdrops")
+os.environ["IMAGE_CACHE_INDEX_PATH"] = os.path.join(_tmp_dir, "cache", "image_index.db")
+
+from fastapi.testclient import TestClient
+
+from app.cache import count_cache, facet_cache, response_cache
+from app.database import dispose_async_engines, engine, init_db, read_engine
+from app.main import app
+from app.scan_writer import ResolvedEpisode, ResolvedMovie, ScanWriter
+
+GENRES = [{"id": 18, "name": "剧情"}, {"id": 28, "name": "动作"}, {"id": 35, "name": "喜剧"}]
+LANGUAGES = [{"iso_639_1": "en", "name": "English"}, {"iso_639_1": "zh", "name": "普通话"}, {"iso_639_1": "ja", "name": "日本語"}]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+def _reset_database():
+    """释放所有连接并删除数据库文件"""
+    engine.dispose()
+    read_engine.dispose()
+    asyncio.run(dispose_async_engines())
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{_db_path}{suffix}").unlink(missing_ok=True)
+
+
+@pytest.fixture
+def database():
+    """独立的临时数据库（已建表、未写入数据）"""
+    _reset_database()
+    init_db()
+    for cache in (response_cache, count_cache, facet_cache):
+        cache.clear()
+    yield
+    _reset_database()
+
+
+@pytest.fixture
+def client(database):
+    """不运行 lifespan 的测试客户端（不启动 TMDb 服务与后台任务）"""
+    return TestClient(app)
+
+
+def movie_details(i: int) -> dict:
+    """构造 TMDb 电影详情"""
+    return {
+        "id": i,
+        "title": f"Movie {i:05d}",
+        "original_title": f"Movie {i:05d}",
+        "release_date": f"{1970 + i % 50}-0{1 + i % 9}-15",
+        "vote_average": (i % 100) / 10,
+        "popularity": (i * 37) % 1000 / 10,
+        "poster_path": f"/p{i}.jpg",
+        "genres": GENRES[: 1 + i % 3],
+        "spoken_languages": [LANGUAGES[i % 3]],
+        "production_countries": [{"iso_3166_1": "US" if i % 2 else "CN", "name": "-"}],
+        "production_companies": [{"id": 1 + i % 20, "name": f"Studio {i % 20}"}],
+        "credits": {
+            "cast": [
+                {"id": 5000 + (i + k) % 400, "name": f"Actor {(i + k) % 400}", "character": "X",
+                 "credit_id": f"c{i}-{k}", "order": k}
+                for k in range(5)
+            ],
+            "crew": [{"id": 9000 + i % 50, "name": f"Director {i % 50}", "job": "Director",
+                      "department": "Directing", "credit_id": f"d{i}"}],
+        },
+    }
+
+
+def show_items(s: int, episodes: int = 2) -> list:
+    """构造一部电视剧第 1 季各集的扫描结果"""
+    show = {
+        "id": 10 ** 6 + s,
+        "name": f"Show {s:03d}",
+        "first_air_date": f"{2000 + s % 20}-01-20",
+        "status": "Ended" if s % 2 else "Returning Series",
+        "genres": GENRES[:2],
+        "networks": [{"id": 100 + s % 5, "name": f"Network {s % 5}"}],
+        "spoken_languages": [LANGUAGES[s % 3]],
+        "created_by": [{"id": 9000 + s % 50, "name": f"Director {s % 50}", "credit_id": f"cr{s}"}],
+        "credits": {"cast": [{"id": 5000 + s, "name": f"Actor {s}", "character": "Y", "credit_id": f"t{s}", "order": 0}]},
+    }
+    season = {
+        "id": 10 ** 7 + s,
+        "name": "Season 1",
+        "episodes": [{"id": 10 ** 8 + s * 100 + e, "episode_number": e} for e in range(1, episodes + 1)],
+    }
+    return [
+        ResolvedEpisode(show, f"/media/tv/{s}", f"/media/tv/{s}/S01E{e:02d}.mkv", 500, 1, e, season)
+        for e in range(1, episodes + 1)
+    ]
+
+
+def write_items(items: list):
+    """通过扫描写入器写入解析结果"""
+    async def run():
+        writer = ScanWriter()
+        await writer.start()
+        for item in items:
+            await writer.put(item)
+        await writer.close()
+    
+    asyncio.run(run())
+
+
+@pytest.fixture
+def library(database):
+    """写入 120 部电影与 60 部电视剧（每部 2 集）"""
+    items = [ResolvedMovie(movie_details(i), f"/media/movies/{i}.mkv", 1000 + i) for i in range(120)]
+    for s in range(60):
+        items.extend(show_items(s))
+    write_items(items)
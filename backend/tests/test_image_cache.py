@@ -0,0 +1,75 @@
+"""
+图片缓存索引：下载（含缩略图）写入的索引行与按磁盘文件重建的索引行一致
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.image_service import ImageCacheService
+
+
+class FakeResponse:
+    """只实现 _fetch_image 用到的 aiohttp 响应接口"""
+    
+    def __init__(self, body: bytes):
+        self.status = 200
+        self.content = self
+        self._body = body
+    
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeSession:
+    """所有 URL 都返回同一张 JPEG 图片"""
+    
+    closed = False
+    
+    def __init__(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (500, 750), (200, 80, 40)).save(buffer, "JPEG")
+        self.body = buffer.getvalue()
+    
+    def get(self, url: str):
+        return FakeResponse(self.body)
+    
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def image_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "poster_path", str(tmp_path / "posters"))
+    monkeypatch.setattr(settings, "backdrop_path", str(tmp_path / "backdrops"))
+    monkeypatch.setattr(settings, "image_cache_index_path", str(tmp_path / "image_index.db"))
+    service = ImageCacheService()
+    service._session = FakeSession()
+    return service
+
+
+def index_rows(service: ImageCacheService) -> list:
+    with service.index._lock:
+        return service.index._conn.execute(
+            "SELECT cache_key, image_type, variant, size FROM cached_images ORDER BY cache_key"
+        ).fetchall()
+
+
+async def test_download_and_rebuild_record_same_variants(image_service):
+    assert await image_service.download_image("/poster.jpg", "poster", "w500")
+    downloaded = index_rows(image_service)
+    assert {row[2] for row in downloaded} == {"original", "thumb"}
+    
+    with image_service.index._lock:
+        image_service.index._conn.execute("DELETE FROM cached_images")
+    image_service.rebuild_index()
+    assert index_rows(image_service) == downloaded
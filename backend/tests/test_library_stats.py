@@ -0,0 +1,45 @@
+"""
+媒体库统计：重建与代数递增在同一事务中提交；统计响应按当天日期缓存（最近 7 天入库数跨日变化）
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+import app.cache as cache_module
+from app.database import LibraryStat, SessionLocal
+from app.library_stats import rebuild_library_stats
+
+
+class FixedDatetime(datetime):
+    """utcnow 返回指定日期的 datetime"""
+    
+    now_value = datetime(2024, 1, 1, 12)
+    
+    @classmethod
+    def utcnow(cls):
+        return cls.now_value
+
+
+def test_rebuild_leaves_commit_to_caller(library):
+    with SessionLocal() as db:
+        db.execute(LibraryStat.__table__.delete())
+        db.commit()
+        assert rebuild_library_stats(db) > 0
+        db.rollback()
+        assert db.scalar(select(func.count()).select_from(LibraryStat)) == 0
+
+
+def test_stats_cache_and_etag_roll_over_daily(library, client, monkeypatch):
+    monkeypatch.setattr(cache_module, "datetime", FixedDatetime)
+    first = client.get("/api/stats")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get("/api/stats").headers["x-cache"] == "HIT"
+    assert client.get("/api/stats", headers={"If-None-Match": etag}).status_code == 304
+    
+    monkeypatch.setattr(FixedDatetime, "now_value", datetime(2024, 1, 2, 0, 1))
+    next_day = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert next_day.status_code == 200
+    assert next_day.headers["x-cache"] == "MISS"
+    assert next_day.headers["etag"] != etag
@@ -0,0 +1,88 @@
+"""
+每个请求发出的 SQL 语句数
+列表接口在不同分页大小下语句数必须相同（不随行数增长，即没有 N+1 查询），且不超过上限
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.cache import response_cache
+from app.database import async_engine, async_read_engine, engine, read_engine
+
+MAX_STATEMENTS = 4
+
+LIST_ENDPOINTS = [
+    "/api/movies",
+    "/api/movies?genre=动作",
+    "/api/movies?language=ja&country=US",
+    "/api/movies?sort=rating&with_total=true",
+    "/api/movies?search=Movie",
+    "/api/tv-shows",
+    "/api/tv-shows?status=Ended",
+    "/api/tv-shows?network=102",
+    "/api/movies?fields=grid",
+    "/api/movies?fields=grid,genres&genre=动作",
+    "/api/tv-shows?fields=grid,overview",
+    "/api/search?query=Show",
+]
+
+# (URL, 允许的语句数)
+DETAIL_ENDPOINTS = [
+    ("/api/movies/1", MAX_STATEMENTS),
+    ("/api/tv-shows/1", MAX_STATEMENTS),
+    ("/api/tv-shows/1?expand=seasons", MAX_STATEMENTS),
+    ("/api/movies/1/credits", MAX_STATEMENTS),
+    ("/api/movies/batch?ids=" + ",".join(str(i) for i in range(1, 101)), MAX_STATEMENTS),
+    ("/api/tv-shows/batch?ids=" + ",".join(str(i) for i in range(1, 51)), MAX_STATEMENTS),
+    ("/api/stats", MAX_STATEMENTS),
+    ("/api/facets", MAX_STATEMENTS),
+    ("/api/facets?media_type=tv_show&genre=剧情&network=102", MAX_STATEMENTS),
+    # 人物 + 电影演职员及其类型 + 电视剧演职员及其类型
+    ("/api/people/1/titles", 5),
+]
+
+
+class StatementCounter:
+    """统计引擎发出的 SQL 语句数"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@pytest.fixture
+def counter(library, client, monkeypatch):
+    """统计所有引擎上的语句（不缓存响应，每次请求都执行查询）"""
+    monkeypatch.setattr(response_cache, "max_bytes", 0)
+    counter = StatementCounter()
+    engines = (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine)
+    for db_engine in engines:
+        event.listen(db_engine, "before_cursor_execute", counter)
+    yield counter
+    for db_engine in engines:
+        event.remove(db_engine, "before_cursor_execute", counter)
+
+
+def measure(client, counter: StatementCounter, url: str) -> int:
+    counter.count = 0
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize("url", LIST_ENDPOINTS)
+def test_list_statements_do_not_grow_with_page_size(client, counter, url):
+    # 预热：首次请求会检查全文索引是否可用，并填充列表总数缓存
+    client.get(url)
+    separator = "&" if "?" in url else "?"
+    small = measure(client, counter, f"{url}{separator}limit=5")
+    large = measure(client, counter, f"{url}{separator}limit=100")
+    assert small == large
+    assert large <= MAX_STATEMENTS
+
+
+@pytest.mark.parametrize("url,budget", DETAIL_ENDPOINTS)
+def test_detail_statement_budget(client, counter, url, budget):
+    assert measure(client, counter, url) <= budget
@@ -0,0 +1,32 @@
+"""
+扫描进度 SSE：即使客户端接受 gzip，事件流也不压缩（压缩会缓冲事件，进度无法实时送达）
+"""
+
+import asyncio
+
+import httpx
+
+from app.main import app
+from app.progress import progress_broker
+
+TASK_ID = 4242
+
+
+async def test_progress_stream_is_not_gzipped(database):
+    # 路径足够长，首个事件超过 gzip 的最小压缩大小
+    progress_broker.open(TASK_ID, status="running", path="/media/" + "x" * 4096)
+    # ASGITransport 读取完整响应体后才返回，扫描结束由计时器模拟
+    asyncio.get_running_loop().call_later(0.2, progress_broker.close, TASK_ID, "completed")
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await asyncio.wait_for(
+                client.get(f"/api/scan/{TASK_ID}/events", headers={"Accept-Encoding": "gzip"}), 10
+            )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "content-encoding" not in response.headers
+        events = [line for line in response.text.splitlines() if line.startswith("event:")]
+        assert events == ["event: progress", "event: done"]
+    finally:
+        progress_broker.channels.pop(TASK_ID, None)
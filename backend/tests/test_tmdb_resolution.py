@@ -0,0 +1,100 @@
+"""
+扫描解析流程：process_movie / process_tv_show 通过 TMDbService 查询（HTTP 层替换为本地桩）并交给写入器
+覆盖从 TMDb 详情（附带演职员）到数据库行的完整路径
+"""
+
+import httpx
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal, Movie, MovieCredit, TVCredit, TVEpisode, TVShow
+from app.main import TMDbLookupCache, process_movie, process_tv_show
+from app.media_parser import ParsedMedia
+from app.scan_writer import ScanWriter
+from app.tmdb_api import TMDbService
+from conftest import movie_details, show_items
+
+MOVIE_ID = 7
+SHOW_ITEM = show_items(0, episodes=1)[0]
+
+
+def tmdb_response(request: httpx.Request) -> dict:
+    """按接口路径返回 TMDb 数据；与 TMDb 相同，只有请求 append_to_response=credits 时才附带演职员"""
+    with_credits = "credits" in request.url.params.get("append_to_response", "").split(",")
+    path = request.url.path
+    if path == "/search/movie":
+        return {"results": [{"id": MOVIE_ID}]}
+    if path == f"/movie/{MOVIE_ID}":
+        details = movie_details(MOVIE_ID)
+    elif path == "/search/tv":
+        return {"results": [{"id": SHOW_ITEM.show_details["id"]}]}
+    elif path == f"/tv/{SHOW_ITEM.show_details['id']}":
+        details = dict(SHOW_ITEM.show_details)
+    elif path == f"/tv/{SHOW_ITEM.show_details['id']}/season/1":
+        return SHOW_ITEM.season_details
+    else:
+        return {}
+    if not with_credits:
+        details.pop("credits", None)
+    return details
+
+
+def stub_tmdb_service():
+    """HTTP 请求由本地桩应答的 TMDbService，返回 (服务, 已发出的请求)"""
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=tmdb_response(request))
+    
+    service = TMDbService()
+    service.client.client = httpx.AsyncClient(base_url="https://tmdb.test", transport=httpx.MockTransport(handler))
+    return service, requests
+
+
+async def resolve(resolver, *args):
+    """运行解析函数并等待写入器提交"""
+    service, requests = stub_tmdb_service()
+    writer = ScanWriter()
+    await writer.start()
+    try:
+        resolved = await resolver(writer, service, *args)
+    finally:
+        await writer.close()
+        await service.close()
+    assert writer.failed_items == 0, writer.last_error
+    return resolved, requests
+
+
+async def test_process_movie_stores_title_and_credits(database):
+    media = ParsedMedia(title="Movie", year=1977, media_type="movie", file_path="/media/movies/m.mkv", file_size=1)
+    resolved, requests = await resolve(process_movie, media)
+    
+    assert resolved is not None
+    detail = next(request for request in requests if request.url.path == f"/movie/{MOVIE_ID}")
+    assert detail.url.params["append_to_response"] == "credits"
+    async with AsyncSessionLocal() as db:
+        movie = (await db.execute(select(Movie).where(Movie.tmdb_id == MOVIE_ID))).scalar_one()
+        assert movie.local_path == "/media/movies/m.mkv"
+        credits = await db.scalar(select(func.count()).where(MovieCredit.movie_id == movie.id))
+    # 5 位演员 + 导演
+    assert credits == 6
+
+
+async def test_process_tv_show_stores_episode_and_credits(database):
+    media = ParsedMedia(
+        title="Show", season=1, episode=1, media_type="tv_episode",
+        file_path="/media/tv/0/S01E01.mkv", file_size=1
+    )
+    resolved, requests = await resolve(process_tv_show, TMDbLookupCache(), media)
+    
+    assert resolved is not None
+    show_id = SHOW_ITEM.show_details["id"]
+    detail = next(request for request in requests if request.url.path == f"/tv/{show_id}")
+    assert detail.url.params["append_to_response"] == "credits"
+    async with AsyncSessionLocal() as db:
+        show = (await db.execute(select(TVShow).where(TVShow.tmdb_id == show_id))).scalar_one()
+        episodes = (await db.execute(select(TVEpisode.local_path))).scalars().all()
+        credits = await db.scalar(select(func.count()).where(TVCredit.tv_show_id == show.id))
+    assert episodes == ["/media/tv/0/S01E01.mkv"]
+    # 演员 + 创作者
+    assert credits == 2
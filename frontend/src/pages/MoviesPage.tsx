@@ -26,8 +26,11 @@ const MovieCard: React.FC<MovieCardProps> = ({ movie }) => {
     <Link to={`/movies/${movie.id}`} className="group block">
       <div className="movie-card bg-white dark:bg-slate-800 rounded-lg overflow-hidden shadow-md hover:shadow-xl transition-all duration-300 transform hover:scale-105">
         {/* 海报 */}
-        <div className="relative aspect-[2/3] bg-slate-200 dark:bg-slate-700">
-          {!imageLoaded && !imageError && (
+        <div
+          className="relative aspect-[2/3] bg-slate-200 dark:bg-slate-700 bg-cover bg-center"
+          style={movie.poster_placeholder ? { backgroundImage: `url(${movie.poster_placeholder})` } : undefined}
+        >
+          {!imageLoaded && !imageError && !movie.poster_placeholder && (
             <div className="absolute inset-0 flex items-center justify-center">
               <LoadingSpinner size="sm" />
             </div>
@@ -145,29 +145,21 @@ const ScanPage: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
   
-  const pollIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const unsubscribeRef = useRef<(() => void) | null>(null);
 
-  // 轮询当前任务状态
-  const pollTaskStatus = async (taskId: string) => {
-    try {
-      const status = await apiService.getScanStatus(taskId);
-      setCurrentStatus(status);
-
-      if (status.status === 'completed' || status.status === 'failed') {
-        setIsScanning(false);
-        if (pollIntervalRef.current) {
-          clearInterval(pollIntervalRef.current);
-          pollIntervalRef.current = null;
-        }
-        
-        if (status.status === 'completed') {
-          setSuccess(`扫描完成！处理了 ${status.processed_files} 个文件`);
-        } else if (status.status === 'failed') {
-          setError(`扫描失败: ${status.error_message}`);
-        }
-      }
-    } catch (err) {
-      console.error('轮询任务状态失败:', err);
+  // 订阅当前任务进度（服务端推送，无需轮询）
+  const handleTaskStatus = (status: ScanStatus, done: boolean) => {
+    setCurrentStatus(status);
+    if (!done) {
+      return;
+    }
+
+    setIsScanning(false);
+    unsubscribeRef.current = null;
+    if (status.status === 'completed') {
+      setSuccess(`扫描完成！处理了 ${status.processed_files} 个文件`);
+    } else if (status.status === 'failed') {
+      setError(`扫描失败: ${status.error_message}`);
     }
   };
 
@@ -197,16 +189,9 @@ const ScanPage: React.FC = () => {
         setSuccess(response.message);
       }
       
-      // 开始轮询任务状态
-      if (pollIntervalRef.current) {
-        clearInterval(pollIntervalRef.current);
-      }
-      
-      if (response.data?.task_id) {
-        pollIntervalRef.current = setInterval(() => {
-          pollTaskStatus(response.data!.task_id);
-        }, 1000);
-      }
+      // 订阅任务进度
+      unsubscribeRef.current?.();
+      unsubscribeRef.current = apiService.subscribeScanProgress(response.id, handleTaskStatus);
 
     } catch (err: any) {
       setError(err.message || '启动扫描失败');
@@ -214,12 +199,10 @@ const ScanPage: React.FC = () => {
     }
   };
 
-  // 清理轮询
+  // 离开页面时取消订阅
   useEffect(() => {
     return () => {
-      if (pollIntervalRef.current) {
-        clearInterval(pollIntervalRef.current);
-      }
+      unsubscribeRef.current?.();
     };
   }, []);
 
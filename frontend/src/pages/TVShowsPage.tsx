@@ -54,8 +54,11 @@ const TVShowCard: React.FC<TVShowCardProps> = ({ show }) => {
     <Link to={`/tv-shows/${show.id}`} className="group block">
       <div className="tv-show-card bg-white dark:bg-slate-800 rounded-lg overflow-hidden shadow-md hover:shadow-xl transition-all duration-300 transform hover:scale-105">
         {/* 海报 */}
-        <div className="relative aspect-[2/3] bg-slate-200 dark:bg-slate-700">
-          {!imageLoaded && !imageError && (
+        <div
+          className="relative aspect-[2/3] bg-slate-200 dark:bg-slate-700 bg-cover bg-center"
+          style={show.poster_placeholder ? { backgroundImage: `url(${show.poster_placeholder})` } : undefined}
+        >
+          {!imageLoaded && !imageError && !show.poster_placeholder && (
             <div className="absolute inset-0 flex items-center justify-center">
               <LoadingSpinner size="sm" />
             </div>
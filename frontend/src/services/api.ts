@@ -8,6 +8,7 @@ import {
   SearchResult, 
   ScanRequest, 
   ScanStatus,
+  ScanStartResponse,
   ApiResponse,
   PaginatedResponse,
   FilterOptions
@@ -122,14 +123,30 @@ class ApiService {
   }
 
   // 扫描相关API
-  async startScan(scanRequest: ScanRequest): Promise<ApiResponse<{ task_id: string }>> {
-    const response = await this.api.post<ApiResponse<{ task_id: string }>>(
+  async startScan(scanRequest: ScanRequest): Promise<ScanStartResponse> {
+    const response = await this.api.post<ScanStartResponse>(
       API_ENDPOINTS.SCAN, 
       scanRequest
     )
     return response.data
   }
 
+  // 订阅扫描进度（Server-Sent Events），返回取消订阅的函数
+  subscribeScanProgress(
+    taskId: number,
+    onStatus: (status: ScanStatus, done: boolean) => void
+  ): () => void {
+    const source = new EventSource(`${API_BASE_URL}${API_ENDPOINTS.SCAN_STATUS}/${taskId}/events`)
+    source.addEventListener('progress', (event) => {
+      onStatus(JSON.parse((event as MessageEvent).data), false)
+    })
+    source.addEventListener('done', (event) => {
+      source.close()
+      onStatus(JSON.parse((event as MessageEvent).data), true)
+    })
+    return () => source.close()
+  }
+
   async getScanStatus(taskId?: string): Promise<ScanStatus> {
     const url = taskId ? `${API_ENDPOINTS.SCAN_STATUS}/${taskId}` : API_ENDPOINTS.SCAN_STATUS
     const response = await this.api.get<ScanStatus>(url)
@@ -261,8 +278,7 @@ export const tvAPI = {
 
 export const scanAPI = {
   startScan: async (data: { path: string; recursive: boolean }) => {
-    const response = await apiService.startScan(data);
-    return response.data || response; // 兼容不同的响应格式
+    return apiService.startScan(data);
   },
   getScanStatus: (taskId: string) => apiService.getScanStatus(taskId),
 };
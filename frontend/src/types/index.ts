@@ -5,6 +5,7 @@ export interface BaseMedia {
   name?: string
   overview: string
   poster_path: string | null
+  poster_placeholder?: string | null // 低质量占位图（data URI）
   backdrop_path: string | null
   vote_average?: number
   rating?: number // 兼容字段
@@ -108,9 +109,16 @@ export interface ScanRequest {
   path: string
 }
 
+// 开始扫描的响应
+export interface ScanStartResponse {
+  id: number
+  task_id: string
+  message: string
+}
+
 // 扫描状态
 export interface ScanStatus {
-  status: 'idle' | 'scanning' | 'completed' | 'error' | 'failed'
+  status: 'idle' | 'pending' | 'running' | 'scanning' | 'completed' | 'error' | 'failed'
   progress: number
   current_file?: string
   total_files?: number